@@ -1,85 +1,535 @@
-from flask import Flask, render_template, request, send_from_directory
+from flask import (Flask, abort, jsonify, make_response, redirect, render_template, request, send_file,
+                   send_from_directory, url_for)
+import io
 import os
-from poker_analysis import parser, stats, plots
-import datetime
-import json
+import pstats
+import re
+import sqlite3
+import tempfile
+import time
+import uuid
+import zipfile
+from poker_analysis import (assets, cache, combine, equity, identity, jobs, ledger, live, matrix, metrics, pipeline,
+                            render, sessions)
 from flask_httpauth import HTTPBasicAuth
-from werkzeug.security import check_password_hash, generate_password_hash
-from poker_analysis import matrix
+from werkzeug.security import check_password_hash
 from werkzeug.utils import secure_filename
 
 app = Flask(__name__)
+SESSION_ID_RE = re.compile(r"[0-9a-f]{64}")
+CHART_NAME_RE = re.compile(r"[0-9a-f]{32}\.png")
+DATE_RE = re.compile(r"\d{4}-\d{2}-\d{2}")
 app.config['UPLOAD_FOLDER'] = 'uploads'
 app.config['MATRIX_FOLDER'] = 'matrices'
+app.config['CACHE_FOLDER'] = 'cache'
+app.config['CACHE_MAX_BYTES'] = 500 * 1024 * 1024
+app.config['CHART_WORKERS'] = min(8, os.cpu_count() or 1)
+app.config['ASSET_FOLDER'] = 'assets'  # rendered charts, stats JSON and matrix downloads, with gzip/br copies
+app.config['ASSET_MAX_BYTES'] = 200 * 1024 * 1024
+app.config['ASSET_MAX_AGE'] = 365 * 24 * 60 * 60  # seconds browsers and CDNs may keep a chart, whose URL is its hash
+app.config['JOB_FOLDER'] = 'jobs'
+app.config['JOB_CONCURRENCY'] = 2
+app.config['JOB_MAX_PENDING'] = 20
+app.config['LOW_MEMORY_THRESHOLD'] = 50 * 1024 * 1024  # uploads bigger than this are analysed as a stream
+app.config['SESSION_DB'] = 'sessions.db'
+app.config['PLAYER_DB'] = 'players.db'
+app.config['UPLOAD_DB'] = 'uploads.db'
+app.config['ADMIN_PAGE_SIZE'] = 50
+app.config['BATCH_MAX_FILES'] = 100  # logs in one multi-file or zip upload
+app.config['BATCH_MAX_BYTES'] = 1024 * 1024 * 1024  # and their total size, uncompressed
+app.config['LIVE_SESSIONS'] = 50  # games followed live at once; the least recently updated is dropped first
+app.config['PROFILE_FOLDER'] = 'profiles'  # cProfile dumps of uploads the admin asked to profile
+# Import pandas and matplotlib at startup instead of on first use: set PRELOAD=1 in the environment when the server
+# imports the app once and forks its workers from that process (gunicorn --preload, uWSGI without lazy-apps),
+# so the workers share them
+app.config['PRELOAD'] = os.environ.get("PRELOAD") == "1"
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 os.makedirs(app.config['MATRIX_FOLDER'], exist_ok=True)
+os.makedirs(app.config['PROFILE_FOLDER'], exist_ok=True)
+
+# Canonical players behind the pokernow ids, so one person is one player in every session
+player_index = identity.PlayerIndex(app.config['PLAYER_DB'])
+
+# Results keyed by the uploaded file's contents, so re-uploading a log skips the analysis. Results hold canonical
+# names, so the version includes the player index's generation: a merge or rename makes them misses
+results_cache = cache.ResultCache(app.config['CACHE_FOLDER'], app.config['CACHE_MAX_BYTES'],
+                                  lambda: f"{cache.CACHE_VERSION}-{player_index.generation()}")
+
+# What the results pages fetch again on every view, stored once rendered (assets.py)
+asset_store = assets.AssetStore(app.config['ASSET_FOLDER'], app.config['ASSET_MAX_BYTES'])
+
+# Every upload, for the admin page; the old JSON log is moved into it the first time the app starts
+upload_ledger = ledger.UploadLedger(app.config['UPLOAD_DB'])
+upload_ledger.import_json(os.path.join(app.config['UPLOAD_FOLDER'], "upload_log.json"))
+
+# Stage timings of every upload analysed since the app started, for /metrics and the admin page
+metrics_registry = metrics.Registry()
+
+# Per-player totals across every analysed upload, for lifetime stats
+session_store = sessions.SessionStore(app.config['SESSION_DB'])
+
+# Matrix download formats; parquet and arrow are offered only if pyarrow is installed
+MATRIX_FORMATS = matrix.exportFormats()
+MATRIX_MIMETYPES = {
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.file",
+}
+
+# Games being re-uploaded as they are played, so each upload only parses the new rows
+live_sessions = live.LiveSessions(app.config['LIVE_SESSIONS'])
+
+# Chart rendering runs on a process pool, started by the first PNG chart request rather than here: forking it
+# (and importing matplotlib in it) would slow every start, and a pool can't be shared by forked app workers
+render.configure(app.config['CHART_WORKERS'])
+if app.config['PRELOAD']:
+    pipeline.preload()
+
+def analyze_live_upload(filepath, digest, progress=None):
+    """
+    Brings the live session of this upload's game up to date, starting it over if the upload doesn't continue it.
+    A log whose game can't be told (no order value on its oldest row) gets a session of its own, by its digest,
+    rather than one shared with every other such log
+    """
+    key = live.session_key(filepath) or f"upload-{digest}"
+    try:
+        return pipeline.analyze_live(live_sessions.get(key), filepath, progress, identities=player_index)
+    except live.NotAContinuation:
+        return pipeline.analyze_live(live_sessions.get(key, restart=True), filepath, progress, identities=player_index)
+
+
+def analyze_upload(filepath, filename, digest, progress=None, live_game=False, timer=None):
+    """
+    Analyses a saved upload (or fetches it from the cache) and writes its matrix CSV. Returns (result, matrix file).
+    timer, a metrics.StageTimer, is given the stages as they start (it passes them on to progress) and the number
+    of rows analysed, 0 for a cache hit.
+    """
+    if timer is None:
+        timer = metrics.StageTimer(progress)
+    timer.start("cache")
+    result = results_cache.get(digest)
+    rows = 0
+    if result is None:
+        if live_game:
+            result = analyze_live_upload(filepath, digest, timer)
+        else:
+            low_memory = os.path.getsize(filepath) > app.config['LOW_MEMORY_THRESHOLD']
+            result = pipeline.analyze(filepath, timer, low_memory=low_memory, identities=player_index)
+        rows = result["rows"]
+        timer.start("caching")
+        # the parsed game is only needed while computing stats; leaving it out keeps cache reads cheap
+        result = {key: value for key, value in result.items() if key != "game"}
+        result["stats_json"] = pipeline.stats_json(result["player_dict"], result["stats"])
+        results_cache.put(digest, result)
+    # by game as well as digest: a live re-upload, or a later export of a game already in the lifetime totals,
+    # replaces the export that is there rather than counting its hands again
+    timer.start("sessions")
+    session_store.add(digest, filename, result["player_dict"], result["base"], game=live.session_key(filepath),
+                      last_order=live.newest_order(filepath))
+
+    timer.start("matrix file")
+    matrix_file = f"matrix_{digest[:12]}_{filename}"
+    matrix_path = os.path.join(app.config['MATRIX_FOLDER'], matrix_file)
+    matrix.writeMatrix(result["matrix"], matrix_path)
+    timer.stop(rows)
+
+    return result, matrix_file
+
+
+def profile_path(upload_id):
+    return os.path.join(app.config['PROFILE_FOLDER'], f"{upload_id}.prof")
+
+
+def timed_upload(upload_id, filepath, filename, digest, progress=None, live_game=False, stages=None, profile=False):
+    """
+    analyze_upload with its stage timings recorded in metrics_registry and against the upload in the ledger.
+    stages are the ones already timed while the upload was received; with profile, the analysis runs under cProfile.
+    """
+    timer = metrics.StageTimer(progress, stages, profile_path(upload_id) if profile and upload_id else None)
+    try:
+        result = analyze_upload(filepath, filename, digest, live_game=live_game, timer=timer)
+    except Exception:
+        metrics_registry.record_failure(timer.current)
+        timer.stop()
+        raise
+    metrics_registry.record(timer)
+    if upload_id is not None:  # None for jobs queued before uploads had ids
+        upload_ledger.add_metrics(upload_id, timer.as_dict())
+    return result
+
+
+def run_upload_job(job, progress):
+    stages = job.get("stages", [])
+    if "submitted" in job:
+        stages.append({"stage": "queued", "wall": time.time() - job["submitted"], "cpu": 0.0, "rss": None})
+    result, matrix_file = timed_upload(job.get("upload_id"), job["filepath"], job["filename"], job["digest"], progress,
+                                       job.get("live", False), stages, job.get("profile", False))
+    return {"matrix_file": matrix_file}
+
+
+# Uploads that aren't cached yet are analysed in the background; the page polls /jobs/<id>
+job_runner = jobs.JobRunner(jobs.JobStore(app.config['JOB_FOLDER']), run_upload_job,
+                            concurrency=app.config['JOB_CONCURRENCY'], max_pending=app.config['JOB_MAX_PENDING'])
+
+# Once per process as it starts, so no request waits for either: map the hand evaluator's tables (for EV profit; built
+# into the cache folder the first time) and re-queue the jobs no running process owns. With PRELOAD the tables are
+# mapped here in the parent and shared by the workers it forks, and each worker resumes jobs just after the fork,
+# as job threads started in the parent wouldn't be in the workers
+equity.load_tables(app.config['CACHE_FOLDER'])
+_preload_pid = os.getpid()
+
+
+def resume_in_worker():
+    """after a fork: resumes jobs in the preloading process's own workers, not in the chart processes they fork"""
+    if os.getppid() == _preload_pid:
+        job_runner.resume()
+
+
+if app.config['PRELOAD']:
+    os.register_at_fork(after_in_child=resume_in_worker)
+else:
+    job_runner.resume()
+
+# Multi-file uploads: which games each one was combined into and the job analysing each
+batch_store = jobs.JobStore(os.path.join(app.config['JOB_FOLDER'], 'batches'))
+
+
+def upload_batch(files):
+    """
+    Several logs, or zip archives of logs, in one upload. Exports of the same game that overlap are merged
+    (combine.py) and each game is then analysed like a single upload, the ones not cached yet as background jobs
+    that run side by side. The page polls /batches/<id>, which gathers them into one result.
+    """
+    if not all(file.filename.lower().endswith((".csv", ".zip")) for file in files):
+        return render_template("index.html", error="Only .csv logs and .zip archives of them can be uploaded."), 400
+
+    directory = os.path.join(app.config['UPLOAD_FOLDER'], f"batch_{uuid.uuid4().hex}")
+    os.makedirs(directory)
+    saved = []
+    for i, file in enumerate(files):
+        filepath = os.path.join(directory, secure_filename(file.filename) or f"log{i}.csv")
+        if filepath in saved:
+            stem, extension = os.path.splitext(filepath)
+            filepath = f"{stem}-{i}{extension}"
+        file.save(filepath)
+        saved.append(filepath)
+
+    try:
+        paths = combine.expand_archives(saved, directory, app.config['BATCH_MAX_FILES'], app.config['BATCH_MAX_BYTES'])
+    except combine.TooLarge as e:
+        return render_template("index.html", error=f"Too much to analyse at once: {e}."), 413
+    except zipfile.BadZipFile:
+        return render_template("index.html", error="One of the archives isn't a valid zip file."), 400
+    games, skipped = combine.combine(paths, directory)
+
+    entries = []
+    for game in games:
+        filename = secure_filename(os.path.basename(game.path))
+        digest = cache.file_digest(game.path)
+        upload_id = upload_ledger.add(filename, digest, os.path.getsize(game.path))
+        entry = {"filename": filename, "logs": [os.path.basename(path) for path in game.logs], "rows": game.rows,
+                 "duplicates": game.duplicates, "session_id": digest, "job_id": None, "error": None}
+        # checked without reading the entry: timed_upload reads it
+        if digest in results_cache:
+            timed_upload(upload_id, game.path, filename, digest)
+        else:
+            try:
+                job = job_runner.submit(filename=filename, filepath=game.path, digest=digest, upload_id=upload_id,
+                                        submitted=time.time())
+                entry["job_id"] = job["id"]
+            except jobs.QueueFull:
+                entry["error"] = "The server was too busy to analyse this game, please upload it again."
+        entries.append(entry)
+
+    batch = batch_store.create(games=entries, skipped=[{"filename": os.path.basename(path), "error": error}
+                                                       for path, error in skipped])
+    return render_template("index.html", batch_id=batch["id"])
+
 
 @app.route("/", methods=["GET", "POST"])
 def index():
-    charts_html = []
+    return upload_page()
+
+
+def upload_page(profile=False):
+    """
+    the upload form, and what a POST to it shows. profile runs the analysis under cProfile; an API client can also
+    ask for that with ?profile=1 or a profile form field, sent with the admin's credentials
+    """
+    session_id = None
     matrix_file = None
 
     if request.method == "POST":
-        file = request.files.get("file")
-        if file and file.filename.endswith(".csv"):
+        files = [file for file in request.files.getlist("file") if file.filename]
+        if len(files) > 1 or (files and files[0].filename.lower().endswith(".zip")):
+            return upload_batch(files)
+        file = files[0] if files else None
+        if file and file.filename.lower().endswith(".csv"):
             filename = secure_filename(file.filename)
-            filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            file.save(filepath)
+            live_game = bool(request.form.get("live"))
+            profile = profile or (bool(request.args.get("profile") or request.form.get("profile")) and is_admin())
+            intake = metrics.StageTimer()
+            intake.start("saving")
+            fd, tmp_path = tempfile.mkstemp(dir=app.config['UPLOAD_FOLDER'], suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                file.save(f)
 
-            log_path = os.path.join(app.config['UPLOAD_FOLDER'], "upload_log.json")
+            intake.start("digest")
+            digest = cache.file_digest(tmp_path)
+            # kept under the hash of its contents, not its name: another log uploaded under the same name while
+            # this one is queued can't replace the file its job will read
+            filepath = os.path.join(app.config['UPLOAD_FOLDER'], f"{digest}.csv")
+            os.replace(tmp_path, filepath)
+            intake.stop()
+            upload_id = upload_ledger.add(filename, digest, os.path.getsize(filepath), live_game)
 
-            # Load existing log
-            if os.path.exists(log_path):
-                with open(log_path, "r") as f:
-                    upload_log = json.load(f)
+            # Already analysed: show it straight away. Otherwise queue it and let the page poll
+            if digest in results_cache:
+                result, matrix_file = timed_upload(upload_id, filepath, filename, digest, live_game=live_game,
+                                                   stages=intake.stages, profile=profile)
+                session_id = digest
             else:
-                upload_log = []
-
-            # Append new log entry
-            upload_log.append({
-                "filename": filename,
-                "timestamp": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            })
-
-            # Save log
-            with open(log_path, "w") as f:
-                json.dump(upload_log, f, indent=4)
-
-            df = parser.load_log(filepath)
-            player_dict = parser.create_player_dict(df)
-
-            #player presence, number of hands
-            hands = stats.track_player_presence(df, player_dict)
-            callcount = stats.get_preflop_actions(df, player_dict, 'calls')
-            raisecount = stats.get_preflop_actions(df, player_dict, 'raises')
-            vpip = stats.calc_VPIP(df, player_dict)
-            pfr = stats.calc_PFR(df, player_dict)
-
-            calls = stats.get_action_counts(df, 'calls', player_dict)
-            raises = stats.get_action_counts(df, 'raises', player_dict)
-            bets = stats.get_action_counts(df, 'bets', player_dict)
-            folds = stats.get_action_counts(df, 'folds', player_dict, 3)
-
-            af = stats.calc_aggression_factor(bets, raises, calls, player_dict)
-            player_stacks = stats.track_player_stacks(df, player_dict)
-
-            players = list(vpip.keys())
-            charts_html.append(plots.plot_bar_chart(player_dict, af, "Aggression Factor", "Player", "AF"))
-            charts_html.append(plots.plot_bar_chart(player_dict, calls, "Calls", "Player", "Number of Calls"))
-            charts_html.append(plots.plot_bar_chart(player_dict, raises, "Raises", "Player", "Number of Raises"))
-            charts_html.append(plots.plot_bar_chart(player_dict, bets, "Bets", "Player", "Number of Bets"))
-            charts_html.append(plots.plot_bar_chart(player_dict, folds, "Folds", "Player", "Number of Folds"))
-            charts_html.append(plots.plot_vpip_vs_pfr(vpip, pfr, players))
-            charts_html.append(plots.plot_vpip_vs_af(vpip, af, players))
-            charts_html.append(plots.plot_player_stacks(player_stacks))
-
-            # Generate and save matrix
-            matrix_df = matrix.constructMatrix(filepath)
-            matrix_file = f"matrix_{filename}"
-            matrix_path = os.path.join(app.config['MATRIX_FOLDER'], matrix_file)
-            matrix_df.to_csv(matrix_path)
-
-    return render_template("index.html", charts=charts_html, matrix_file=matrix_file)
+                try:
+                    job = job_runner.submit(filename=filename, filepath=filepath, digest=digest, live=live_game,
+                                            upload_id=upload_id, stages=intake.stages, submitted=time.time(),
+                                            profile=profile)
+                except jobs.QueueFull:
+                    return render_template("index.html", error="The server is busy, please try again in a minute."), 503
+                return render_template("index.html", job_id=job["id"])
+
+    return render_template("index.html", session_id=session_id, matrix_file=matrix_file)
+
+
+@app.route("/jobs/<job_id>")
+def job_status(job_id):
+    job = job_runner.store.get(job_id)
+    if job is None:
+        abort(404)
+
+    status = {key: job[key] for key in ("id", "status", "stage", "progress", "error")}
+    if job["status"] == jobs.DONE:
+        status["results_url"] = url_for("job_results", job_id=job_id)
+    return jsonify(status)
+
+
+@app.route("/jobs/<job_id>/results")
+def job_results(job_id):
+    """the charts and matrix link of a finished job, as an HTML fragment for index.html to insert"""
+    job = job_runner.store.get(job_id)
+    if job is None or job["status"] != jobs.DONE:
+        abort(404)
+
+    matrix_file = job.get("matrix_file")
+    if matrix_file is None or job["digest"] not in results_cache:
+        # evicted from the cache since the job ran: analyse the upload again, from its file named by the same hash
+        result, matrix_file = analyze_upload(job["filepath"], job["filename"], job["digest"],
+                                             live_game=job.get("live", False))
+    return render_template("results.html", session_id=job["digest"], matrix_file=matrix_file)
+
+
+@app.route("/batches/<batch_id>")
+def batch_status(batch_id):
+    """
+    the games of a multi-file upload with the progress of each, and once they are all analysed, the combined
+    result: each player's totals over the batch (the fields /lifetime has) and the batch's matrix
+    """
+    batch = batch_store.get(batch_id)
+    if batch is None:
+        abort(404)
+
+    games = []
+    for entry in batch["games"]:
+        game = dict(entry, status=jobs.DONE, stage=jobs.DONE, progress=1.0)
+        if entry["error"]:
+            game.update(status=jobs.FAILED, stage=jobs.FAILED)
+        elif entry["job_id"]:
+            job = job_runner.store.get(entry["job_id"]) or {"status": jobs.FAILED, "stage": jobs.FAILED,
+                                                            "progress": 0.0, "error": "job not found"}
+            game.update({key: job[key] for key in ("status", "stage", "progress", "error")})
+        if game["status"] == jobs.DONE:
+            game["stats_url"] = url_for("session_stats", session_id=entry["session_id"])
+            game["charts_url"] = url_for("session_charts", session_id=entry["session_id"])
+            game["matrix_url"] = url_for("session_matrix", session_id=entry["session_id"], fmt="csv")
+        games.append(game)
+
+    finished = all(game["status"] in (jobs.DONE, jobs.FAILED) for game in games)
+    status = {
+        "id": batch_id,
+        "status": jobs.DONE if finished else jobs.RUNNING,
+        "progress": round(sum(game["progress"] for game in games) / len(games), 2) if games else 1.0,
+        "games": games,
+        "skipped": batch["skipped"],
+    }
+    if finished:
+        results = [results_cache.get(game["session_id"]) for game in games if game["status"] == jobs.DONE]
+        status["players"] = sessions.combine_rows([sessions.session_rows(result["player_dict"], result["base"])
+                                                   for result in results if result is not None])
+        status["matrix_url"] = url_for("batch_matrix", batch_id=batch_id, fmt="csv")
+    return jsonify(status)
+
+
+@app.route("/batches/<batch_id>/matrix.<fmt>")
+def batch_matrix(batch_id, fmt):
+    """the matrices of a multi-file upload's games as one, a row per (game, player)"""
+    batch = batch_store.get(batch_id)
+    if batch is None or fmt not in MATRIX_FORMATS:
+        abort(404)
+    #the games analysed so far decide the matrix, so they name it: it is only built again once another one finishes
+    games = [entry for entry in batch["games"] if entry["session_id"] in results_cache]
+    key = "\n".join([batch_id, results_cache.version, fmt] + [entry["session_id"] for entry in games])
+    name = assets.content_name(key.encode(), matrix.EXPORT_FORMATS[fmt][0])
+    download_name = f"batch_matrix_{batch_id[:12]}" + matrix.EXPORT_FORMATS[fmt][0]
+
+    def build():
+        matrices = {}
+        for entry in games:
+            result = results_cache.get(entry["session_id"])
+            if result is not None:
+                matrices[entry["filename"]] = result["matrix"]
+        return matrix_bytes(matrix.stackMatrices(matrices), fmt)
+
+    return send_stored(name, MATRIX_MIMETYPES[fmt], build, download_name)
+
+
+def cached_session(session_id):
+    """
+    the cached analysis of an upload, by the upload's content hash, or a 404. A single upload whose result has
+    gone from the cache (evicted, or made stale by a player merge) is analysed again from its saved file
+    """
+    if not SESSION_ID_RE.fullmatch(session_id):
+        abort(404)
+    result = results_cache.get(session_id)
+    if result is None:
+        filepath = os.path.join(app.config['UPLOAD_FOLDER'], f"{session_id}.csv")
+        if not os.path.exists(filepath):
+            abort(404)
+        result, matrix_file = analyze_upload(filepath, f"{session_id[:12]}.csv", session_id)
+    return result
+
+
+def send_asset(name, mimetype, immutable=False, download_name=None):
+    """
+    A file of the asset store, or its gzip/br copy if the client takes one, tagged with its name so a client that
+    already has it gets a 304. immutable files (named by their contents) may be kept for ASSET_MAX_AGE without
+    asking again; the others are revalidated on every use. None if the file isn't stored
+    """
+    accepted = {encoding for encoding in assets.ENCODINGS if request.accept_encodings.quality(encoding) > 0}
+    found = asset_store.variant(name, accepted)
+    if found is None:
+        return None
+    path, encoding = found
+    etag = name if encoding is None else f"{name}-{encoding}"
+    response = send_file(os.path.abspath(path), mimetype=mimetype, as_attachment=download_name is not None,
+                         download_name=download_name, etag=etag, max_age=app.config['ASSET_MAX_AGE'] if immutable else None)
+    if immutable:
+        response.cache_control.immutable = True
+    if encoding is not None:
+        response.content_encoding = encoding
+    response.vary.add("Accept-Encoding")
+    return response
+
+
+def send_stored(name, mimetype, build, download_name=None):
+    """send_asset for a file stored under name the first time, with build() as its contents, and its compressed copies"""
+    response = send_asset(name, mimetype, download_name=download_name)
+    if response is None:
+        data = build()
+        asset_store.put(name, data, compressed=True)
+        response = send_asset(name, mimetype, download_name=download_name)
+        if response is None:  # bigger than the whole store, so evicted as soon as it was put
+            response = send_file(io.BytesIO(data), mimetype=mimetype, as_attachment=download_name is not None,
+                                 download_name=download_name)
+    return response
+
+
+def session_asset_name(session_id, name):
+    """
+    where one of an upload's responses is stored: by the upload's hash and the cache version,
+    so it is built again when the analysis code changes, as the cached result it comes from is
+    """
+    if not SESSION_ID_RE.fullmatch(session_id):
+        abort(404)
+    return f"{session_id}-{results_cache.version}-{name}"
+
+
+@app.route("/api/session/<session_id>/stats")
+def session_stats(session_id):
+    """the per-player stats and stack timelines the results page draws its charts from"""
+    return send_stored(session_asset_name(session_id, "stats.json"), "application/json",
+                       lambda: app.json.dumps(cached_session(session_id)["stats_json"]).encode())
+
+
+@app.route("/api/session/<session_id>/charts")
+def session_charts(session_id):
+    """
+    the charts rendered server-side as PNGs, for saving. Rendered on first request into the asset store, named by
+    their contents, and linked from the page rather than inlined, so each one is downloaded once per browser
+    """
+    result = cached_session(session_id)
+    charts = result.get("chart_files")
+    if charts is None or any(asset_store.find(name) is None for name in charts):
+        pngs = pipeline.render_charts(result["player_dict"], result["stats"])
+        result["chart_files"] = charts = [asset_store.put_content(png, ".png") for png in pngs]
+        results_cache.put(session_id, result)
+    response = make_response(render_template("index.html", charts=[url_for("chart", name=name) for name in charts]))
+    response.add_etag()
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+
+@app.route("/charts/<name>")
+def chart(name):
+    """a rendered chart PNG, by the hash of its contents: a name's bytes never change, so it is cached for good"""
+    response = send_asset(name, "image/png", immutable=True) if CHART_NAME_RE.fullmatch(name) else None
+    if response is None:
+        abort(404)
+    return response
+
+
+def matrix_bytes(frame, fmt):
+    buf = io.BytesIO()
+    matrix.writeMatrix(frame, buf, fmt)
+    return buf.getvalue()
+
+
+def send_matrix(frame, name, fmt):
+    """
+    a matrix as a download in one of MATRIX_FORMATS, or a 404 for any other format. Stored by its contents,
+    so a client that downloaded the same matrix before gets a 304
+    """
+    if fmt not in MATRIX_FORMATS:
+        abort(404)
+    data = matrix_bytes(frame, fmt)
+    extension = matrix.EXPORT_FORMATS[fmt][0]
+    return send_stored(assets.content_name(data, extension), MATRIX_MIMETYPES[fmt], lambda: data, name + extension)
+
+
+@app.route("/api/session/<session_id>/matrix.<fmt>")
+def session_matrix(session_id, fmt):
+    """one upload's matrix as csv, parquet or arrow, written once and then served from the asset store"""
+    if fmt not in MATRIX_FORMATS:
+        abort(404)
+    extension = matrix.EXPORT_FORMATS[fmt][0]
+    return send_stored(session_asset_name(session_id, "matrix" + extension), MATRIX_MIMETYPES[fmt],
+                       lambda: matrix_bytes(cached_session(session_id)["matrix"], fmt),
+                       f"matrix_{session_id[:12]}{extension}")
+
+
+@app.route("/sessions/matrix.<fmt>")
+def all_sessions_matrix(fmt):
+    """one matrix over every upload, a row per (session, player), for modelling"""
+    return send_matrix(session_store.session_matrix(), "sessions_matrix", fmt)
+
+
+@app.context_processor
+def matrix_formats():
+    return {"matrix_formats": MATRIX_FORMATS}
+
+@app.route("/lifetime")
+def lifetime():
+    """lifetime totals and VPIP/PFR/AF for every player across all uploads, optionally ?player=a&player=b"""
+    players = request.args.getlist("player") or None
+    return jsonify(session_store.lifetime(players))
 
 # Route to download the matrix CSV
 @app.route("/matrices/<filename>")
@@ -90,8 +540,9 @@ def download_matrix(filename):
 # Authorization -- very simple, used to lock admin page
 auth = HTTPBasicAuth()
 
+# Stored hashed, as generate_password_hash("password") returned it: hashing it here on every start took ~150ms (scrypt)
 users = {
-    "admin": generate_password_hash("password")
+    "admin": "scrypt:32768:8:1$ZHe7OEcVNYXtXjrP$0a2a6f3fdcbf7a30b72439d05da51ab790327a42920d59260d9efa999b63471784bb7ece73a8813d98847300388d8d36fad3c18751200433807bf1a9dd37d88b"
 }
 
 @auth.verify_password
@@ -99,15 +550,90 @@ def verify_password(username, password):
     if username in users and check_password_hash(users.get(username), password):
         return username
 
+def is_admin():
+    """whether the request carries the admin's credentials, for the few things any route allows only them"""
+    credentials = request.authorization
+    return bool(credentials and verify_password(credentials.username, credentials.password))
+
 @app.route("/admin")
 @auth.login_required
 def admin():
-    log_path = os.path.join(app.config['UPLOAD_FOLDER'], "upload_log.json")
-    uploads = []
-    if os.path.exists(log_path):
-        with open(log_path, "r") as f:
-            uploads = json.load(f)
-    return render_template("admin.html", uploads=uploads)
+    """the upload log, newest first, a page at a time: ?before=<id>&filename=...&since=YYYY-MM-DD&until=YYYY-MM-DD"""
+    filters = {key: request.args.get(key, "").strip() for key in ("filename", "since", "until")}
+    for key in ("since", "until"):
+        if filters[key] and not DATE_RE.fullmatch(filters[key]):
+            abort(400)
+    before = request.args.get("before", type=int)
+    uploads, next_before = upload_ledger.page(before, app.config['ADMIN_PAGE_SIZE'], **filters)
+    return render_template("admin.html", uploads=uploads, next_before=next_before, filters=filters,
+                           total=upload_ledger.count(), stages=metrics_registry.summary(), players=player_index.players())
+
+@app.route("/admin/players/merge", methods=["POST"])
+@auth.login_required
+def merge_players():
+    """makes every pokernow id of one canonical player (form field name) an id of another (into)"""
+    name, into = request.form.get("name", "").strip(), request.form.get("into", "").strip()
+    if not name or not into or name == into:
+        abort(400)
+    try:
+        player_index.merge(name, into)
+    except KeyError:
+        abort(404)
+    session_store.merge_player(name, into)
+    return redirect(url_for("admin"))
+
+
+@app.route("/admin/players/rename", methods=["POST"])
+@auth.login_required
+def rename_player():
+    """gives a canonical player (form field name) a new name (new_name), which mustn't be taken"""
+    name, new_name = request.form.get("name", "").strip(), request.form.get("new_name", "").strip()
+    if not name or not new_name or name == new_name:
+        abort(400)
+    try:
+        player_index.rename(name, new_name)
+    except KeyError:
+        abort(404)
+    except sqlite3.IntegrityError:
+        abort(409)  # taken: merge into that player instead
+    session_store.merge_player(name, new_name)
+    return redirect(url_for("admin"))
+
+
+@app.route("/admin/upload", methods=["POST"])
+@auth.login_required
+def profiled_upload():
+    """
+    an upload from the admin page's form, profiled. Browsers only send the admin's credentials to /admin paths,
+    which is why this isn't the upload form with a checkbox
+    """
+    return upload_page(profile=True)
+
+
+@app.route("/metrics")
+@auth.login_required
+def metrics_endpoint():
+    """stage timings since the app started, in the Prometheus text format"""
+    return metrics_registry.prometheus(), 200, {"Content-Type": "text/plain; version=0.0.4"}
+
+PROFILE_SORTS = ("cumulative", "tottime", "calls")
+
+@app.route("/admin/profiles/<int:upload_id>")
+@auth.login_required
+def upload_profile(upload_id):
+    """the cProfile dump of a profiled upload: the top functions as text, or ?download=1 for the file"""
+    path = profile_path(upload_id)
+    if not os.path.exists(path):
+        abort(404)
+    if request.args.get("download"):
+        return send_from_directory(os.path.abspath(app.config['PROFILE_FOLDER']), f"{upload_id}.prof",
+                                   as_attachment=True)
+    sort = request.args.get("sort", "cumulative")
+    if sort not in PROFILE_SORTS:
+        abort(400)
+    out = io.StringIO()
+    pstats.Stats(path, stream=out).sort_stats(sort).print_stats(40)
+    return out.getvalue(), 200, {"Content-Type": "text/plain; charset=utf-8"}
 
 if __name__ == "__main__":
     app.run(debug=True)
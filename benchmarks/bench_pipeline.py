@@ -0,0 +1,371 @@
+#bench_pipeline.py
+#times every public function in poker_analysis on synthetic logs of several sizes and writes the
+#results to a JSON file, so a change can be compared against the numbers from before it.
+#Line-level functions (classify, tokenize_entry...) are timed over every line of the log, everything else once per call.
+#
+#usage: python benchmarks/bench_pipeline.py [--sizes 100 1000 5000] [--repeat 5] [--only REGEX]
+#                                           [--output results.json] [--compare old_results.json]
+
+import argparse
+from collections import namedtuple
+import contextlib
+import datetime
+import importlib
+import inspect
+import io
+import json
+import os
+import pkgutil
+import platform
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import zipfile
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import matplotlib  # noqa: E402
+matplotlib.use("Agg")
+
+import poker_analysis  # noqa: E402
+from poker_analysis import assets, batch, cache, combine, equity, live, matrix, metrics, mmaplog, model, parser, patterns, pipeline, plots, render, replay, sessions, stats, streaming, streets, timeline  # noqa: E402
+import synthetic  # noqa: E402
+
+#process lifecycle rather than analysis work, so not timed
+#(bench_startup.py times pipeline.preload, in a fresh process where it means something)
+SKIPPED = {"render.start_pool", "render.configure", "render.shutdown_pool", "pipeline.preload", "batch.run", "batch.main"}
+
+
+class Fixture:
+    """one synthetic log and the intermediate results the functions under test take as input"""
+
+    def __init__(self, path):
+        self.path = path
+        self.df = parser.load_log(path)
+        self.entries = list(self.df["entry"])
+        self.events = parser.tokenize_log(self.df)
+        self.game = model.Game(self.events)
+        self.player_dict = parser.create_player_dict(self.events)
+        self.results = pipeline.compute_stats(self.game, self.player_dict)
+        self.base = matrix.baseStats(self.game, self.player_dict)
+        self.columns = matrix.matrixColumns(self.player_dict, self.base)
+        self.stack_points = {player: list(zip(series.at.astype(str)[::-1], series.stack[::-1]))
+                             for player, series in self.results["player_stacks"].items()}
+        with open(path, "rb") as f:
+            self.raw = f.read()
+        with mmaplog.LogFile(path) as log:
+            self.fields = [(bytes(entry), at, order) for entry, at, order in log.entries()]
+
+    def parts(self):
+        """three overlapping exports of the log, written next to it: newest half, middle half and oldest half"""
+        header, *rows = self.raw.rstrip(b"\n").split(b"\n")
+        n = len(rows)
+        paths = []
+        for i, (start, end) in enumerate(((0, n // 2), (n // 4, n * 3 // 4), (n // 2, n))):
+            path = os.path.join(os.path.dirname(self.path), f"part{i}.csv")
+            with open(path, "wb") as f:
+                f.write(b"\n".join([header] + rows[start:end]) + b"\n")
+            paths.append(path)
+        return paths
+
+    def parts_zip(self):
+        path = os.path.join(os.path.dirname(self.path), "parts.zip")
+        with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+            for part in self.parts():
+                archive.write(part, os.path.basename(part))
+        return path
+
+    def live_session(self):
+        """a live.LiveSession that has seen all but the newest 2% of the log"""
+        header, *rows = self.raw.split(b"\n")
+        older = b"\n".join([header] + rows[len(rows) // 50:])
+        session = live.LiveSession()
+        session.update(io.BytesIO(older))
+        return session
+
+
+#a case whose setup(fixture) isn't timed; run(fixture, setup's result) is
+Prepared = namedtuple("Prepared", ["setup", "run"])
+
+
+def each_line(function):
+    def run(fx):
+        for entry in fx.entries:
+            function(entry)
+    return run
+
+
+def with_game(function, *args):
+    return lambda fx: function(fx.game, fx.player_dict, *args)
+
+
+def part_orders(fx):
+    orders = []
+    for path in fx.parts():
+        with mmaplog.LogFile(path) as log:
+            orders.append(log.spans()[0])
+    return orders
+
+
+def merge_parts(fx, paths):
+    with contextlib.ExitStack() as stack:
+        logs = [stack.enter_context(mmaplog.LogFile(path)) for path in paths]
+        return combine.merge_logs(logs, [log.spans() for log in logs], os.path.join(os.path.dirname(fx.path), "merged.csv"))
+
+
+def all_in_spots(fx):
+    return [result.spot for result in replay.replay_game(fx.game, keep_hands=True).results if result.spot]
+
+
+def preflop_spots(n):
+    """n heads-up all-ins before the flop, random hands, the most expensive spots for ev_nets"""
+    rng = np.random.default_rng(0)
+    spots = []
+    for number in range(n):
+        deck = rng.permutation(52).tolist()
+        spots.append(equity.AllInSpot(number, {"a": tuple(deck[:2]), "b": tuple(deck[2:4])}, [], {"a": 100.0, "b": 100.0}))
+    return spots
+
+
+def stats_bytes(fx):
+    """the stats JSON the results page fetches, as the app stores it"""
+    return json.dumps(pipeline.stats_json(fx.player_dict, fx.results)).encode()
+
+
+#"module.function": function(fixture). Add a case here when adding a public function.
+CASES = {
+    "parser.load_log": lambda fx: parser.load_log(fx.path),
+    "parser.player_verb": each_line(parser.player_verb),
+    "parser.classify": each_line(lambda entry: parser.classify(entry.strip())),
+    "parser.tokenize_entry": each_line(parser.tokenize_entry),
+    "parser.tokenize_log": lambda fx: parser.tokenize_log(fx.df),
+    "parser.load_events": lambda fx: parser.load_events(fx.path),
+    "parser.create_player_dict": lambda fx: parser.create_player_dict(fx.events),
+
+    "patterns.csv_field": lambda fx: [patterns.csv_field(pattern) for pattern in (patterns.ACTION, patterns.STACK, patterns.JOIN)],
+    "mmaplog.row_offsets": lambda fx: mmaplog.row_offsets(fx.raw),
+    "mmaplog.tokenize_entry": lambda fx: [mmaplog.tokenize_entry(entry, at, order) for entry, at, order in fx.fields],
+    "mmaplog.iter_events": lambda fx: sum(1 for _ in mmaplog.iter_events(fx.path)),
+    "mmaplog.load_events": lambda fx: mmaplog.load_events(fx.path),
+
+    "model.parse_timestamps": lambda fx: model.parse_timestamps([event.at for event in fx.events]),
+    "model.Game": lambda fx: model.Game(fx.events),
+    "model.load_game": lambda fx: model.load_game(fx.path),
+
+    "stats.get_action_counts": lambda fx: stats.get_action_counts(fx.game, "calls", fx.player_dict),
+    "stats.calc_aggression_factor": lambda fx: stats.calc_aggression_factor(
+        fx.results["bets"], fx.results["raises"], fx.results["calls"], fx.player_dict),
+    "stats.track_player_presence": with_game(stats.track_player_presence),
+    "stats.get_street_actions": with_game(stats.get_street_actions, "bets", 1),
+    "stats.get_preflop_actions": with_game(stats.get_preflop_actions, "raises"),
+    "stats.get_voluntary_hands": with_game(stats.get_voluntary_hands),
+    "stats.calc_VPIP": with_game(stats.calc_VPIP),
+    "stats.vpip_from_counts": lambda fx: stats.vpip_from_counts(fx.results["hands"], fx.base["vpipHands"]),
+    "stats.calc_PFR": with_game(stats.calc_PFR),
+    "stats.pfr_from_counts": lambda fx: stats.pfr_from_counts(fx.results["hands"], fx.base["preflopRaises"]),
+    "stats.track_player_stacks": with_game(stats.track_player_stacks),
+    "streets.tally_game": lambda fx: streets.tally_game(fx.game).results(
+        fx.results["hands"], lambda actor: fx.game.name_of(actor, fx.player_dict)),
+    "streets.hand_actions": lambda fx: streets.hand_actions(
+        [event for event in reversed(fx.events) if event.kind in (parser.ACTION, parser.STREET)]),
+    "stats.count_shows": with_game(stats.count_shows),
+    "stats.count_stands": with_game(stats.count_stands),
+    "stats.calculate_net_profit": with_game(stats.calculate_net_profit),
+    "stats.calculate_ev_profit": with_game(stats.calculate_ev_profit),
+    "replay.replay_game": lambda fx: replay.replay_game(fx.game, keep_hands=True),
+    "replay.Replay": lambda fx: replay.Replay().add_all(reversed(fx.events)).profits(fx.player_dict),
+
+    "matrix.baseStats": lambda fx: matrix.baseStats(fx.game, fx.player_dict),
+    "matrix.matrixColumns": lambda fx: matrix.matrixColumns(fx.player_dict, fx.base),
+    "matrix.buildMatrix": lambda fx: matrix.buildMatrix(fx.columns),
+    "matrix.constructMatrix": lambda fx: matrix.constructMatrix(fx.path),
+    "matrix.stackMatrices": lambda fx: matrix.stackMatrices({i: matrix.buildMatrix(fx.columns) for i in range(20)}),
+    "matrix.exportFormats": lambda fx: matrix.exportFormats(),
+    "matrix.writeMatrix": lambda fx: matrix.writeMatrix(matrix.buildMatrix(fx.columns), io.StringIO()),
+
+    "streaming.iter_rows": lambda fx: sum(1 for _ in streaming.iter_rows(io.BytesIO(fx.raw))),
+    "streaming.iter_events": lambda fx: sum(1 for _ in streaming.iter_events(io.BytesIO(fx.raw))),
+    "streaming.accumulate": lambda fx: streaming.accumulate(io.BytesIO(fx.raw)).results(),
+
+    "plots.plot_bar_chart": lambda fx: plots.plot_bar_chart(fx.player_dict, fx.results["calls"], "Calls", "Player", "Calls"),
+    "plots.plot_vpip_vs_pfr": lambda fx: plots.plot_vpip_vs_pfr(fx.results["vpip"], fx.results["pfr"], list(fx.results["vpip"])),
+    "plots.plot_vpip_vs_af": lambda fx: plots.plot_vpip_vs_af(fx.results["vpip"], fx.results["af"], list(fx.results["vpip"])),
+    "plots.plot_player_stacks": lambda fx: plots.plot_player_stacks(fx.results["player_stacks"]),
+    "render.render_all": lambda fx: render.render_all(pipeline.chart_jobs(fx.player_dict, fx.results)),
+
+    "pipeline.compute_stats": lambda fx: pipeline.compute_stats(fx.game, fx.player_dict),
+    "pipeline.chart_jobs": lambda fx: pipeline.chart_jobs(fx.player_dict, fx.results),
+    "pipeline.stats_json": lambda fx: pipeline.stats_json(fx.player_dict, fx.results),
+    "pipeline.stack_series": lambda fx: [pipeline.stack_series(data) for data in fx.results["player_stacks"].values()],
+    "pipeline.render_charts": lambda fx: pipeline.render_charts(fx.player_dict, fx.results),
+    "pipeline.analyze": lambda fx: pipeline.analyze(fx.path),
+    "pipeline.analyze (low_memory)": lambda fx: pipeline.analyze(fx.path, low_memory=True),
+    "pipeline.analyze (png charts)": lambda fx: pipeline.analyze(fx.path, charts=True),
+    "pipeline.analyze_live": lambda fx: pipeline.analyze_live(live.LiveSession(), fx.path),
+    "pipeline.analyze_live (2% new rows)": Prepared(lambda fx: fx.live_session(),
+                                                    lambda fx, session: pipeline.analyze_live(session, fx.path)),
+    "pipeline.finish": lambda fx: pipeline.finish(fx.game, fx.player_dict, fx.results, fx.base, False, lambda *args: None),
+
+    "metrics.max_rss": lambda fx: metrics.max_rss(),
+    "metrics.rss": lambda fx: metrics.rss(),
+    "sessions.session_rows": lambda fx: sessions.session_rows(fx.player_dict, fx.base),
+    "sessions.combine_rows": lambda fx: sessions.combine_rows([sessions.session_rows(fx.player_dict, fx.base)] * 30),
+    "sessions.ratios": lambda fx: sessions.ratios(sessions.session_rows(fx.player_dict, fx.base)),
+    "sessions.matrix_from_rows": lambda fx: sessions.matrix_from_rows(sessions.ratios(sessions.session_rows(fx.player_dict, fx.base))),
+
+    "timeline.series_from_points": lambda fx: timeline.series_from_points(fx.stack_points),
+    "timeline.lttb": lambda fx: [timeline.lttb(series.at.astype("int64"), series.stack, 500)
+                                 for series in fx.results["player_stacks"].values()],
+    "timeline.downsample": lambda fx: [timeline.downsample(series, 500) for series in fx.results["player_stacks"].values()],
+
+    "live.session_key": lambda fx: live.session_key(fx.path),
+    "live.newest_order": lambda fx: live.newest_order(fx.path),
+
+    "batch.find_logs": lambda fx: batch.find_logs([os.path.dirname(fx.path)]),
+    "batch.output_names": lambda fx: batch.output_names([fx.path] * 100),
+    "batch.analyze_log": lambda fx: batch.analyze_log(fx.path, os.path.join(os.path.dirname(fx.path), "batch_output")),
+    "batch.write_batch_matrix": lambda fx: batch.write_batch_matrix(
+        [batch.LogResult(fx.path, str(i), 0, 0.0, matrix.buildMatrix(fx.columns), None) for i in range(20)],
+        os.path.join(os.path.dirname(fx.path), "batch_output")),
+
+    "combine.expand_archives": Prepared(lambda fx: fx.parts_zip(), lambda fx, path: combine.expand_archives(
+        [path], os.path.join(os.path.dirname(fx.path), "expanded"))),
+    "combine.group_logs": Prepared(part_orders, lambda fx, orders: combine.group_logs(orders)),
+    "combine.merge_logs": Prepared(lambda fx: fx.parts(), lambda fx, paths: merge_parts(fx, paths)),
+    "combine.combine": Prepared(lambda fx: fx.parts(), lambda fx, paths: combine.combine(
+        paths, os.path.join(os.path.dirname(fx.path), "combined"))),
+
+    "equity.parse_cards": lambda fx: [equity.parse_cards(event.cards or event.detail) for event in fx.events
+                                      if event.kind in (parser.STREET, parser.SHOW)],
+    "equity.build_tables": lambda fx: equity.build_tables(),
+    "equity.load_tables": Prepared(lambda fx: equity.load_tables(os.path.join(os.path.dirname(fx.path), "equity")),
+                                   lambda fx, tables: equity.load_tables(os.path.join(os.path.dirname(fx.path), "equity"))),
+    "equity.tables": lambda fx: equity.tables(),
+    "equity.evaluate": Prepared(lambda fx: np.random.default_rng(0).random((100000, 52)).argsort(axis=1)[:, :7],
+                                lambda fx, hands: equity.evaluate(hands)),
+    "equity.describe": Prepared(lambda fx: equity.evaluate(np.random.default_rng(0).random((10000, 52)).argsort(axis=1)[:, :7]).tolist(),
+                                lambda fx, values: [equity.describe(value) for value in values]),
+    "equity.runouts": Prepared(all_in_spots, lambda fx, spots: [
+        equity.runouts([card for hole in spot.hole.values() for card in hole], spot.board) for spot in spots]),
+    "equity.pots": Prepared(all_in_spots, lambda fx, spots: [equity.pots(spot.committed, list(spot.hole)) for spot in spots]),
+    "equity.ev_nets": Prepared(all_in_spots, lambda fx, spots: equity.ev_nets(spots)),
+    "equity.ev_nets (2000 preflop spots)": Prepared(lambda fx: preflop_spots(2000), lambda fx, spots: equity.ev_nets(spots)),
+    "cache.source_version": lambda fx: cache.source_version(),
+    "cache.file_digest": lambda fx: cache.file_digest(fx.path),
+
+    "assets.encodings": lambda fx: assets.encodings(),
+    "assets.content_name": Prepared(stats_bytes, lambda fx, data: assets.content_name(data, ".json")),
+    "assets.compress": Prepared(stats_bytes, lambda fx, data: assets.compress(data, "gzip")),
+    "assets.AssetStore.put (stats json, compressed)": Prepared(stats_bytes, lambda fx, data: assets.AssetStore(
+        os.path.join(os.path.dirname(fx.path), "assets")).put("stats.json", data, compressed=True)),
+}
+
+
+def public_functions():
+    """'module.function' for every public function defined in the poker_analysis package"""
+    names = set()
+    for info in pkgutil.iter_modules(poker_analysis.__path__):
+        if info.name.startswith("_"):
+            continue
+        module = importlib.import_module(f"poker_analysis.{info.name}")
+        for name, function in inspect.getmembers(module, inspect.isfunction):
+            if not name.startswith("_") and function.__module__ == module.__name__:
+                names.add(f"{info.name}.{name}")
+    return names
+
+
+def time_case(function, fixture, repeat):
+    times = []
+    for _ in range(repeat):
+        if isinstance(function, Prepared):
+            prepared = function.setup(fixture)
+            start = time.perf_counter()
+            function.run(fixture, prepared)
+        else:
+            start = time.perf_counter()
+            function(fixture)
+        times.append(time.perf_counter() - start)
+    return {"min": min(times), "median": statistics.median(times)}
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, old_path):
+    with open(old_path) as f:
+        old = json.load(f)
+    print(f"\ncompared with {old_path} (commit {old.get('commit')}), median new / old:")
+    for size, run in results["sizes"].items():
+        old_run = old["sizes"].get(size)
+        if old_run is None:
+            continue
+        print(f"  {size} hands")
+        for name, timing in run["functions"].items():
+            before = old_run["functions"].get(name)
+            if before:
+                print(f"    {name:<48} {timing['median'] / before['median']:6.2f}x")
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Time every public poker_analysis function on synthetic logs")
+    arg_parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 5000], help="hands per synthetic log")
+    arg_parser.add_argument("--players", type=int, default=9)
+    arg_parser.add_argument("--repeat", type=int, default=5, help="runs per function and size")
+    arg_parser.add_argument("--only", help="only time functions whose name matches this regex")
+    arg_parser.add_argument("--output", default=os.path.join(ROOT, "benchmarks", "results.json"))
+    arg_parser.add_argument("--compare", help="a results file from an earlier run to compare against")
+    args = arg_parser.parse_args()
+
+    missing = public_functions() - {name.split(" ")[0] for name in CASES} - SKIPPED
+    if missing:
+        print("no benchmark case for:", ", ".join(sorted(missing)))
+
+    cases = {name: function for name, function in CASES.items() if not args.only or re.search(args.only, name)}
+    render.start_pool(0)  # render inline so chart timings don't depend on the pool
+
+    results = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "repeat": args.repeat,
+        "uncovered": sorted(missing),
+        "sizes": {},
+    }
+
+    with tempfile.TemporaryDirectory() as directory:
+        for hands in args.sizes:
+            path = os.path.join(directory, f"synthetic-{hands}.csv")
+            log = synthetic.generate(hands, args.players, rebuys=max(hands // 50, 1),
+                                     run_it_twice=max(hands // 40, 1), admin_updates=max(hands // 100, 1))
+            log.write(path)
+            fixture = Fixture(path)
+            print(f"\n{hands} hands, {len(fixture.entries)} lines")
+
+            timings = {}
+            for name, function in cases.items():
+                timings[name] = time_case(function, fixture, args.repeat)
+                print(f"  {name:<48} min {timings[name]['min'] * 1000:10.2f} ms   median {timings[name]['median'] * 1000:10.2f} ms")
+            results["sizes"][str(hands)] = {"lines": len(fixture.entries), "functions": timings}
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nwrote {args.output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
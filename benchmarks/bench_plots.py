@@ -0,0 +1,129 @@
+#bench_plots.py
+#charts per second of the results page charts: the old pyplot functions (a new figure per chart, kept here as a
+#reference) against plots.py's reused figure templates. Both render the same chart_jobs list for one log.
+#
+#usage: python benchmarks/bench_plots.py [log.csv] [--repeat N]
+
+import argparse
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import matplotlib  # noqa: E402
+matplotlib.use("Agg")
+import matplotlib.dates as mdates  # noqa: E402
+import matplotlib.pyplot as plt  # noqa: E402
+
+from poker_analysis import pipeline, plots, render, timeline  # noqa: E402
+
+DEFAULT_LOG = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "PokerLogs", "24_9_19-log.csv")
+
+
+def _pyplot_png(fig):
+    buf = io.BytesIO()
+    plt.tight_layout()
+    plt.savefig(buf, format='png')
+    plt.close(fig)
+    return buf.getvalue()
+
+
+def pyplot_bar_chart(players, data, title, xlabel, ylabel):
+    fig, ax = plt.subplots(figsize=(12, 6))
+    ax.bar(list(players.values()), list(data.values()), color='green')
+    ax.set_xlabel(xlabel, fontsize=14)
+    ax.set_ylabel(ylabel, fontsize=14)
+    ax.set_title(title, fontsize=16)
+    ax.set_xticks(range(len(players)))
+    ax.set_xticklabels(list(players.values()), rotation=45, ha='right', fontsize=12, fontweight='bold')
+    ax.grid(axis='y', linestyle='--', alpha=0.7)
+    return _pyplot_png(fig)
+
+
+def _pyplot_scatter(xs, ys, labels, offset, xlabel, ylabel, title):
+    fig, ax = plt.subplots(figsize=(12, 8))
+    ax.scatter(xs, ys, color='green')
+    for x, y, label in zip(xs, ys, labels):
+        ax.text(x + offset[0], y + offset[1], label, fontsize=14, fontweight='bold', ha='right')
+    ax.set_xlabel(xlabel, fontsize=16)
+    ax.set_ylabel(ylabel, fontsize=16)
+    ax.set_title(title, fontsize=18)
+    ax.grid(True)
+    return _pyplot_png(fig)
+
+
+def pyplot_vpip_vs_pfr(vpip, pfr, players):
+    return _pyplot_scatter([vpip[p] for p in players], [pfr[p] for p in players], players, (1.5, 0.5),
+                           "VPIP (%)", "PFR (%)", "VPIP vs PFR")
+
+
+def pyplot_vpip_vs_af(vpip, af, players):
+    players = [p for p in vpip if p in af]
+    return _pyplot_scatter([vpip[p] for p in players], [af[p] for p in players], players, (2, 0.05),
+                           "VPIP (%)", "Aggression Factor", "VPIP vs Aggression Factor")
+
+
+def pyplot_player_stacks(player_stacks):
+    fig, ax = plt.subplots(figsize=(16, 9))
+    max_points = int(fig.get_figwidth() * fig.dpi)
+    for player, series in player_stacks.items():
+        series = timeline.downsample(series, max_points)
+        ax.plot(series.at, series.stack, label=player)
+    ax.xaxis.set_major_formatter(mdates.DateFormatter('%H:%M'))
+    ax.set_xlabel("Time", fontsize=16)
+    ax.set_ylabel("Stack Size", fontsize=16)
+    ax.set_title("Player Stacks Over Time", fontsize=18)
+    ax.legend(loc='upper left')
+    ax.grid(True)
+    return _pyplot_png(fig)
+
+
+PYPLOT = {
+    "plot_bar_chart": pyplot_bar_chart,
+    "plot_vpip_vs_pfr": pyplot_vpip_vs_pfr,
+    "plot_vpip_vs_af": pyplot_vpip_vs_af,
+    "plot_player_stacks": pyplot_player_stacks,
+}
+
+
+def charts_per_second(variants, jobs, repeat):
+    """best rate of each variant over the whole job list, run round-robin so machine noise hits all of them alike"""
+    best = {name: float("inf") for name in variants}
+    for _ in range(repeat):
+        for name, functions in variants.items():
+            start = time.perf_counter()
+            for function, args in jobs:
+                functions[function](*args)
+            best[name] = min(best[name], time.perf_counter() - start)
+    return {name: len(jobs) / seconds for name, seconds in best.items()}
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("log", nargs="?", default=DEFAULT_LOG)
+    arg_parser.add_argument("--repeat", type=int, default=5, help="runs per variant, the best one is reported")
+    args = arg_parser.parse_args()
+
+    render.start_pool(0)
+    result = pipeline.analyze(args.log)
+    jobs = pipeline.chart_jobs(result["player_dict"], result["stats"])
+    print(f"{len(jobs)} charts for {args.log}, best of {args.repeat}")
+
+    variants = {
+        "pyplot": PYPLOT,
+        "templates": {name: getattr(plots, name) for name in PYPLOT},
+    }
+    #the first template render builds the figures; that one-off cost is not what's being measured
+    for function, args_ in jobs:
+        getattr(plots, function)(*args_)
+
+    rates = charts_per_second(variants, jobs, args.repeat)
+    baseline = rates["pyplot"]
+    for name, rate in rates.items():
+        print(f"{name:>10}: {rate:8.1f} charts/s  ({rate / baseline:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+#bench_startup.py
+#cold start of the Flask app: how long `import app` takes in a fresh interpreter, then how long its first requests
+#take (the upload page, the first upload until its results are ready, the first PNG charts). Run both the way the app
+#starts by default, with pandas and matplotlib imported on first use, and preloaded (PRELOAD=1, so the import
+#includes pipeline.preload) as a parent process that forks the workers would. Every run is a new Python process in an empty working
+#directory, so nothing is cached but the hand evaluator's tables, which are built once for all runs as they are
+#once per install.
+#
+#usage: python benchmarks/bench_startup.py [log.csv] [--repeat N] [--output results-startup.json]
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from poker_analysis import equity  # noqa: E402
+from bench_pipeline import git_commit  # noqa: E402
+
+DEFAULT_LOG = os.path.join(ROOT, "PokerLogs", "24_9_19-log.csv")
+MODES = ("lazy", "preload")
+
+#what each run does, in its own interpreter: argv is the repository and the log, PRELOAD is set for the preload mode.
+#Prints {step: seconds} and the heavy modules that were loaded after the import, as JSON
+CHILD = r"""
+import json, re, sys, time
+root, log = sys.argv[1:3]
+sys.path.insert(0, root)
+timings = {}
+
+start = time.perf_counter()
+import app as app_module
+timings["import app"] = time.perf_counter() - start
+loaded = [name for name in ("pandas", "matplotlib") if name in sys.modules]
+client = app_module.app.test_client()
+
+start = time.perf_counter()
+assert client.get("/").status_code == 200
+timings["GET /"] = time.perf_counter() - start
+
+start = time.perf_counter()
+with open(log, "rb") as f:
+    response = client.post("/", data={"file": (f, "log.csv")}, content_type="multipart/form-data")
+job_id = re.search(rb"/jobs/([0-9a-f]{32})", response.data).group(1).decode()
+while (job := client.get(f"/jobs/{job_id}").get_json())["status"] not in ("done", "failed"):
+    time.sleep(0.005)
+assert job["status"] == "done", job
+fragment = client.get(job["results_url"]).data
+timings["first upload"] = time.perf_counter() - start
+
+start = time.perf_counter()
+charts_url = re.search(rb'href="(/api/session/[0-9a-f]+/charts)"', fragment).group(1).decode()
+assert client.get(charts_url).status_code == 200
+timings["first PNG charts"] = time.perf_counter() - start
+
+app_module.job_runner.shutdown()
+app_module.render.shutdown_pool()
+print(json.dumps({"timings": timings, "loaded": loaded}))
+"""
+
+
+def run_once(log, mode, tables):
+    """one cold start in a new process and working directory, with the evaluator's tables linked into its cache"""
+    with tempfile.TemporaryDirectory() as directory:
+        os.makedirs(os.path.join(directory, "cache"))
+        for path in tables:
+            os.symlink(path, os.path.join(directory, "cache", os.path.basename(path)))
+        env = dict(os.environ, PRELOAD="1" if mode == "preload" else "0")
+        output = subprocess.run([sys.executable, "-c", CHILD, ROOT, os.path.abspath(log)], cwd=directory, env=env,
+                                capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Time the app's import and first requests in fresh processes")
+    arg_parser.add_argument("log", nargs="?", default=DEFAULT_LOG)
+    arg_parser.add_argument("--repeat", type=int, default=5, help="cold starts per mode")
+    arg_parser.add_argument("--output", default=os.path.join(ROOT, "benchmarks", "results-startup.json"))
+    args = arg_parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as table_dir:
+        equity.load_tables(table_dir)
+        tables = [os.path.join(table_dir, name) for name in sorted(os.listdir(table_dir))]
+
+        results = {
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "created": datetime.datetime.now().isoformat(timespec="seconds"),
+            "log": args.log,
+            "repeat": args.repeat,
+            "modes": {},
+        }
+        runs = {mode: [] for mode in MODES}
+        #alternate the modes so machine noise hits both alike
+        for _ in range(args.repeat):
+            for mode in MODES:
+                runs[mode].append(run_once(args.log, mode, tables))
+
+    for mode in MODES:
+        steps = {}
+        for run in runs[mode]:
+            for step, seconds in run["timings"].items():
+                steps.setdefault(step, []).append(seconds)
+        timings = {step: {"min": min(times), "median": statistics.median(times)} for step, times in steps.items()}
+        loaded = runs[mode][0]["loaded"]
+        results["modes"][mode] = {"loaded after import": loaded, "steps": timings}
+
+        print(f"\n{mode} (loaded after import app: {', '.join(loaded) or 'neither pandas nor matplotlib'})")
+        for step, timing in timings.items():
+            print(f"  {step:<20} min {timing['min'] * 1000:10.1f} ms   median {timing['median'] * 1000:10.1f} ms")
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nwrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
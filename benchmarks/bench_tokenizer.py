@@ -0,0 +1,98 @@
+#bench_tokenizer.py
+#lines per second of the line tokenizer, before and after keyword dispatch.
+#"regex first" runs the patterns.py regexes in turn until one matches (what every line paid before parser.classify);
+#"classify + parse" is parser.tokenize_entry as used by the app.
+#
+#usage: python benchmarks/bench_tokenizer.py [log.csv] [--repeat N]
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from poker_analysis import parser, patterns  # noqa: E402
+
+DEFAULT_LOG = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "PokerLogs", "24_9_19-log.csv")
+
+def regex_first(entry, at=None, order=None):
+    """the same Events as parser.tokenize_entry, found by trying each regex in turn"""
+    entry = entry.strip()
+    Event = parser.Event
+
+    match = patterns.DEAD_BLIND.match(entry)
+    if match:
+        return Event(parser.DEAD_BLIND, match.group(2), match.group(1), float(match.group(3)), None, at, order)
+    match = patterns.ACTION.match(entry)
+    if match:
+        amount = float(match.group(4)) if match.group(4) else None
+        return Event(parser.ACTION, match.group(2), match.group(1), amount, match.group(3), at, order)
+    match = patterns.SHOW.match(entry)
+    if match:
+        return Event(parser.SHOW, match.group(2), match.group(1), None, match.group(3), at, order)
+    match = patterns.COLLECT.match(entry)
+    if match:
+        run = 2 if patterns.SECOND_RUN in entry else 1
+        return Event(parser.COLLECT, match.group(2), match.group(1), float(match.group(3)), run, at, order)
+    match = patterns.UNCALLED.match(entry)
+    if match:
+        return Event(parser.UNCALLED, match.group(3), match.group(2), float(match.group(1)), None, at, order)
+    if entry.startswith("Player stacks:"):
+        stacks = [(pid, name, float(stack)) for name, pid, stack in patterns.STACK.findall(entry)]
+        return Event(parser.STACKS, None, None, None, stacks, at, order)
+    match = patterns.HAND_START.match(entry)
+    if match:
+        return Event(parser.HAND_START, None, None, int(match.group(1)), None, at, order)
+    if entry.startswith("-- ending hand"):
+        return Event(parser.HAND_END, None, None, None, None, at, order)
+    match = patterns.STREET.match(entry)
+    if match:
+        return Event(parser.STREET, None, None, None, match.group(1) + (match.group(2) or ""), at, order,
+                     match.group(3).strip())
+    for kind, pattern in ((parser.JOIN, patterns.JOIN), (parser.QUIT, patterns.QUIT), (parser.STAND, patterns.STAND)):
+        match = pattern.search(entry)
+        if match:
+            return Event(kind, match.group(2), match.group(1), float(match.group(3)), None, at, order)
+    match = patterns.ADMIN_UPDATE.search(entry)
+    if match:
+        old_stack, new_stack = float(match.group(3)), float(match.group(4))
+        return Event(parser.ADMIN_UPDATE, match.group(2), match.group(1), new_stack - old_stack, (old_stack, new_stack), at, order)
+    return Event(parser.OTHER, None, None, None, entry, at, order)
+
+
+def lines_per_second(variants, entries, repeat):
+    """best rate of each variant, running them round-robin so machine noise hits all of them alike"""
+    best = {name: float("inf") for name, function in variants}
+    for _ in range(repeat):
+        for name, function in variants:
+            start = time.perf_counter()
+            for entry in entries:
+                function(entry)
+            best[name] = min(best[name], time.perf_counter() - start)
+    return {name: len(entries) / seconds for name, seconds in best.items()}
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("log", nargs="?", default=DEFAULT_LOG)
+    arg_parser.add_argument("--repeat", type=int, default=20, help="runs per variant, the best one is reported")
+    args = arg_parser.parse_args()
+
+    entries = list(parser.load_log(args.log)["entry"])
+    print(f"{len(entries)} lines from {args.log}, best of {args.repeat}")
+    assert [regex_first(entry) for entry in entries] == [parser.tokenize_entry(entry) for entry in entries]
+
+    variants = [
+        ("regex first", regex_first),
+        ("classify only", lambda entry: parser.classify(entry.strip())),
+        ("classify + parse", parser.tokenize_entry),
+    ]
+    rates = lines_per_second(variants, entries, args.repeat)
+    baseline = rates["regex first"]
+    for name, rate in rates.items():
+        print(f"{name:>18}: {rate:12,.0f} lines/s  ({rate / baseline:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+#synthetic.py
+#generates pokernow-format logs of any size for benchmarking. The hands are random but well formed:
+#blinds, betting rounds with all-ins, showdowns, run-it-twice hands, rebuys, admin stack updates,
+#players standing up and quitting, written newest first with the same entry,at,order columns as a real export.
+#
+#usage: python benchmarks/synthetic.py out.csv --hands 5000 --players 9 --rebuys 10 --run-it-twice 20 --admin-updates 10
+
+import argparse
+import csv
+import datetime
+import random
+import string
+
+RANKS = "23456789TJQKA"
+SUITS = "♠♥♦♣"
+RANK_NAMES = {"T": "10"}
+
+START_TIME = datetime.datetime(2024, 9, 20, 3, 42, 0)
+BUY_IN = 100.00
+
+
+def card(code):
+    return RANK_NAMES.get(code[0], code[0]) + code[1]
+
+
+def cards(codes):
+    return ", ".join(card(code) for code in codes)
+
+
+class LogWriter:
+    """collects lines in chronological order with increasing timestamps and order values"""
+
+    def __init__(self, rng):
+        self.rng = rng
+        self.time = START_TIME
+        self.rows = []
+        self.order = 0
+
+    def line(self, entry, seconds=None):
+        self.time += datetime.timedelta(seconds=self.rng.uniform(0.5, 6.0) if seconds is None else seconds)
+        millis = int(self.time.replace(tzinfo=datetime.timezone.utc).timestamp() * 1000)
+        #order values follow the time but must strictly increase, also across lines that share a millisecond
+        self.order = max(self.order + 1, millis * 100)
+        self.rows.append((entry, self.time.strftime("%Y-%m-%dT%H:%M:%S.") + f"{self.time.microsecond // 1000:03d}Z",
+                          self.order))
+
+    def write(self, path):
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["entry", "at", "order"])
+            writer.writerows(reversed(self.rows))
+
+
+class Player:
+    def __init__(self, rng, index):
+        self.name = f"player{index}"
+        self.pid = "".join(rng.choice(string.ascii_letters + string.digits + "-_") for _ in range(10))
+        self.stack = BUY_IN
+        self.seated = False
+
+    @property
+    def tag(self):
+        return f'"{self.name} @ {self.pid}"'
+
+
+class Hand:
+    """one hand's betting state"""
+
+    def __init__(self, players):
+        self.players = players
+        self.active = list(players)
+        self.committed = {p: 0.0 for p in players}
+        self.pot = 0.0
+        self.all_in = set()
+
+    def put_in(self, player, amount):
+        amount = min(amount, player.stack)
+        player.stack = round(player.stack - amount, 2)
+        self.committed[player] = round(self.committed[player] + amount, 2)
+        self.pot = round(self.pot + amount, 2)
+        if player.stack == 0:
+            self.all_in.add(player)
+        return amount
+
+
+def betting_round(log, rng, hand, order, big_blind, to_call=0.0, aggression=0.15):
+    """one street of random checks/bets/calls/raises/folds. Returns True if the hand is still contested"""
+    street_in = {p: (hand.committed[p] if to_call else 0.0) for p in hand.active}
+    acting = [p for p in order if p in hand.active and p not in hand.all_in]
+    raised = False
+
+    for p in acting:
+        if len(hand.active) == 1:
+            break
+        owed = round(to_call - street_in[p], 2)
+        roll = rng.random()
+        if owed > 0 and roll < 0.45:
+            log.line(f"{p.tag} folds")
+            hand.active.remove(p)
+        elif roll < 1 - aggression or raised:
+            if owed > 0:
+                paid = hand.put_in(p, owed)
+                street_in[p] += paid
+                log.line(f"{p.tag} calls {street_in[p]:.2f}" + (" and go all in" if p.stack == 0 else ""))
+            else:
+                log.line(f"{p.tag} checks")
+        else:
+            target = round(max(to_call * 3, big_blind * 2) * rng.choice((1, 1, 1.5, 2)), 2)
+            paid = hand.put_in(p, target - street_in[p])
+            street_in[p] += paid
+            verb = "raises to" if to_call else "bets"
+            log.line(f"{p.tag} {verb} {street_in[p]:.2f}" + (" and go all in" if p.stack == 0 else ""))
+            to_call = max(to_call, street_in[p])
+            raised = True
+
+    #players who acted before the raise call or fold
+    if raised:
+        for p in acting:
+            if p in hand.active and p not in hand.all_in and street_in[p] < to_call and len(hand.active) > 1:
+                if rng.random() < 0.5:
+                    log.line(f"{p.tag} folds")
+                    hand.active.remove(p)
+                else:
+                    paid = hand.put_in(p, to_call - street_in[p])
+                    street_in[p] += paid
+                    log.line(f"{p.tag} calls {street_in[p]:.2f}" + (" and go all in" if p.stack == 0 else ""))
+
+    if len(hand.active) == 1:
+        winner = hand.active[0]
+        others = max((street_in[p] for p in street_in if p is not winner), default=0.0)
+        uncalled = round(street_in[winner] - others, 2)
+        if uncalled > 0:
+            winner.stack = round(winner.stack + uncalled, 2)
+            hand.pot = round(hand.pot - uncalled, 2)
+            log.line(f"Uncalled bet of {uncalled:.2f} returned to {winner.tag}", 0)
+        return False
+    return True
+
+
+def play_hand(log, rng, number, seated, dealer, big_blind, run_it_twice):
+    deck = [r + s for r in RANKS for s in SUITS]
+    rng.shuffle(deck)
+    hole = {p: (deck.pop(), deck.pop()) for p in seated}
+    board = [deck.pop() for _ in range(5)]
+    second_board = [deck.pop() for _ in range(5)]
+
+    order = seated[dealer + 1:] + seated[:dealer + 1]
+    sb, bb = order[0], order[1 % len(order)]
+    hand_id = "".join(rng.choice(string.ascii_lowercase + string.digits) for _ in range(12))
+
+    log.line(f"-- starting hand #{number} (id: {hand_id})  (No Limit Texas Hold'em) (dealer: {seated[dealer].tag}) --")
+    log.line("Player stacks: " + " | ".join(f"#{i + 1} {p.tag} ({p.stack:.2f})" for i, p in enumerate(seated)), 0)
+
+    hand = Hand(seated)
+    log.line(f"{sb.tag} posts a small blind of {hand.put_in(sb, big_blind / 2):.2f}", 0)
+    log.line(f"{bb.tag} posts a big blind of {hand.put_in(bb, big_blind):.2f}", 0)
+
+    preflop_order = order[2:] + order[:2]
+    if run_it_twice:
+        #two players shove preflop and run it twice
+        a, b = preflop_order[0], preflop_order[1 % len(preflop_order)]
+        for p in preflop_order:
+            if p is a:
+                log.line(f"{a.tag} raises to {hand.committed[a] + a.stack:.2f} and go all in")
+                hand.put_in(a, a.stack)
+            elif p is b:
+                log.line(f"{b.tag} calls {hand.committed[b] + b.stack:.2f} and go all in")
+                hand.put_in(b, b.stack)
+            else:
+                log.line(f"{p.tag} folds")
+                hand.active.remove(p)
+        hand.active = [a, b]
+        return finish_run_it_twice(log, rng, number, hand, hole, board, second_board)
+
+    contested = betting_round(log, rng, hand, preflop_order, big_blind, to_call=big_blind)
+    for street, shown in (("Flop", 3), ("Turn", 4), ("River", 5)):
+        if not contested:
+            break
+        if street == "Flop":
+            log.line(f"Flop:  [{cards(board[:3])}]")
+        else:
+            log.line(f"{street}: {cards(board[:shown - 1])} [{card(board[shown - 1])}]")
+        if len([p for p in hand.active if p not in hand.all_in]) > 1:
+            contested = betting_round(log, rng, hand, order, big_blind)
+
+    if len(hand.active) > 1:
+        for p in hand.active:
+            log.line(f"{p.tag} shows a {cards(hole[p])}.", 0)
+    winner = rng.choice(hand.active)
+    winner.stack = round(winner.stack + hand.pot, 2)
+    suffix = f" with Pair, {card(board[0])[:-1]}'s (combination: {cards(board)})" if len(hand.active) > 1 else ""
+    log.line(f"{winner.tag} collected {hand.pot:.2f} from pot{suffix}", 0)
+    log.line(f"-- ending hand #{number} --", 0)
+
+
+def finish_run_it_twice(log, rng, number, hand, hole, board, second_board):
+    log.line("Remaining players decide whether to run it twice.", 0)
+    for p in hand.active:
+        log.line(f"{p.tag} chooses to  run it twice.")
+    log.line("All players in hand choose to run it twice.", 0)
+    for p in hand.active:
+        log.line(f"{p.tag} shows a {cards(hole[p])}.", 0)
+
+    log.line(f"Flop:  [{cards(board[:3])}]")
+    log.line(f"Flop (second run):  [{cards(second_board[:3])}]")
+    log.line(f"Turn: {cards(board[:3])} [{card(board[3])}]")
+    log.line(f"Turn (second run): {cards(second_board[:3])} [{card(second_board[3])}]")
+    log.line(f"River: {cards(board[:4])} [{card(board[4])}]")
+    log.line(f"River (second run): {cards(second_board[:4])} [{card(second_board[4])}]")
+
+    first_half = round(hand.pot / 2, 2)
+    for run, amount, run_board in (("", first_half, board), (" on the second run ", round(hand.pot - first_half, 2), second_board)):
+        winner = rng.choice(hand.active)
+        winner.stack = round(winner.stack + amount, 2)
+        log.line(f"{winner.tag} collected {amount:.2f} from pot with High Card{run} (combination: {cards(run_board)})", 0)
+    log.line(f"-- ending hand #{number} --", 0)
+
+
+def generate(hands=200, players=6, rebuys=2, run_it_twice=3, admin_updates=2, seed=0):
+    """
+    Returns a LogWriter holding a synthetic session. Players join up front, bust and rebuy
+    (up to `rebuys` times in total), some stand up and sit back, and everyone still holding chips quits at the end.
+    """
+    rng = random.Random(seed)
+    log = LogWriter(rng)
+    big_blind = 1.00
+    table = [Player(rng, i) for i in range(players)]
+
+    log.line(f"The game's small blind was changed from 0.10 to {big_blind / 2:.2f}.")
+    log.line(f"The game's big blind was changed from 0.20 to {big_blind:.2f}.", 0)
+    for p in table:
+        log.line(f"The player {p.tag} requested a seat.")
+        log.line(f"The admin approved the player {p.tag} participation with a stack of {int(BUY_IN)}.", 0)
+        log.line(f"The player {p.tag} joined the game with a stack of {p.stack:.2f}.", 0)
+        p.seated = True
+
+    run_it_twice_hands = set(rng.sample(range(1, hands + 1), min(run_it_twice, hands)))
+    admin_hands = set(rng.sample(range(2, hands + 1), min(admin_updates, max(hands - 1, 0))))
+    rebuys_left = rebuys
+    dealer = 0
+
+    for number in range(1, hands + 1):
+        if number in admin_hands:
+            p = rng.choice([p for p in table if p.seated])
+            new_stack = round(p.stack + BUY_IN, 2)
+            log.line(f"The admin updated the player {p.tag} stack from {p.stack:.2f} to {new_stack:.2f}.")
+            p.stack = new_stack
+
+        #now and then someone steps away for a while, or comes back
+        if rng.random() < 0.01:
+            p = rng.choice(table)
+            if p.seated and sum(q.seated for q in table) > 2:
+                log.line(f"The player {p.tag} stand up with the stack of {p.stack:.2f}.")
+                p.seated = False
+            elif not p.seated and p.stack > 0:
+                log.line(f"The player {p.tag} sit back with the stack of {p.stack:.2f}.")
+                p.seated = True
+
+        seated = [p for p in table if p.seated]
+        if len(seated) < 2:
+            break
+        dealer = (dealer + 1) % len(seated)
+        play_hand(log, rng, number, seated, dealer, big_blind, number in run_it_twice_hands)
+
+        for p in seated:
+            if p.stack == 0:
+                log.line(f"The player {p.tag} quits the game with a stack of 0.00.")
+                p.seated = False
+                if rebuys_left > 0:
+                    rebuys_left -= 1
+                    p.stack = BUY_IN
+                    log.line(f"The player {p.tag} joined the game with a stack of {p.stack:.2f}.")
+                    p.seated = True
+
+    for p in table:
+        if p.seated or p.stack > 0:
+            log.line(f"The player {p.tag} quits the game with a stack of {p.stack:.2f}.")
+    return log
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Write a synthetic pokernow log")
+    arg_parser.add_argument("output")
+    arg_parser.add_argument("--hands", type=int, default=200)
+    arg_parser.add_argument("--players", type=int, default=6)
+    arg_parser.add_argument("--rebuys", type=int, default=2)
+    arg_parser.add_argument("--run-it-twice", type=int, default=3)
+    arg_parser.add_argument("--admin-updates", type=int, default=2)
+    arg_parser.add_argument("--seed", type=int, default=0)
+    args = arg_parser.parse_args()
+
+    log = generate(args.hands, args.players, args.rebuys, args.run_it_twice, args.admin_updates, args.seed)
+    log.write(args.output)
+    print(f"wrote {len(log.rows)} lines to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,7 @@
+#__main__.py
+#python -m poker_analysis: the batch command line tool, see batch.py
+
+import sys
+from poker_analysis import batch
+
+sys.exit(batch.main())
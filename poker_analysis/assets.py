@@ -0,0 +1,132 @@
+#assets.py
+#rendered files the app serves again and again (chart PNGs, stats JSON, matrix downloads), kept on disk so a repeat
+#view is a file read instead of a render. Charts are named by the hash of their contents, so a chart's URL never
+#points at different bytes and browsers and CDNs may keep it forever. Stored files can also get gzip (and, with the
+#optional brotli package, br) copies, compressed once when stored rather than on every response.
+
+import gzip
+import hashlib
+import importlib.util
+import os
+import tempfile
+
+#Content-Encoding: file suffix, best first
+ENCODINGS = {"br": ".br", "gzip": ".gz"}
+#a compressed copy is only kept if it is at most this fraction of the original
+MIN_SAVING = 0.9
+#puts between full scans of the directory even while under max_bytes, which also count other processes' files
+SCAN_EVERY = 100
+#once over max_bytes, eviction goes down to this fraction of it, so the puts after it fit without a scan
+EVICT_TO = 0.9
+
+
+def encodings():
+    """the ENCODINGS that can be written here; br needs the optional brotli package"""
+    return [encoding for encoding in ENCODINGS if encoding != "br" or importlib.util.find_spec("brotli") is not None]
+
+
+def compress(data, encoding):
+    if encoding == "gzip":
+        return gzip.compress(data, 9, mtime=0)  # mtime=0: the same bytes always compress to the same file
+    import brotli
+    return brotli.compress(data, quality=9)
+
+
+def content_name(data, extension):
+    """a file name for data that only data has: its sha256, shortened, and the extension"""
+    return hashlib.sha256(data).hexdigest()[:32] + extension
+
+
+class AssetStore:
+    """
+    Files in a directory, by name, with their compressed copies next to them (name.gz, name.br).
+    Reads bump the file's mtime, and puts evict least recently used files until the directory is back under max_bytes.
+    Puts keep a running total of the directory's size and only scan it when that goes over max_bytes, or every
+    SCAN_EVERY puts.
+    """
+
+    def __init__(self, directory, max_bytes=200 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._size = None  # bytes in the directory at the last scan, plus what has been put since
+        self._puts = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def find(self, name):
+        """the path of a stored file, or None"""
+        path = self.path(name)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        for suffix in ENCODINGS.values():
+            try:
+                os.utime(path + suffix)
+            except FileNotFoundError:
+                pass
+        return path
+
+    def variant(self, name, accepted):
+        """
+        (path, encoding) of the copy of a stored file to send to a client that accepts the encodings in accepted,
+        encoding None for the file itself; None if the file isn't stored
+        """
+        path = self.find(name)
+        if path is None:
+            return None
+        for encoding, suffix in ENCODINGS.items():
+            if encoding in accepted and os.path.exists(path + suffix):
+                return path + suffix, encoding
+        return path, None
+
+    def put(self, name, data, compressed=False):
+        """stores data as name, with a copy in every encodings() if compressed. Returns name"""
+        path = self.path(name)
+        files = [(path, data)]
+        if compressed:
+            for encoding in encodings():
+                copy = compress(data, encoding)
+                if len(copy) <= len(data) * MIN_SAVING:
+                    files.append((path + ENCODINGS[encoding], copy))
+        #the copies first, the file itself last: find() only sees a file once all of it is there
+        for target, contents in reversed(files):
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(contents)
+            os.replace(tmp_path, target)
+        size = sum(len(contents) for target, contents in files)
+        self._puts += 1
+        if self._size is None or self._size + size > self.max_bytes or self._puts % SCAN_EVERY == 0:
+            self.evict()
+        else:
+            self._size += size
+        return name
+
+    def put_content(self, data, extension, compressed=False):
+        """stores data under its content_name, unless it already is. Returns the name"""
+        name = content_name(data, extension)
+        if self.find(name) is None:
+            self.put(name, data, compressed)
+        return name
+
+    def evict(self):
+        """drops the least recently used files until under max_bytes (EVICT_TO of it if it was over)"""
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and not entry.name.endswith(".tmp"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for mtime, size, path in entries)
+        limit = self.max_bytes * EVICT_TO if total > self.max_bytes else self.max_bytes
+        for mtime, size, path in sorted(entries):
+            if total <= limit:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+        self._size = total
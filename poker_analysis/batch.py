@@ -0,0 +1,179 @@
+#batch.py
+#offline analysis of a whole archive of logs: python -m poker_analysis PokerLogs/ -o out/
+#Logs are analysed one per worker process; each gets its own folder with its matrix, stats JSON and
+#(optionally) the PNG charts, and the per-log matrices are also stacked into one matrix for the batch.
+#A log that fails to parse is reported and skipped, the rest of the batch carries on.
+
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from poker_analysis import matrix, pipeline, render
+
+LOW_MEMORY_THRESHOLD = 50 * 1024 * 1024  # same default as the app: bigger logs are analysed as a stream
+
+#what a worker sends back for one log; error is None when it worked
+LogResult = namedtuple("LogResult", ["path", "output", "players", "seconds", "matrix", "error"])
+
+
+def find_logs(paths):
+    """the .csv files named by paths (files, directories or glob patterns), sorted and without duplicates"""
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            found += glob.glob(os.path.join(path, "*.csv"))
+        elif glob.has_magic(path):
+            found += [match for match in glob.glob(path, recursive=True) if os.path.isfile(match)]
+        else:
+            found.append(path)
+    return sorted(dict.fromkeys(os.path.normpath(path) for path in found))
+
+
+def output_names(logs):
+    """{log path: output folder name}, the log's file name without .csv, numbered when two logs share one"""
+    names = {}
+    taken = set()
+    for path in logs:
+        stem = os.path.splitext(os.path.basename(path))[0]
+        name, n = stem, 1
+        while name in taken:
+            n += 1
+            name = f"{stem}-{n}"
+        taken.add(name)
+        names[path] = name
+    return names
+
+
+def _init_worker():
+    #charts are rendered inside the worker itself; a pool per worker would only compete for the same cores
+    render.start_pool(0)
+
+
+def analyze_log(path, output, formats=("csv",), charts=False, low_memory_threshold=LOW_MEMORY_THRESHOLD):
+    """
+    Analyses one log and writes output/matrix.<format> for each format, output/stats.json and,
+    with charts, output/chart_NN.png and output/charts.html showing them.
+    Never raises: a failure comes back as LogResult.error.
+    """
+    start = time.perf_counter()
+    try:
+        low_memory = os.path.getsize(path) > low_memory_threshold
+        result = pipeline.analyze(path, low_memory=low_memory, charts=charts)
+
+        os.makedirs(output, exist_ok=True)
+        for fmt in formats:
+            matrix.writeMatrix(result["matrix"], os.path.join(output, "matrix" + matrix.EXPORT_FORMATS[fmt][0]), fmt)
+        with open(os.path.join(output, "stats.json"), "w") as f:
+            json.dump(pipeline.stats_json(result["player_dict"], result["stats"]), f)
+        if charts:
+            images = []
+            for i, png in enumerate(result["charts"], 1):
+                with open(os.path.join(output, f"chart_{i:02d}.png"), "wb") as f:
+                    f.write(png)
+                images.append(f'<img src="chart_{i:02d}.png" />')
+            with open(os.path.join(output, "charts.html"), "w") as f:
+                f.write("<!DOCTYPE html>\n<html><body>\n" + "\n".join(images) + "\n</body></html>\n")
+
+        return LogResult(path, output, len(result["matrix"]), time.perf_counter() - start, result["matrix"], None)
+    except Exception as e:
+        return LogResult(path, output, 0, time.perf_counter() - start, None, f"{type(e).__name__}: {e}")
+
+
+def run(logs, output, workers=None, formats=("csv",), charts=False, low_memory_threshold=LOW_MEMORY_THRESHOLD,
+        report=None):
+    """
+    Analyses logs on a pool of worker processes, writing under output. Returns the LogResults in completion order.
+    report, if given, is called with each LogResult as it finishes.
+    If a worker process dies (e.g. killed for memory) the pool is restarted and the logs it was busy with are
+    given one more try; a log that kills a worker twice is recorded as failed.
+    """
+    names = output_names(logs)
+    results = []
+    pending = list(logs)
+    retried = set()
+
+    while pending:
+        broken = []
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            futures = {
+                pool.submit(analyze_log, path, os.path.join(output, names[path]), formats, charts, low_memory_threshold): path
+                for path in pending
+            }
+            for future in as_completed(futures):
+                path = futures[future]
+                try:
+                    result = future.result()
+                except BrokenProcessPool:
+                    if path not in retried:
+                        broken.append(path)
+                        continue
+                    result = LogResult(path, os.path.join(output, names[path]), 0, 0.0, None, "worker process died")
+                results.append(result)
+                if report is not None:
+                    report(result)
+        retried.update(broken)
+        pending = broken
+
+    return results
+
+
+def write_batch_matrix(results, output, formats=("csv",)):
+    """stacks the matrices of the logs that worked into output/matrix.<format>, indexed by (log, player)"""
+    matrices = {os.path.basename(result.output): result.matrix
+                for result in sorted(results, key=lambda result: result.output) if result.error is None}
+    stacked = matrix.stackMatrices(matrices)
+    os.makedirs(output, exist_ok=True)
+    for fmt in formats:
+        matrix.writeMatrix(stacked, os.path.join(output, "matrix" + matrix.EXPORT_FORMATS[fmt][0]), fmt)
+    return stacked
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(prog="python -m poker_analysis",
+                                         description="Analyse a directory or glob of pokernow logs.")
+    arg_parser.add_argument("paths", nargs="+", help="log files, directories of logs, or glob patterns")
+    arg_parser.add_argument("-o", "--output", default="batch_output", help="folder to write the results to")
+    arg_parser.add_argument("-j", "--workers", type=int, default=None, help="worker processes (default: one per CPU)")
+    arg_parser.add_argument("-f", "--format", action="append", choices=list(matrix.EXPORT_FORMATS), dest="formats",
+                            help="matrix format, can be given more than once (default: csv)")
+    arg_parser.add_argument("--charts", action="store_true", help="also render the PNG charts of each log")
+    arg_parser.add_argument("--low-memory-mb", type=float, default=LOW_MEMORY_THRESHOLD / 1024 / 1024,
+                            help="logs bigger than this are analysed as a stream")
+    args = arg_parser.parse_args(argv)
+
+    formats = args.formats or ["csv"]
+    missing = [fmt for fmt in formats if fmt not in matrix.exportFormats()]
+    if missing:
+        arg_parser.error(f"{', '.join(missing)} needs pyarrow, which isn't installed")
+
+    logs = find_logs(args.paths)
+    if not logs:
+        arg_parser.error("no logs found")
+    total_bytes = sum(os.path.getsize(path) for path in logs if os.path.isfile(path))
+    os.makedirs(args.output, exist_ok=True)
+
+    done = 0
+
+    def report(result):
+        nonlocal done
+        done += 1
+        status = f"{result.players} players" if result.error is None else f"FAILED: {result.error}"
+        print(f"[{done}/{len(logs)}] {result.path}  {result.seconds:.2f}s  {status}", flush=True)
+
+    start = time.perf_counter()
+    results = run(logs, args.output, args.workers, formats, args.charts, int(args.low_memory_mb * 1024 * 1024), report)
+    stacked = write_batch_matrix(results, args.output, formats)
+    elapsed = time.perf_counter() - start
+
+    failed = [result for result in results if result.error is not None]
+    print(f"{len(results) - len(failed)} of {len(logs)} logs analysed in {elapsed:.2f}s: "
+          f"{len(logs) / elapsed:.2f} logs/s, {total_bytes / 1024 / 1024 / elapsed:.2f} MB/s, "
+          f"{len(stacked)} rows in {os.path.join(args.output, 'matrix.*')}")
+    for result in failed:
+        print(f"  failed: {result.path}: {result.error}", file=sys.stderr)
+    return 1 if failed else 0
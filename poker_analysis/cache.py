@@ -0,0 +1,124 @@
+#cache.py
+#content-addressed cache of analysis results, so re-uploading the same log doesn't redo the whole pipeline
+
+import hashlib
+import os
+import pickle
+import tempfile
+
+#modules whose source decides what a cached result looks like. Editing any of them changes
+#CACHE_VERSION, which makes every older entry a miss (they get evicted first)
+VERSIONED_MODULES = ("parser.py", "patterns.py", "model.py", "stats.py", "matrix.py", "plots.py", "pipeline.py",
+                     "streaming.py", "timeline.py", "mmaplog.py", "streets.py",
+                     "replay.py", "equity.py")
+
+
+def source_version(modules=VERSIONED_MODULES):
+    digest = hashlib.sha256()
+    package_dir = os.path.dirname(os.path.abspath(__file__))
+    for module in modules:
+        with open(os.path.join(package_dir, module), "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:12]
+
+
+CACHE_VERSION = source_version()
+
+#puts between full scans of the cache directory even while under max_bytes, which also count what other processes
+#sharing it have written and clear out entries of older versions
+SCAN_EVERY = 100
+#once over max_bytes, eviction goes down to this fraction of it, so the puts after it fit without a scan
+EVICT_TO = 0.9
+
+
+def file_digest(filepath, chunk_size=1 << 20):
+    """sha256 of a file's contents"""
+    digest = hashlib.sha256()
+    with open(filepath, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """
+    Pickled results on disk, one file per (content hash, CACHE_VERSION).
+    Reads bump the file's mtime, and puts evict least recently used entries
+    until the directory is back under max_bytes. Puts keep a running total of the directory's size and only
+    scan it when that goes over max_bytes, or every SCAN_EVERY puts.
+    """
+
+    SUFFIX = ".pkl"
+
+    def __init__(self, directory, max_bytes=500 * 1024 * 1024, version=CACHE_VERSION):
+        """version is a string, or a function returning one when what results depend on can change while running"""
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._version = version
+        self._size = None  # bytes in the directory at the last scan, plus what has been put since
+        self._puts = 0
+        os.makedirs(directory, exist_ok=True)
+
+    @property
+    def version(self):
+        return self._version() if callable(self._version) else self._version
+
+    def path(self, key):
+        return os.path.join(self.directory, f"{key}-{self.version}{self.SUFFIX}")
+
+    def __contains__(self, key):
+        """whether key has an entry, without reading it"""
+        return os.path.exists(self.path(key))
+
+    def get(self, key):
+        path = self.path(key)
+        try:
+            with open(path, "rb") as f:
+                result = pickle.load(f)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass  # evicted by another process since it was read; the result is still good
+        return result
+
+    def put(self, key, result):
+        #write to a temp file and rename so a concurrent get never sees half an entry
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+            size = f.tell()
+        os.replace(tmp_path, self.path(key))
+        self._puts += 1
+        if self._size is None or self._size + size > self.max_bytes or self._puts % SCAN_EVERY == 0:
+            self.evict()
+        else:
+            self._size += size
+
+    def entries(self):
+        """(is current version, mtime, size, path) for every entry, stale versions first, then least recently used"""
+        entries = []
+        current_suffix = f"-{self.version}{self.SUFFIX}"
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(self.SUFFIX):
+                stat = entry.stat()
+                current = entry.name.endswith(current_suffix)
+                entries.append((current, stat.st_mtime, stat.st_size, entry.path))
+        entries.sort()
+        return entries
+
+    def evict(self):
+        """drops entries from older versions, then LRU entries until under max_bytes (EVICT_TO of it if it was over)"""
+        entries = self.entries()
+        total = sum(size for current, mtime, size, path in entries)
+        limit = self.max_bytes * EVICT_TO if total > self.max_bytes else self.max_bytes
+        for current, mtime, size, path in entries:
+            if current and total <= limit:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+        self._size = total
@@ -0,0 +1,144 @@
+#combine.py
+#many logs uploaded at once, loose or in zip archives. pokernow exports of the same room overlap whenever one was
+#downloaded before the game ended and another after, so logs that share a row (the same order value) are parts of
+#one game: their rows are merged into a single log, each row once, before anything is parsed.
+#Only each file's row index is read to do this (mmaplog.LogFile.spans), and the merged log is then parsed once,
+#rather than every overlapping row once per file it appears in.
+
+import contextlib
+import os
+import zipfile
+from collections import namedtuple
+import numpy as np
+from poker_analysis import mmaplog
+
+#a game made of one or more logs: path of its (merged) log, the files it came from, its rows,
+#and how many rows were left out because another file already had them
+CombinedLog = namedtuple("CombinedLog", ["path", "logs", "rows", "duplicates"])
+
+
+class TooLarge(ValueError):
+    """Raised by expand_archives when the logs add up to more files or bytes than allowed."""
+
+
+def expand_archives(paths, directory, max_files=100, max_bytes=1024 * 1024 * 1024):
+    """
+    The .csv files among paths, then every .csv inside a .zip among them, extracted into directory (numbered when
+    two share a name; folders inside the archive are flattened). Raises TooLarge past max_files logs or
+    max_bytes of them in total, checked before anything is extracted; a bad archive raises zipfile.BadZipFile.
+    """
+    logs, members, total = [], [], 0
+    for path in paths:
+        if path.lower().endswith(".zip"):
+            with zipfile.ZipFile(path) as archive:
+                for info in archive.infolist():
+                    if not info.is_dir() and info.filename.lower().endswith(".csv"):
+                        members.append((path, info))
+                        total += info.file_size
+        else:
+            logs.append(path)
+            total += os.path.getsize(path)
+
+    if len(logs) + len(members) > max_files:
+        raise TooLarge(f"{len(logs) + len(members)} logs, at most {max_files} can be uploaded at once")
+    if total > max_bytes:
+        raise TooLarge(f"{total} bytes of logs, at most {max_bytes} can be uploaded at once")
+
+    taken = {os.path.basename(path).lower() for path in logs}
+    os.makedirs(directory, exist_ok=True)
+    for path, info in members:
+        stem = os.path.splitext(os.path.basename(info.filename))[0]
+        name, n = stem + ".csv", 1
+        while name.lower() in taken:
+            n += 1
+            name = f"{stem}-{n}.csv"
+        taken.add(name.lower())
+        target = os.path.join(directory, name)
+        #the declared size bounds the read, so a member can't expand past what was counted above
+        with zipfile.ZipFile(path) as archive, archive.open(info) as source, open(target, "wb") as f:
+            while chunk := source.read(1 << 20):
+                f.write(chunk)
+        logs.append(target)
+    return logs
+
+
+def group_logs(orders):
+    """
+    Which logs overlap: orders is a list of NumPy arrays, the order values of each log's rows.
+    Returns lists of log indices, every log in exactly one, logs that share an order value (directly or through
+    another log) in the same list, and the lists ordered by their first log
+    """
+    parent = list(range(len(orders)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    if orders:
+        values = np.concatenate(orders)
+        owner = np.repeat(np.arange(len(orders)), [len(log) for log in orders])
+        by_value = np.argsort(values, kind="stable")
+        values, owner = values[by_value], owner[by_value]
+        shared = (values[1:] == values[:-1]) & (owner[1:] != owner[:-1])
+        for a, b in np.unique(np.stack([owner[:-1][shared], owner[1:][shared]], axis=1), axis=0).tolist():
+            parent[find(a)] = find(b)
+
+    groups = {}
+    for i in range(len(orders)):
+        groups.setdefault(find(i), []).append(i)
+    return list(groups.values())
+
+
+def merge_logs(logs, spans, path):
+    """
+    Writes the rows of several open mmaplog.LogFiles, with their spans(), to path as one log: newest first,
+    each order value once (the copy in the first log that has it). Returns (rows written, rows left out)
+    """
+    orders = np.concatenate([log_orders for log_orders, starts, ends in spans])
+    owner = np.repeat(np.arange(len(logs)), [len(log_orders) for log_orders, starts, ends in spans])
+    row = np.concatenate([np.arange(len(log_orders)) for log_orders, starts, ends in spans])
+
+    #np.unique keeps the first of each order value, which is the earliest log's copy as logs are concatenated in order
+    first = np.unique(orders, return_index=True)[1]
+    keep = first[::-1]  # newest first
+
+    with open(path, "wb") as f:
+        f.write(mmaplog.HEADER + b"\n")
+        for i, r in zip(owner[keep].tolist(), row[keep].tolist()):
+            log_orders, starts, ends = spans[i]
+            f.write(logs[i].rows(int(starts[r]), int(ends[r])))
+            f.write(b"\n")
+    return len(keep), len(orders) - len(keep)
+
+
+def combine(paths, directory):
+    """
+    Groups the logs at paths into games by their overlap and merges each game that has more than one log into
+    directory. Returns ([CombinedLog] in the order of each game's first log, [(path, error)] for the files that
+    aren't pokernow logs); a game of a single log keeps its own file.
+    """
+    logs, skipped = [], []
+    with contextlib.ExitStack() as stack:
+        for path in paths:
+            try:
+                log = stack.enter_context(mmaplog.LogFile(path))
+                logs.append((path, log, log.spans()))
+            except (OSError, ValueError) as e:
+                skipped.append((path, f"{type(e).__name__}: {e}"))
+
+        combined = []
+        for group in group_logs([spans[0] for path, log, spans in logs]):
+            members = [logs[i] for i in group]
+            group_paths = [path for path, log, spans in members]
+            if len(members) == 1:
+                combined.append(CombinedLog(group_paths[0], group_paths, len(members[0][2][0]), 0))
+                continue
+            stem = os.path.splitext(os.path.basename(group_paths[0]))[0]
+            merged = os.path.join(directory, f"{stem}_merged_{len(members)}.csv")
+            os.makedirs(directory, exist_ok=True)
+            rows, duplicates = merge_logs([log for path, log, spans in members],
+                                          [spans for path, log, spans in members], merged)
+            combined.append(CombinedLog(merged, group_paths, rows, duplicates))
+    return combined, skipped
@@ -0,0 +1,296 @@
+#equity.py
+#all-in equity and luck-adjusted (EV) profit. When the betting is over with two or more players left and every one
+#of them has shown their cards, the rest of the board decides the hand; a player's EV in it is their share of each
+#pot they are in, weighted by how often their cards win it, instead of what the cards that came actually gave them.
+#Hands are ranked by a table-driven 7-card evaluator: the ranks of 7 cards without a flush always make the same hand,
+#so every one of the 49205 rank multisets is ranked once, in a table indexed by the sum of a key per card
+#(RANK_KEYS, chosen so no two multisets add up the same), and flushes by a table over the 8192 rank masks of a suit.
+#The tables are built once, saved as .npy files and memory-mapped from then on. The runouts of a session's spots
+#(all of them when there are few, a sample when there are many) are ranked a few hundred spots at a time, as
+#NumPy arrays, so thousands of spots take well under a second.
+
+import itertools
+import math
+import os
+import re
+import tempfile
+from collections import namedtuple
+from functools import lru_cache
+import numpy as np
+
+RANKS = "23456789TJQKA"
+SUITS = "♠♥♦♣"
+CARD = re.compile(r"(10|[2-9TJQKA])([♠♥♦♣])")
+
+#hand values: category << 20, then up to five ranks that break ties, highest first, 4 bits each
+HIGH_CARD, PAIR, TWO_PAIR, TRIPS, STRAIGHT, FLUSH, FULL_HOUSE, QUADS, STRAIGHT_FLUSH = range(9)
+CATEGORIES = ("High Card", "Pair", "Two Pair", "Three of a Kind", "Straight", "Flush", "Full House",
+              "Four of a Kind", "Straight Flush")
+
+TABLE_VERSION = 2
+TABLE_DIR = os.path.join(tempfile.gettempdir(), "poker_analysis")  # where tables() keeps them unless told otherwise
+#per rank, the smallest keys (found greedily) whose sums over 7 cards tell every rank multiset apart
+RANK_KEYS = np.array([0, 1, 5, 22, 98, 453, 2031, 8698, 22854, 83661, 262349, 636345, 1479181], dtype=np.int64)
+#per suit, so the sum over 7 cards holds the count of each suit in 3 bits; FLUSH_SUITS maps it to the suit of 5+ cards
+SUIT_KEYS = np.array([1, 8, 64, 512], dtype=np.int64)
+FLUSH_SUITS = np.full(4096, -1, dtype=np.int8)
+for _suit in range(4):
+    FLUSH_SUITS[(np.arange(4096) >> 3 * _suit & 7) >= 5] = _suit
+#both keys of each card code in one number, rank key << 12 | suit key, so one lookup and sum gives both sums
+CARD_KEYS = (RANK_KEYS[:, None] << 12 | SUIT_KEYS[None, :]).ravel()
+_BIT = 1 << np.arange(13, dtype=np.int64)
+_CHUNK = 1 << 16  # hands ranked per pass, bounds the temporary arrays
+_SPOT_BATCH = 256  # spots whose runouts ev_nets ranks together
+
+SAMPLES = 1000  # runouts sampled for a spot with more than MAX_EXACT possible ones (all of them from the flop on)
+MAX_EXACT = 1000
+SEED = 1913
+
+#one all-in hand: hole {pid: (card, card)} of the players still in, board the cards dealt when the betting ended,
+#committed {pid: chips} of everyone who put chips in (folded players included) and number the hand's number,
+#which seeds the sampling so a spot gets the same EV however the log is read
+AllInSpot = namedtuple("AllInSpot", ["number", "hole", "board", "committed"])
+
+_tables = None
+
+
+def parse_cards(text):
+    """card codes (rank * 4 + suit) of the cards in a line, in the order they appear: "8♦, 10♥" -> [26, 33]"""
+    return [RANKS.index("T" if rank == "10" else rank) * 4 + SUITS.index(suit) for rank, suit in CARD.findall(text)]
+
+
+def _value(category, ranks):
+    value = category
+    for i in range(5):
+        value = value << 4 | (ranks[i] if i < len(ranks) else 0)
+    return value
+
+
+def _straight(mask):
+    """the top rank of the highest straight in a 13-bit rank mask, or None (the wheel, A-5, tops at 5)"""
+    for top in range(12, 3, -1):
+        if mask >> (top - 4) & 0b11111 == 0b11111:
+            return top
+    if mask & 0b1000000001111 == 0b1000000001111:
+        return 3
+    return None
+
+
+def _rank_value(counts):
+    """the value of the best hand in a rank multiset of 7 cards, suits ignored"""
+    by_count = sorted((rank for rank in range(13) if counts[rank]), key=lambda rank: (counts[rank], rank), reverse=True)
+    mask = sum(1 << rank for rank in by_count)
+    best = by_count[0]
+    if counts[best] == 4:
+        return _value(QUADS, [best, max(rank for rank in by_count if rank != best)])
+    if counts[best] == 3:
+        pairs = [rank for rank in by_count[1:] if counts[rank] >= 2]
+        if pairs:
+            return _value(FULL_HOUSE, [best, max(pairs)])
+    top = _straight(mask)
+    if top is not None:
+        return _value(STRAIGHT, [top])
+    if counts[best] == 3:
+        return _value(TRIPS, [best] + sorted(by_count[1:], reverse=True)[:2])
+    if counts[best] == 2:
+        pairs = sorted((rank for rank in by_count if counts[rank] == 2), reverse=True)
+        if len(pairs) >= 2:
+            kicker = max(rank for rank in by_count if rank not in pairs[:2])
+            return _value(TWO_PAIR, pairs[:2] + [kicker])
+        return _value(PAIR, [best] + sorted(by_count[1:], reverse=True)[:3])
+    return _value(HIGH_CARD, sorted(by_count, reverse=True)[:5])
+
+
+def build_tables():
+    """
+    (rank_table, flush_table): rank_table holds the value of each 7-card rank multiset at the sum of its RANK_KEYS
+    (7.8 million entries, mostly unused); flush_table the value of the best flush or straight flush in each
+    13-bit mask of one suit's ranks (0 for fewer than 5 ranks)
+    """
+    rank_table = np.zeros(int(RANK_KEYS[-1] * 4 + RANK_KEYS[-2] * 3) + 1, dtype=np.int32)
+    for ranks in itertools.combinations_with_replacement(range(13), 7):
+        counts = [0] * 13
+        for rank in ranks:
+            counts[rank] += 1
+        if max(counts) <= 4:
+            rank_table[int(RANK_KEYS[list(ranks)].sum())] = _rank_value(counts)
+
+    flush_table = np.zeros(1 << 13, dtype=np.int32)
+    for mask in range(1 << 13):
+        if bin(mask).count("1") >= 5:
+            top = _straight(mask)
+            if top is not None:
+                flush_table[mask] = _value(STRAIGHT_FLUSH, [top])
+            else:
+                flush_table[mask] = _value(FLUSH, [rank for rank in range(12, -1, -1) if mask >> rank & 1][:5])
+    return rank_table, flush_table
+
+
+def load_tables(directory=TABLE_DIR):
+    """
+    Memory-maps the evaluator's tables from directory, building and saving them there first if they aren't yet.
+    If directory can't be written the tables are kept in memory instead. Returns them, and tables() from then on
+    """
+    global _tables
+    paths = [os.path.join(directory, f"{name}_v{TABLE_VERSION}.npy") for name in ("hand_ranks", "flush_ranks")]
+    if not all(os.path.exists(path) for path in paths):
+        built = build_tables()
+        try:
+            os.makedirs(directory, exist_ok=True)
+            for path, table in zip(paths, built):
+                fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".npy")
+                with os.fdopen(fd, "wb") as f:
+                    np.save(f, table)
+                os.replace(tmp_path, path)
+        except OSError:
+            _tables = built
+            return _tables
+    _tables = tuple(np.load(path, mmap_mode="r") for path in paths)
+    return _tables
+
+
+def tables():
+    return _tables if _tables is not None else load_tables()
+
+
+def _key_sums(cards):
+    """the sum of CARD_KEYS over each row of an array of card codes, a column at a time (quicker than .sum(axis=1))"""
+    sums = CARD_KEYS[cards[:, 0]]
+    for column in range(1, cards.shape[1]):
+        sums += CARD_KEYS[cards[:, column]]
+    return sums
+
+
+def _values(key_sums, cards):
+    """hand values from the sums of CARD_KEYS over each hand's 7 cards; cards(rows) gives those rows' cards"""
+    rank_table, flush_table = tables()
+    values = rank_table[key_sums >> 12].astype(np.int64)
+    flush_suit = FLUSH_SUITS[key_sums & 4095]
+    flush = np.flatnonzero(flush_suit >= 0)
+    if len(flush):
+        flush_cards = cards(flush)
+        mask = (_BIT[flush_cards >> 2] * (flush_cards & 3 == flush_suit[flush, None])).sum(axis=1)
+        values[flush] = np.maximum(values[flush], flush_table[mask])
+    return values
+
+
+def evaluate(cards):
+    """values of 7-card hands, an (n, 7) array of card codes; the higher value wins, equal values split"""
+    cards = np.asarray(cards, dtype=np.int64).reshape(-1, 7)
+    values = np.empty(len(cards), dtype=np.int64)
+    for start in range(0, len(cards), _CHUNK):
+        chunk = cards[start:start + _CHUNK]
+        values[start:start + len(chunk)] = _values(_key_sums(chunk), chunk.__getitem__)
+    return values
+
+
+def describe(value):
+    """the category name of a hand value"""
+    return CATEGORIES[int(value) >> 20]
+
+
+@lru_cache(maxsize=None)
+def _combinations(deck, need):
+    return np.array(list(itertools.combinations(range(deck), need)), dtype=np.int64).reshape(-1, need)
+
+
+def runouts(dead, board, samples=SAMPLES, max_exact=MAX_EXACT, rng=None):
+    """
+    The ways the board can be completed: every one if there are at most max_exact, else `samples` drawn at random
+    (each without repeating a card). dead are the cards known to be out of the deck, board the cards dealt so far.
+    Returns an (n, 5 - len(board)) array of card codes, each row equally likely
+    """
+    need = 5 - len(board)
+    in_deck = np.ones(52, dtype=bool)
+    in_deck[list(dead) + list(board)] = False
+    deck = np.flatnonzero(in_deck)
+    if need == 0:
+        return np.empty((1, 0), dtype=np.int64)
+    if math.comb(len(deck), need) <= max_exact:
+        return deck[_combinations(len(deck), need)]
+    rng = rng if rng is not None else np.random.default_rng(SEED)
+    return rng.permutation(deck)[_draws(len(deck), need, samples)]
+
+
+@lru_cache(maxsize=None)
+def _draws(deck, need, samples):
+    """
+    `samples` rows of `need` distinct positions in a deck, drawn once; runouts() reads them off a fresh shuffle
+    of each spot's deck, which makes every row a uniform draw of that deck for a fraction of the cost
+    """
+    rng = np.random.default_rng(SEED)
+    draws = rng.integers(0, deck, (samples, need))
+    while True:
+        ordered = np.sort(draws, axis=1)
+        repeats = np.flatnonzero((ordered[:, 1:] == ordered[:, :-1]).any(axis=1))
+        if not len(repeats):
+            return draws
+        draws[repeats] = rng.integers(0, deck, (len(repeats), need))
+
+
+def pots(committed, contesting):
+    """
+    The main pot and side pots of a hand: [(chips, [pids that can win them])], from what everyone committed
+    and the players still in. Chips of folded players go into the pots they reached
+    """
+    levels = sorted({committed[pid] for pid in contesting})
+    result, previous = [], 0.0
+    for level in levels:
+        chips = sum(min(max(amount - previous, 0.0), level - previous) for amount in committed.values())
+        result.append((chips, [pid for pid in contesting if committed[pid] >= level]))
+        previous = level
+    extra = sum(max(amount - previous, 0.0) for amount in committed.values())
+    if extra and result:
+        result[-1] = (result[-1][0] + extra, result[-1][1])
+    return result
+
+
+def ev_nets(spots, samples=SAMPLES, max_exact=MAX_EXACT):
+    """
+    [{pid: EV of the hand in chips}] for a list of AllInSpots, the expected share of every pot the player is in
+    minus what they committed, over the runouts of each spot. The runouts of many spots are ranked together,
+    each board's key sums once for all the players who share it
+    """
+    results = []
+    for start in range(0, len(spots), _SPOT_BATCH):
+        results.extend(_ev_batch(spots[start:start + _SPOT_BATCH], samples, max_exact))
+    return results
+
+
+def _ev_batch(spots, samples, max_exact):
+    boards, holes, layout = [], [], []
+    for spot in spots:
+        players = list(spot.hole)
+        dead = [card for pid in players for card in spot.hole[pid]]
+        rest = runouts(dead, spot.board, samples, max_exact, np.random.default_rng([SEED, spot.number]))
+        boards.append(np.hstack([np.broadcast_to(np.array(spot.board, dtype=np.int64), (len(rest), len(spot.board))),
+                                 rest]))
+        holes.extend(spot.hole[pid] for pid in players)
+        layout.append((players, len(rest)))
+    if not boards:
+        return []
+
+    #hand i of the batch is hole hand[i] on board row[i]; spot by spot, each player's hole on every runout
+    sizes = np.array([n for players, n in layout for pid in players])
+    first_row = np.cumsum([0] + [n for players, n in layout])[:-1]
+    hand = np.repeat(np.arange(len(holes)), sizes)
+    row = np.arange(len(hand)) - np.repeat(np.cumsum(sizes) - sizes, sizes) + \
+        np.repeat(np.repeat(first_row, [len(players) for players, n in layout]), sizes)
+
+    boards, holes = np.concatenate(boards), np.array(holes, dtype=np.int64)
+    key_sums = _key_sums(boards)[row] + _key_sums(holes)[hand]
+    values = _values(key_sums, lambda flush: np.hstack([holes[hand[flush]], boards[row[flush]]]))
+
+    results, start = [], 0
+    for spot, (players, n) in zip(spots, layout):
+        spot_values = values[start:start + n * len(players)].reshape(len(players), n)
+        start += n * len(players)
+        ev = {pid: -amount for pid, amount in spot.committed.items()}
+        for chips, eligible in pots(spot.committed, players):
+            hands = spot_values[[players.index(pid) for pid in eligible]]
+            best = hands == hands.max(axis=0)
+            shares = (best / best.sum(axis=0)).mean(axis=1)
+            for pid, share in zip(eligible, shares.tolist()):
+                ev[pid] += chips * share
+        results.append({pid: round(chips, 2) for pid, chips in ev.items()})
+    return results
@@ -0,0 +1,140 @@
+#identity.py
+#persistent mapping from pokernow player ids to canonical players. pokernow hands out a new id whenever
+#someone rejoins from another device, so the same person shows up under several ids (and sometimes names);
+#every id is resolved to one canonical name when a log is decoded, and the stats are keyed by that name
+
+import contextlib
+import sqlite3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS players (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS aliases (
+    pokernow_id TEXT PRIMARY KEY,
+    player_id INTEGER NOT NULL REFERENCES players(id),
+    display_name TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS aliases_player ON aliases (player_id);
+CREATE TABLE IF NOT EXISTS generation (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO generation (id, value) VALUES (0, 0);
+"""
+
+
+class PlayerIndex:
+    """
+    SQLite file mapping pokernow ids to canonical players.
+    An id seen for the first time joins the canonical player with the same display name if there is one,
+    otherwise it starts a new player; merge() and rename() fix up the cases that rule gets wrong.
+    Resolved ids are kept in memory, so a log only touches the database for ids it hasn't seen before.
+    merge() and rename() bump a generation counter in the database, in whichever process runs them; resolve() drops
+    what it kept when the counter has moved, and callers that keep results by canonical name key them by generation().
+    """
+
+    #where SQLite keeps its file change counter in the database header, bumped by every write transaction
+    #(the database isn't in WAL mode, which would leave it alone)
+    CHANGE_COUNTER = slice(24, 28)
+
+    def __init__(self, path):
+        self.path = path
+        self._names = {}  # pokernow id: canonical name
+        self._generation = None  # the generation _names was resolved in
+        self._latest = None  # (file change counter, generation) as generation() last read them
+        with self._connect() as db:
+            db.executescript(SCHEMA)
+
+    @contextlib.contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=30)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def resolve(self, player_dict):
+        """{pokernow id: display name} -> {pokernow id: canonical name}, adding any ids not seen before"""
+        with self._connect() as db:
+            generation = self._read_generation(db)
+            if generation != self._generation:
+                #merged or renamed since, maybe by another process. A new dict rather than clear(),
+                #so a resolve running on another thread keeps a consistent one
+                self._names, self._generation = {}, generation
+            names = self._names
+
+            missing = [pid for pid in player_dict if pid not in names]
+            for start in range(0, len(missing), 500):
+                chunk = missing[start:start + 500]
+                rows = db.execute("SELECT pokernow_id, name FROM aliases JOIN players ON players.id = player_id "
+                                  f"WHERE pokernow_id IN ({', '.join('?' for _ in chunk)})", chunk)
+                names.update(rows)
+
+            for pid in missing:
+                if pid not in names:
+                    names[pid] = self._add_alias(db, pid, player_dict[pid])
+
+        return {pid: names[pid] for pid in player_dict}
+
+    def generation(self):
+        """
+        how many merges and renames there have been: canonical names only change when this does.
+        Read from the database only when the file has been written since, so it is cheap enough to ask on every
+        cache lookup
+        """
+        counter = self._change_counter()
+        latest = self._latest
+        if latest is None or latest[0] != counter:
+            with self._connect() as db:
+                latest = self._latest = (counter, self._read_generation(db))
+        return latest[1]
+
+    def _change_counter(self):
+        with open(self.path, "rb") as f:
+            return f.read(self.CHANGE_COUNTER.stop)[self.CHANGE_COUNTER]
+
+    def _read_generation(self, db):
+        return db.execute("SELECT value FROM generation WHERE id = 0").fetchone()[0]
+
+    def _add_alias(self, db, pid, display_name):
+        db.execute("INSERT OR IGNORE INTO players (name) VALUES (?)", (display_name,))
+        player_id, name = db.execute("SELECT id, name FROM players WHERE name = ?", (display_name,)).fetchone()
+        db.execute("INSERT OR IGNORE INTO aliases (pokernow_id, player_id, display_name) VALUES (?, ?, ?)",
+                   (pid, player_id, display_name))
+        return name
+
+    def players(self):
+        """{canonical name: [(pokernow id, display name)]}"""
+        result = {}
+        with self._connect() as db:
+            rows = db.execute("SELECT name, pokernow_id, display_name FROM players "
+                              "LEFT JOIN aliases ON aliases.player_id = players.id ORDER BY players.id")
+            for name, pid, display_name in rows:
+                result.setdefault(name, [])
+                if pid is not None:
+                    result[name].append((pid, display_name))
+        return result
+
+    def merge(self, name, into):
+        """Makes every id of canonical player `name` an alias of `into` and removes `name`."""
+        with self._connect() as db:
+            source = db.execute("SELECT id FROM players WHERE name = ?", (name,)).fetchone()
+            target = db.execute("SELECT id FROM players WHERE name = ?", (into,)).fetchone()
+            if source is None or target is None:
+                raise KeyError(name if source is None else into)
+            db.execute("UPDATE aliases SET player_id = ? WHERE player_id = ?", (target[0], source[0]))
+            db.execute("DELETE FROM players WHERE id = ?", (source[0],))
+            db.execute("UPDATE generation SET value = value + 1 WHERE id = 0")
+        self._names = {}
+
+    def rename(self, name, new_name):
+        """Renames canonical player `name`. Raises KeyError if there is none, sqlite3.IntegrityError if new_name is taken"""
+        with self._connect() as db:
+            cursor = db.execute("UPDATE players SET name = ? WHERE name = ?", (new_name, name))
+            if cursor.rowcount == 0:
+                raise KeyError(name)
+            db.execute("UPDATE generation SET value = value + 1 WHERE id = 0")
+        self._names = {}
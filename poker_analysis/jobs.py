@@ -0,0 +1,183 @@
+#jobs.py
+#background analysis jobs. Uploads are queued here and the page polls for progress,
+#so a big log doesn't hold a web worker for the whole pipeline.
+#Several processes can share one job folder: a job belongs to the process holding the lock on its .lock file
+#from when it is queued until it is finished, and the OS lets go of that lock when the process dies
+
+import datetime
+import json
+import os
+import re
+import tempfile
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import fcntl
+except ImportError:  # not on Windows: there jobs aren't locked, so only one process should use a job folder
+    fcntl = None
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+JOB_ID_RE = re.compile(r"[0-9a-f]{32}")
+
+
+class QueueFull(Exception):
+    """Raised by JobRunner.submit when max_pending jobs are already queued or running."""
+
+
+class JobStore:
+    """One JSON file per job in a directory, so queued jobs survive a restart."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, job_id):
+        return os.path.join(self.directory, f"{job_id}.json")
+
+    def claim(self, job_id):
+        """
+        Takes the job's lock: an open file to pass to release() once the job is finished, or None if another
+        process (or another claim in this one) holds it
+        """
+        lock = open(os.path.join(self.directory, f"{job_id}.lock"), "a")
+        if fcntl is not None:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lock.close()
+                return None
+        return lock
+
+    def release(self, job_id, lock):
+        """lets go of a claim; the lock file is removed too if the job is finished, as nothing will claim it again"""
+        job = self.get(job_id)
+        if job is None or job["status"] in (DONE, FAILED):
+            try:
+                os.remove(lock.name)
+            except FileNotFoundError:
+                pass
+        lock.close()
+
+    def _write(self, job):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(job, f)
+        os.replace(tmp_path, self.path(job["id"]))
+
+    def create(self, **fields):
+        job = {
+            "id": uuid.uuid4().hex,
+            "status": QUEUED,
+            "stage": QUEUED,
+            "progress": 0.0,
+            "error": None,
+            "created": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        }
+        job.update(fields)
+        with self._lock:
+            self._write(job)
+        return job
+
+    def get(self, job_id):
+        if not JOB_ID_RE.fullmatch(job_id or ""):
+            return None
+        try:
+            with open(self.path(job_id)) as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def update(self, job_id, **fields):
+        with self._lock:
+            job = self.get(job_id)
+            if job is None:
+                return None
+            job.update(fields)
+            self._write(job)
+        return job
+
+    def unfinished(self):
+        """queued and running jobs, oldest first"""
+        jobs = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".json"):
+                job = self.get(name[:-len(".json")])
+                if job and job["status"] in (QUEUED, RUNNING):
+                    jobs.append(job)
+        jobs.sort(key=lambda job: job["created"])
+        return jobs
+
+
+class JobRunner:
+    """
+    Runs work(job, progress) for each submitted job on a fixed number of threads.
+    progress(stage, fraction) records how far the job has got. submit refuses new jobs
+    with QueueFull once max_pending are waiting or running.
+    """
+
+    def __init__(self, store, work, concurrency=2, max_pending=20):
+        self.store = store
+        self.work = work
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="job")
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def submit(self, **fields):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise QueueFull(f"{self._pending} jobs already waiting")
+            self._pending += 1
+        job = self.store.create(**fields)
+        #claimed before anyone can see it queued
+        self._executor.submit(self._run, job["id"], self.store.claim(job["id"]))
+        return job
+
+    def resume(self):
+        """
+        Re-queues the jobs left queued or running by a process that is gone, the ones whose lock nobody holds;
+        those of a process still running (another worker sharing the folder) are left to it. Returns how many.
+        """
+        resumed = 0
+        for job in self.store.unfinished():
+            lock = self.store.claim(job["id"])
+            if lock is None:
+                continue
+            with self._lock:
+                self._pending += 1
+            self.store.update(job["id"], status=QUEUED, stage=QUEUED, progress=0.0)
+            self._executor.submit(self._run, job["id"], lock)
+            resumed += 1
+        return resumed
+
+    def _run(self, job_id, lock):
+        try:
+            job = self.store.get(job_id)
+            #finished by its previous owner between being listed and claimed
+            if job is None or job["status"] not in (QUEUED, RUNNING):
+                return
+            job = self.store.update(job_id, status=RUNNING)
+
+            def progress(stage, fraction):
+                self.store.update(job_id, stage=stage, progress=round(fraction, 2))
+
+            try:
+                fields = self.work(job, progress) or {}
+            except Exception as e:
+                self.store.update(job_id, status=FAILED, stage=FAILED, error=f"{type(e).__name__}: {e}")
+            else:
+                self.store.update(job_id, status=DONE, stage=DONE, progress=1.0, **fields)
+        finally:
+            self.store.release(job_id, lock)
+            with self._lock:
+                self._pending -= 1
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,142 @@
+#ledger.py
+#append-only record of every upload, for the admin page. Each upload is one INSERT into an SQLite file in WAL mode,
+#so recording one costs the same however many came before, and concurrent uploads don't overwrite each other.
+#The admin page reads it a page at a time, newest first, with the stage timings of each upload's analysis
+
+import contextlib
+import datetime
+import json
+import os
+import sqlite3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS uploads (
+    id INTEGER PRIMARY KEY,
+    filename TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    digest TEXT,
+    size INTEGER,
+    live INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS uploads_filename ON uploads (filename);
+CREATE INDEX IF NOT EXISTS uploads_digest ON uploads (digest);
+CREATE TABLE IF NOT EXISTS upload_metrics (
+    upload_id INTEGER PRIMARY KEY REFERENCES uploads (id),
+    metrics TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS imports (
+    source TEXT PRIMARY KEY,
+    entries INTEGER NOT NULL
+);
+"""
+
+COLUMNS = ("id", "filename", "timestamp", "digest", "size", "live")
+
+
+class UploadLedger:
+    """
+    SQLite file of uploads, one row each, ids increasing with time.
+    Pages are fetched by id (before=the last id of the previous page) rather than OFFSET,
+    so any page costs the same as the first.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.executescript(SCHEMA)
+
+    @contextlib.contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=30)
+        db.execute("PRAGMA synchronous=NORMAL")
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def add(self, filename, digest=None, size=None, live=False, timestamp=None):
+        """records one upload and returns its id"""
+        timestamp = timestamp or datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        with self._connect() as db:
+            cursor = db.execute("INSERT INTO uploads (filename, timestamp, digest, size, live) VALUES (?, ?, ?, ?, ?)",
+                                (filename, timestamp, digest, size, int(live)))
+            return cursor.lastrowid
+
+    def add_metrics(self, upload_id, metrics):
+        """attaches the timings of an upload's analysis (metrics.StageTimer.as_dict()) to it"""
+        with self._connect() as db:
+            db.execute("INSERT OR REPLACE INTO upload_metrics (upload_id, metrics) VALUES (?, ?)",
+                       (upload_id, json.dumps(metrics)))
+
+    def page(self, before=None, limit=50, filename=None, since=None, until=None, digest=None):
+        """
+        Up to limit uploads, newest first, older than id `before` if given. Returns (rows, next_before),
+        rows as dicts (with "metrics", see add_metrics, or None) and next_before the value of `before` for the following page, or None on the last page.
+        filename matches anywhere in the name; since/until compare against the "YYYY-MM-DD HH:MM:SS" timestamp,
+        so a date alone works as a bound.
+        """
+        where, params = [], []
+        if before is not None:
+            where.append("uploads.id < ?")
+            params.append(before)
+        if filename:
+            where.append("filename LIKE ? ESCAPE '\\'")
+            params.append("%" + filename.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%")
+        if since:
+            where.append("timestamp >= ?")
+            params.append(since)
+        if until:
+            if len(until) == 10:  # a bare date includes that whole day
+                until = str(datetime.date.fromisoformat(until) + datetime.timedelta(days=1))
+            where.append("timestamp < ?")
+            params.append(until)
+        if digest:
+            where.append("digest = ?")
+            params.append(digest)
+
+        query = (f"SELECT {', '.join('uploads.' + column for column in COLUMNS)}, upload_metrics.metrics FROM uploads "
+                 "LEFT JOIN upload_metrics ON upload_metrics.upload_id = uploads.id")
+        if where:
+            query += " WHERE " + " AND ".join(where)
+        query += " ORDER BY uploads.id DESC LIMIT ?"
+
+        with self._connect() as db:
+            rows = [dict(zip(COLUMNS + ("metrics",), row)) for row in db.execute(query, params + [limit + 1])]
+        for row in rows:
+            row["live"] = bool(row["live"])
+            row["metrics"] = json.loads(row["metrics"]) if row["metrics"] else None
+        if len(rows) > limit:
+            return rows[:limit], rows[limit - 1]["id"]
+        return rows, None
+
+    def count(self):
+        """uploads recorded; the id of the newest, which is their number as nothing is ever deleted"""
+        with self._connect() as db:
+            return db.execute("SELECT COALESCE(MAX(id), 0) FROM uploads").fetchone()[0]
+
+    def import_json(self, path):
+        """
+        Moves the entries of the old uploads/upload_log.json into the ledger, oldest first, and renames the file
+        so it is only imported once. Returns how many there were (0 if it was imported already or isn't there).
+        Every worker of the app calls this as it starts: the import is one transaction that takes the database's
+        write lock first and records the file as imported, so only the first worker to get the lock imports it
+        """
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            if db.execute("SELECT 1 FROM imports WHERE source = ?", (os.path.abspath(path),)).fetchone():
+                return 0
+            try:
+                with open(path) as f:
+                    entries = json.load(f)
+            except FileNotFoundError:  # nothing to import, or renamed by the worker that imported it
+                return 0
+            db.executemany("INSERT INTO uploads (filename, timestamp) VALUES (?, ?)",
+                           [(entry["filename"], entry["timestamp"]) for entry in entries])
+            db.execute("INSERT INTO imports (source, entries) VALUES (?, ?)", (os.path.abspath(path), len(entries)))
+        try:
+            os.replace(path, path + ".imported")
+        except FileNotFoundError:
+            pass
+        return len(entries)
@@ -0,0 +1,245 @@
+#live.py
+#incremental analysis of a game that is still being played. The log gets re-downloaded and re-uploaded
+#every few orbits; each upload only adds rows to the top of the file (pokernow exports newest first and
+#order only ever grows), so a live session parses just the rows above the last one it saw and
+#updates its running counters with them
+
+import csv
+import io
+import os
+import threading
+from collections import OrderedDict
+import numpy as np
+from poker_analysis import model, parser, replay, streaming, streets, timeline
+
+
+class NotAContinuation(ValueError):
+    """Raised when an upload doesn't contain the last row a live session processed."""
+
+
+def session_key(filepath):
+    """
+    The order value of the oldest row, read from the end of the file. It stays the same as a game's log grows,
+    so it identifies the game across re-uploads. None if the last line isn't a row ending in an order value.
+    """
+    with open(filepath, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        f.seek(max(size - 8192, 0))
+        tail = f.read().decode("utf-8", errors="replace")
+
+    lines = [line for line in tail.splitlines() if line.strip()]
+    if not lines:
+        return None
+    row = next(csv.reader(io.StringIO(lines[-1])))
+    return row[-1] if row and row[-1].isdigit() else None
+
+
+def newest_order(filepath):
+    """The order value of the newest row, the first one after the header, as an int; None if there isn't one"""
+    with open(filepath, "rb") as f:
+        head = f.read(65536).decode("utf-8", errors="replace")
+    rows = csv.reader(io.StringIO(head))
+    next(rows, None)
+    row = next(rows, None)
+    return int(row[-1]) if row and row[-1].isdigit() else None
+
+
+class LiveAccumulator(streaming.StatsAccumulator):
+    """
+    A StatsAccumulator fed oldest first, so rows newer than everything seen so far can be added at any time.
+    It keeps the same fields with the same meanings, so results() and base_stats() are shared;
+    only the per-hand bookkeeping is done in the other direction, and replay is fed each line as it comes.
+    """
+
+    def __init__(self):
+        self._joins = OrderedDict()  # pid: name of its first join, latest join last
+        self._canonical = {}
+        self._player_dict = None
+        super().__init__()
+        self._hand_started = False
+        self._street = model.PREFLOP
+        self._hand_actions = set()  # (street, action, pid) already counted for the current hand
+        self._hand_vpip = set()  # pids already counted in vpip_hands for the current hand
+        self._hand_events = []  # ACTION and STREET events of the current hand, for street_tally when it ends
+        #stack timeline per id, kept as parsed values so results() doesn't redo the whole session:
+        #pid: ([line number], [epoch ms], [stack]), and the (line number, seat) each id was last seen at
+        self._stacks = {}
+        self._stack_last = {}
+        self._stack_lines = 0
+
+    def add(self, event):
+        kind = event.kind
+        if event.player_id is not None:
+            self.names[event.player_id] = event.name
+        if kind in replay.KINDS:
+            self.replay.add(event)
+
+        if kind == parser.ACTION:
+            self._seen(event.player_id)
+            self.action_counts[event.detail, event.player_id] += 1
+            key = (self._street, event.detail, event.player_id)
+            if self._hand_started:
+                self._hand_events.append(event)
+                if key not in self._hand_actions:
+                    self._hand_actions.add(key)
+                    self.street_hands[key] += 1
+                if self._street == model.PREFLOP and event.detail in ("calls", "raises") \
+                        and event.player_id not in self._hand_vpip:
+                    self._hand_vpip.add(event.player_id)
+                    self.vpip_hands[event.player_id] += 1
+
+        elif kind == parser.STREET:
+            self._street = model.STREET_CODES[event.detail]
+            if self._hand_started:
+                self._hand_events.append(event)
+
+        elif kind == parser.HAND_START:
+            self._finish_hand()
+            self._hand_started = True
+            self._street = model.PREFLOP
+            self._hand_actions = set()
+            self._hand_vpip = set()
+
+        elif kind == parser.HAND_END:
+            self._finish_hand()
+
+        elif kind == parser.STACKS:
+            for pid, name, stack in event.detail:
+                self.names[pid] = name
+                self.hand_counts[pid] += 1
+                self._seen(pid)
+            self._add_stacks(event.at, [(pid, stack) for pid, name, stack in event.detail])
+
+        elif kind == parser.JOIN:
+            self._joins.setdefault(event.player_id, event.name)
+            self._joins.move_to_end(event.player_id)
+            self._player_dict = None
+
+        elif kind in (parser.QUIT, parser.STAND):
+            if kind == parser.STAND:
+                self.stands[event.player_id] += 1
+            elif event.amount == 0:
+                self._add_stacks(event.at, [(event.player_id, 0.00)])
+
+        elif kind == parser.SHOW:
+            self.shows[event.player_id] += 1
+
+    def _finish_hand(self):
+        """adds the current hand to street_tally, which happens once it ends (or the next one starts)"""
+        if self._hand_events:
+            self.street_tally.add_hand(*streets.hand_actions(self._hand_events))
+            self._hand_events = []
+
+    def _street_tally(self):
+        """street_tally with the hand still being played, like a full analysis of the log so far would count it"""
+        if not self._hand_events:
+            return self.street_tally
+        tally = self.street_tally.copy()
+        tally.add_hand(*streets.hand_actions(self._hand_events))
+        return tally
+
+    @property
+    def player_dict(self):
+        """
+        like parser.create_player_dict: ids in the order of their latest join (newest first), each with the
+        name it first joined under, or the canonical name it was given by assigning player_dict
+        """
+        if self._player_dict is None:
+            self._player_dict = {pid: self._canonical.get(pid, name) for pid, name in reversed(self._joins.items())}
+        return self._player_dict
+
+    @player_dict.setter
+    def player_dict(self, names):
+        self._canonical = dict(names)
+        self._player_dict = None
+
+    def _seen(self, pid):
+        self._seen_order.setdefault(pid, None)
+
+    def _first_seen(self):
+        return iter(self._seen_order)
+
+    def _add_stacks(self, at, stacks):
+        line = self._stack_lines
+        self._stack_lines += 1
+        millis = int(np.datetime64(at.rstrip("Z"), "ms").astype(np.int64))
+        for seat, (pid, stack) in enumerate(stacks):
+            lines, times, values = self._stacks.setdefault(pid, ([], [], []))
+            lines.append(line)
+            times.append(millis)
+            values.append(stack)
+            self._stack_last[pid] = (-line, seat)
+
+    def player_stacks(self):
+        """
+        same as StatsAccumulator.player_stacks: players in the order of their latest line in the log,
+        ids that share a name merged in time order
+        """
+        by_name = {}
+        for pid in sorted(self._stack_last, key=self._stack_last.get):
+            by_name.setdefault(self._name(pid), []).append(pid)
+
+        result = {}
+        for name, pids in by_name.items():
+            lines, times, values = (np.concatenate([np.array(self._stacks[pid][i]) for pid in pids]) for i in range(3))
+            if len(pids) > 1:
+                order = np.argsort(lines, kind="stable")
+                times, values = times[order], values[order]
+            result[name] = timeline.StackSeries(times.astype("datetime64[ms]"), values.astype(np.float64))
+        return result
+
+
+class LiveSession:
+    """One game being followed live: its accumulator and the order value of the newest row processed."""
+
+    def __init__(self, key=None):
+        self.key = key
+        self.accumulator = LiveAccumulator()
+        self.last_order = None
+        self.rows = 0
+        self.lock = threading.Lock()
+
+    def update(self, stream):
+        """
+        Adds the rows of a newest-first log (file object) that are newer than last_order. Returns how many there were.
+        The new rows are the top of the file, so reading stops at the first row already processed.
+        Raises NotAContinuation if that row isn't there (a different game, or rows missing), leaving the session as it was.
+        """
+        new_rows = []
+        for entry, at, order in streaming.iter_rows(stream):
+            if self.last_order is not None and order <= self.last_order:
+                if order != self.last_order:
+                    raise NotAContinuation(f"row {self.last_order} is missing")
+                break
+            new_rows.append((entry, at, order))
+        else:
+            if self.last_order is not None:
+                raise NotAContinuation(f"row {self.last_order} is missing")
+
+        for entry, at, order in reversed(new_rows):
+            self.accumulator.add(parser.tokenize_entry(entry, at, order))
+        if new_rows:
+            self.last_order = new_rows[0][2]
+            self.rows += len(new_rows)
+        return len(new_rows)
+
+
+class LiveSessions:
+    """In-memory LiveSessions by session_key, dropping the least recently updated past max_sessions."""
+
+    def __init__(self, max_sessions=50):
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, restart=False):
+        """the session for key, started fresh if there isn't one (or restart is set)"""
+        with self._lock:
+            session = None if restart else self._sessions.get(key)
+            if session is None:
+                session = self._sessions[key] = LiveSession(key)
+            self._sessions.move_to_end(key)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+            return session
@@ -1,96 +1,149 @@
 #matrix.py
-#uses data collected from stats.py to assemble a matrix on which we can perform data analysis / prediction
+#uses data collected from stats.py to assemble a matrix on which we can perform data analysis / prediction.
+#pandas is imported by the functions that build DataFrames, on first use, so importing this module (and the app)
+#doesn't pay for it
 
-import pandas as pd
+import importlib.util
+import numpy as np
 from poker_analysis import stats
 from poker_analysis import parser
-
-pd.set_option('display.max_columns', None)
-
-# (Optional) Also show all rows
-pd.set_option('display.max_rows', None)
+from poker_analysis import model
+from poker_analysis import replay
 
 
 def constructMatrix(filepath):
+    """the matrix of one log file, parsed here; pipeline builds it from the stats it has already computed instead"""
 
     #----------------------------------------------#
     #load the log
-    df = parser.load_log(filepath)
-    myDict = parser.create_player_dict(df)
+    game = model.load_game(filepath)
+    myDict = parser.create_player_dict(game.events)
+
+    return buildMatrix(matrixColumns(myDict, baseStats(game, myDict)))
 
 
+def baseStats(game, myDict):
+    """the counts and profits every matrix column is derived from, keyed by name"""
+
+    #one replay of every hand for the profit columns
+    replayed = replay.replay_game(game)
+
     #----------------------------------------------#
     #constructing dictionaries from stats functions
+    return {
+        #action counts
+        "totalCalls": stats.get_action_counts(game, "calls", myDict),
+        "totalFolds": stats.get_action_counts(game, 'folds', myDict),
+        "totalRaises": stats.get_action_counts(game, 'raises', myDict),
+        "totalBets": stats.get_action_counts(game, 'bets', myDict),
 
-    #action counts
-    totalCalls = stats.get_action_counts(df, "calls", myDict)
-    totalFolds = stats.get_action_counts(df, 'folds', myDict, min_words=3)
-    totalRaises = stats.get_action_counts(df, 'raises', myDict)
-    totalBets = stats.get_action_counts(df, 'bets', myDict)
+        #preflop actions
+        "preflopRaises": stats.get_preflop_actions(game, myDict, 'raises'),
+        "preflopCalls": stats.get_preflop_actions(game, myDict, 'calls'),
+        "preflopFolds": stats.get_preflop_actions(game, myDict, 'folds'),
 
-    #preflop actions
-    preflopRaises = stats.get_preflop_actions(df, myDict, 'raises')
-    preflopCalls = stats.get_preflop_actions(df, myDict, 'calls')
-    preflopFolds = stats.get_preflop_actions(df, myDict, 'folds')
+        #number of hands played
+        "hands": stats.track_player_presence(game, myDict),
 
-    #critical stats
-    vpip = stats.calc_VPIP(df, myDict)
-    pfr = stats.calc_PFR(df, myDict)
-    agressionFactor = stats.calc_aggression_factor(totalBets, totalRaises, totalCalls, myDict)
+        #other stats
+        "numberOfShows": stats.count_shows(game, myDict),
+        "numberOfStands": stats.count_stands(game, myDict),
 
-    #number of hands played
-    hands = stats.track_player_presence(df, myDict)
+        #hands played voluntarily, for VPIP
+        "vpipHands": stats.get_voluntary_hands(game, myDict),
 
-    #other stats
-    numberOfShows = stats.count_shows(df, myDict)
-    numberOfStands = stats.count_stands(df, myDict)
+        #profit, from replaying every hand
+        "netProfit": stats.calculate_net_profit(game, myDict, replayed),
+        "evProfit": stats.calculate_ev_profit(game, myDict, replayed),
+    }
 
-    #----------------------------------------------#
-    #Profit/Loss calculations, structure of the log makes this complicated
-    #key stats are netProfit and profitYesOrNo
-
-    #profitstats
-    takenProfit = stats.get_quit_or_stand_stacks_all(df, myDict)
-    remainingProfit = stats.get_final_player_stacks(df, myDict)
-    extraProfit = stats.get_quit_or_stand_stacks_after_final(df, myDict)
-    grossProfit = stats.calculate_gross_profits(myDict, takenProfit, remainingProfit, extraProfit)
 
-    #buyin stats
-    joinedBuyIn = stats.get_joined_buy_ins(df, myDict)
-    adminUpdatedBuyIn = stats.get_admin_updates_after_game_start(df, myDict)
-    trueBuyIn = stats.calculate_final_buyin(myDict, joinedBuyIn, adminUpdatedBuyIn)
+def matrixColumns(myDict, base):
+    """the (column name, {player name: value}) pairs that make up the matrix, in column order"""
 
-    #results
-    netProfit = stats.calculate_net_profit(myDict, grossProfit, trueBuyIn)
+    #critical stats
+    vpip = stats.vpip_from_counts(base["hands"], base["vpipHands"])
+    pfr = stats.pfr_from_counts(base["hands"], base["preflopRaises"])
+    agressionFactor = stats.calc_aggression_factor(base["totalBets"], base["totalRaises"], base["totalCalls"], myDict)
 
     #----------------------------------------------#
     #constructing matrices from dicts
     #exactly the same except one has net profit as last column and one indicates whether or not a player profited in last column
-    allDictsProfitAmount = [
-        ("Total Calls", totalCalls),
-        ("Total Folds", totalFolds),
-        ("Total Raises", totalRaises),
-        ("Total Bets", totalBets),
-        ("Total Hands", hands),
-        ("Preflop Calls", preflopCalls),
-        ("Preflop Raises", preflopRaises),
-        ("Preflop Folds", preflopFolds),
+    return [
+        ("Total Calls", base["totalCalls"]),
+        ("Total Folds", base["totalFolds"]),
+        ("Total Raises", base["totalRaises"]),
+        ("Total Bets", base["totalBets"]),
+        ("Total Hands", base["hands"]),
+        ("Preflop Calls", base["preflopCalls"]),
+        ("Preflop Raises", base["preflopRaises"]),
+        ("Preflop Folds", base["preflopFolds"]),
         ("VPIP", vpip),
         ("PFR", pfr),
         ("Agression Factor", agressionFactor),
-        ("Number of Shows", numberOfShows),
-        ("Number of Stands", numberOfStands),
-        ("Net Profit", netProfit)
+        ("Number of Shows", base["numberOfShows"]),
+        ("Number of Stands", base["numberOfStands"]),
+        ("Net Profit", base["netProfit"]),
+        ("EV Profit", base["evProfit"])
     ]
 
 
-    
-    matrixAmount = pd.DataFrame()
+def buildMatrix(allDictsProfitAmount):
+    """
+    one row per player, one column per (name, stat dict) pair. Missing values become 0.
+    Rows are in order of first appearance across the dicts; the frame is built in one go rather than column by column
+    """
+    import pandas as pd
+    players = list(dict.fromkeys(player for name, stat_dict in allDictsProfitAmount for player in stat_dict))
+    columns = {}
     for name, stat_dict in allDictsProfitAmount:
-        stat_series = pd.Series(stat_dict, name = name)
-        matrixAmount = pd.concat([matrixAmount, stat_series], axis = 1)
-
-    matrixAmount = matrixAmount.fillna(0)
-
-    return matrixAmount
+        if len(stat_dict) == len(players):
+            columns[name] = np.array([stat_dict[player] for player in players])
+        else:
+            #a column missing some players is float, as the gaps would have been NaN before being filled
+            columns[name] = np.array([stat_dict.get(player, 0) for player in players], dtype=np.float64)
+
+    matrixAmount = pd.DataFrame(columns, index=pd.Index(players, dtype=object))
+    return matrixAmount.fillna(0)
+
+
+def stackMatrices(matrices):
+    """{session: matrix} -> one matrix indexed by (session, player), for modelling across many logs"""
+    import pandas as pd
+    if not matrices:
+        return pd.DataFrame(index=pd.MultiIndex.from_arrays([[], []], names=["session", "player"]))
+    stacked = pd.concat(matrices, names=["session", "player"])
+    return stacked.fillna(0)
+
+
+#export format: (file extension, optional packages any one of which can write it)
+EXPORT_FORMATS = {
+    "csv": (".csv", ()),
+    "parquet": (".parquet", ("pyarrow", "fastparquet")),
+    "arrow": (".arrow", ("pyarrow",)),
+}
+
+
+def exportFormats():
+    """the EXPORT_FORMATS that can be written here; parquet and arrow need optional packages (pyarrow)"""
+    return [fmt for fmt, (extension, engines) in EXPORT_FORMATS.items()
+            if not engines or any(importlib.util.find_spec(engine) is not None for engine in engines)]
+
+
+def writeMatrix(matrixAmount, path, fmt="csv"):
+    """
+    writes a matrix as csv, parquet or arrow (an Arrow IPC / Feather file). path may also be a binary file object.
+    Arrow files can't hold an index, so the player (and session) labels become ordinary columns there.
+    Raises ValueError for an unknown format and ImportError if the package the format needs isn't installed.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"unknown matrix format {fmt!r}")
+    if fmt == "csv":
+        matrixAmount.to_csv(path)
+    elif fmt == "parquet":
+        matrixAmount.to_parquet(path)
+    else:
+        if matrixAmount.index.names == [None]:
+            matrixAmount = matrixAmount.rename_axis("player")
+        matrixAmount.reset_index().to_feather(path)
 
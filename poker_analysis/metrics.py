@@ -0,0 +1,170 @@
+#metrics.py
+#per-stage timing of uploads. A StageTimer follows one upload through its stages (it doubles as the pipeline's
+#progress callback, so every pipeline stage is timed without the pipeline knowing), and a Registry keeps running
+#totals per stage for the /metrics endpoint. Optionally a single upload runs under cProfile and tracemalloc.
+
+import cProfile
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:  # not on Windows
+    resource = None
+
+
+def max_rss():
+    """the process's peak resident memory so far, in bytes, or None where the platform doesn't report it"""
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+def rss():
+    """the process's resident memory now, in bytes, or None where there is no /proc/self/statm (Linux only)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+
+class StageTimer:
+    """
+    Wall and CPU time of each stage of one upload, and the process's RSS when each stage ended.
+    start(stage) ends the running stage and starts the next; calling the timer like a progress callback does the same
+    and passes the call on to progress. CPU time is the calling thread's, so work done in other processes (the chart
+    pool) shows up as wall time only.
+    rss_growth is how far the RSS at the end of a stage rose above the RSS when the timer was made: a figure for this
+    upload, unlike the process's lifetime peak (max_rss), though uploads running side by side show in each other's.
+    With profile_path, the stages run under cProfile (dumped there as pstats on stop()) and tracemalloc,
+    whose peak is reported as peak_traced.
+    """
+
+    def __init__(self, progress=None, stages=None, profile_path=None):
+        self.progress = progress
+        self.stages = list(stages or [])  # [{"stage", "wall", "cpu", "rss"}]
+        self.rows = None
+        self.profile_path = profile_path
+        self.peak_traced = None
+        self._current = None
+        self._profiler = None
+        self._tracing = False
+        self._rss_start = self._rss_peak = rss()
+
+    def __call__(self, stage, fraction):
+        self.start(stage)
+        if self.progress is not None:
+            self.progress(stage, fraction)
+
+    @property
+    def current(self):
+        return self._current[0] if self._current else None
+
+    def start(self, stage):
+        if self.profile_path and self._profiler is None:
+            self._tracing = not tracemalloc.is_tracing()
+            if self._tracing:
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        self._end()
+        self._current = (stage, time.perf_counter(), time.thread_time())
+
+    def add(self, stage, wall, cpu=0.0):
+        """a stage measured elsewhere, e.g. the time a job spent queued"""
+        now = rss()
+        if now is not None and self._rss_peak is not None:
+            self._rss_peak = max(self._rss_peak, now)
+        self.stages.append({"stage": stage, "wall": wall, "cpu": cpu, "rss": now})
+
+    def _end(self):
+        if self._current is not None:
+            stage, wall, cpu = self._current
+            self.add(stage, time.perf_counter() - wall, time.thread_time() - cpu)
+            self._current = None
+
+    def stop(self, rows=None):
+        """ends the running stage (and the profile, writing it out)"""
+        self._end()
+        if rows is not None:
+            self.rows = rows
+        if self._profiler is not None:
+            self._profiler.disable()
+            self._profiler.dump_stats(self.profile_path)
+            self.peak_traced = tracemalloc.get_traced_memory()[1]
+            if self._tracing:
+                tracemalloc.stop()
+            self._profiler = None
+
+    def as_dict(self):
+        return {
+            "stages": self.stages,
+            "wall": sum(stage["wall"] for stage in self.stages),
+            "cpu": sum(stage["cpu"] for stage in self.stages),
+            "rows": self.rows,
+            "rss_growth": None if self._rss_start is None else self._rss_peak - self._rss_start,
+            "peak_traced": self.peak_traced,
+            "profile": self.profile_path,
+        }
+
+
+class Registry:
+    """Running totals across uploads since the process started, per stage, in Prometheus text format on request."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.uploads = 0
+        self.failures = {}  # stage: uploads that failed in it
+        self.rows = 0
+        self.stages = {}  # stage: {"count", "wall", "cpu", "wall_max"}
+
+    def record(self, timer):
+        with self._lock:
+            self.uploads += 1
+            self.rows += timer.rows or 0
+            for stage in timer.stages:
+                totals = self.stages.setdefault(stage["stage"], {"count": 0, "wall": 0.0, "cpu": 0.0, "wall_max": 0.0})
+                totals["count"] += 1
+                totals["wall"] += stage["wall"]
+                totals["cpu"] += stage["cpu"]
+                totals["wall_max"] = max(totals["wall_max"], stage["wall"])
+
+    def record_failure(self, stage):
+        with self._lock:
+            self.failures[stage] = self.failures.get(stage, 0) + 1
+
+    def summary(self):
+        """{stage: {count, wall, cpu, wall_max, wall_mean, cpu_mean}}, a copy safe to hand to a template"""
+        with self._lock:
+            return {
+                stage: dict(totals, wall_mean=totals["wall"] / totals["count"], cpu_mean=totals["cpu"] / totals["count"])
+                for stage, totals in self.stages.items()
+            }
+
+    def prometheus(self, prefix="poker"):
+        with self._lock:
+            lines = [
+                f"# TYPE {prefix}_uploads_total counter",
+                f"{prefix}_uploads_total {self.uploads}",
+                f"# TYPE {prefix}_upload_rows_total counter",
+                f"{prefix}_upload_rows_total {self.rows}",
+                f"# TYPE {prefix}_upload_failures_total counter",
+            ]
+            lines += [f'{prefix}_upload_failures_total{{stage="{stage}"}} {count}' for stage, count in self.failures.items()]
+            for metric, key, kind in (("stage_runs_total", "count", "counter"),
+                                      ("stage_wall_seconds_total", "wall", "counter"),
+                                      ("stage_cpu_seconds_total", "cpu", "counter"),
+                                      ("stage_wall_seconds_max", "wall_max", "gauge")):
+                lines.append(f"# TYPE {prefix}_{metric} {kind}")
+                lines += [f'{prefix}_{metric}{{stage="{stage}"}} {totals[key]:.6g}' for stage, totals in self.stages.items()]
+
+        rss = max_rss()
+        if rss is not None:
+            lines += [f"# TYPE {prefix}_process_max_rss_bytes gauge", f"{prefix}_process_max_rss_bytes {rss}"]
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,258 @@
+#mmaplog.py
+#reads a pokernow CSV through a memory map instead of pandas. The file is indexed once (the offset of every row,
+#a NumPy array) and each entry is handed to the tokenizer as a memoryview into the map; the patterns.py regexes run
+#on the bytes in place and only the groups an Event needs (ids, names, amounts) are decoded.
+#Nothing holds a decoded copy of the log, so parsing takes the index plus the Events themselves
+
+import mmap
+import os
+import re
+import numpy as np
+from poker_analysis import parser, patterns
+
+HEADER = b"entry,at,order"
+BOM = b"\xef\xbb\xbf"
+QUOTE = ord('"')
+NEWLINE = ord("\n")
+_CHUNK = 1 << 20  # bytes scanned per NumPy pass when indexing; bounds the temporary arrays
+_BATCH = 1 << 16  # row offsets turned into Python ints at a time
+
+ACTION = patterns.csv_field(patterns.ACTION)
+SHOW = patterns.csv_field(patterns.SHOW)
+STACK = patterns.csv_field(patterns.STACK)
+STREET = patterns.csv_field(patterns.STREET)
+HAND_START = patterns.csv_field(patterns.HAND_START)
+ADMIN_UPDATE = patterns.csv_field(patterns.ADMIN_UPDATE)
+COLLECT = patterns.csv_field(patterns.COLLECT)
+UNCALLED = patterns.csv_field(patterns.UNCALLED)
+DEAD_BLIND = patterns.csv_field(patterns.DEAD_BLIND)
+SECOND_RUN = re.compile(re.escape(patterns.SECOND_RUN.encode()))
+PLAYER_AMOUNT_PATTERNS = [
+    (parser.JOIN, re.compile(rb"joined the game"), patterns.csv_field(patterns.JOIN)),
+    (parser.QUIT, re.compile(rb"quits the game"), patterns.csv_field(patterns.QUIT)),
+    (parser.STAND, re.compile(rb"stand up with"), patterns.csv_field(patterns.STAND)),
+]
+
+
+def row_offsets(buf):
+    """
+    Start offsets of every row of a CSV buffer, plus one past the end: row i is buf[offsets[i]:offsets[i + 1] - 1].
+    Newlines inside a quoted field (an odd number of quotes before them) don't end a row.
+    """
+    data = np.frombuffer(buf, dtype=np.uint8)
+    ends = [np.array([-1], dtype=np.int64)]
+    inside = False
+    for start in range(0, len(data), _CHUNK):
+        chunk = data[start:start + _CHUNK]
+        quoted = np.logical_xor.accumulate(chunk == QUOTE)
+        if inside:
+            quoted = ~quoted
+        ends.append(np.flatnonzero((chunk == NEWLINE) & ~quoted) + start)
+        inside = bool(quoted[-1])
+    if len(data) and data[-1] != NEWLINE:
+        ends.append(np.array([len(data)], dtype=np.int64))
+    del data
+    return np.concatenate(ends) + 1
+
+
+class LogFile:
+    """
+    A pokernow CSV mapped into memory, with its row index. Use as a context manager;
+    memoryviews from entries() are only valid until it is closed.
+    """
+
+    def __init__(self, path):
+        self._file = open(path, "rb")
+        if os.fstat(self._file.fileno()).st_size:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self._map = b""
+        self.offsets = row_offsets(self._map)
+        self.view = memoryview(self._map)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        """data rows (and any blank lines), not counting the header"""
+        return max(len(self.offsets) - 2, 0)
+
+    def close(self):
+        self.view.release()
+        try:
+            if isinstance(self._map, mmap.mmap):
+                self._map.close()
+        except BufferError:
+            pass  # something still holds a view into the map; it is unmapped when that goes
+        self._file.close()
+
+    def header(self):
+        if len(self.offsets) < 2:
+            return None
+        return self._map[self.offsets[0]:self.offsets[1] - 1].strip().removeprefix(BOM)
+
+    def _rows(self):
+        """(start, end) of every data row without its line ending, blank lines skipped"""
+        if self.header() != HEADER:
+            raise ValueError("not a pokernow log: expected the columns entry,at,order")
+        buf = self._map
+
+        for batch in range(1, len(self.offsets) - 1, _BATCH):
+            offsets = self.offsets[batch:batch + _BATCH + 1].tolist()
+            for start, end in zip(offsets, offsets[1:]):
+                end -= 1
+                if end > start and buf[end - 1] == 13:  # \r
+                    end -= 1
+                if end > start:
+                    yield start, end
+
+    def entries(self):
+        """
+        Yields (entry, at, order) for every row, newest first as in the file. entry is a memoryview of the log line
+        inside the map (without the CSV quotes, still with its quotes doubled); at is decoded, order parsed
+        """
+        buf, view = self._map, self.view
+        for start, end in self._rows():
+            order_comma = buf.rfind(b",", start, end)
+            at_comma = buf.rfind(b",", start, order_comma)
+            order = int(buf[order_comma + 1:end])
+            at = buf[at_comma + 1:order_comma].decode().strip()
+
+            if buf[start] == QUOTE:
+                start, at_comma = start + 1, at_comma - 1
+            yield view[start:at_comma], at, order
+
+    def spans(self):
+        """
+        (orders, starts, ends), NumPy arrays with one element per row, newest first as in the file:
+        row i is the bytes rows(starts[i], ends[i]), whole CSV line without its line ending, and has order orders[i]
+        """
+        buf = self._map
+        orders, starts, ends = [], [], []
+        for start, end in self._rows():
+            orders.append(int(buf[buf.rfind(b",", start, end) + 1:end]))
+            starts.append(start)
+            ends.append(end)
+        return (np.array(orders, dtype=np.int64), np.array(starts, dtype=np.int64), np.array(ends, dtype=np.int64))
+
+    def rows(self, start, end):
+        """the raw bytes of the file between two offsets, e.g. a row given by spans()"""
+        return self._map[start:end]
+
+
+class Strings(dict):
+    """bytes -> decoded str, so every repeat of an id, name or verb in a log shares one str object"""
+
+    def __missing__(self, raw):
+        text = self[raw] = raw.decode()
+        return text
+
+
+def tokenize_entry(entry, at=None, order=None, other=True, strings=None):
+    """
+    parser.tokenize_entry for a log line given as bytes-like CSV field content (quotes doubled).
+    Returns the same Event; with other=False, lines that would be OTHER return None without being decoded.
+    strings, a Strings shared across the lines of a log, saves decoding (and storing) the same id or name again
+    """
+    if strings is None:
+        strings = Strings()
+    if not len(entry):
+        return parser.Event(parser.OTHER, None, None, None, "", at, order) if other else None
+    if entry[0] in b" \t" or entry[-1] in b" \t\r\n":
+        entry = memoryview(bytes(entry).strip())
+    first = entry[0] if len(entry) else 0
+
+    if first == QUOTE:
+        match = ACTION.match(entry)
+        if match:
+            verb = strings[match.group(3)]
+            if verb == "posts":
+                dead = DEAD_BLIND.match(entry)
+                if dead:
+                    return parser.Event(parser.DEAD_BLIND, strings[dead.group(2)], strings[dead.group(1)],
+                                        float(dead.group(3)), None, at, order)
+            amount = match.group(4)
+            return parser.Event(parser.ACTION, strings[match.group(2)], strings[match.group(1)],
+                                float(amount) if amount else None, verb, at, order)
+        match = SHOW.match(entry)
+        if match:
+            return parser.Event(parser.SHOW, strings[match.group(2)], strings[match.group(1)], None,
+                                strings[match.group(3)], at, order)
+        match = COLLECT.match(entry)
+        if match:
+            run = 2 if SECOND_RUN.search(entry) else 1
+            return parser.Event(parser.COLLECT, strings[match.group(2)], strings[match.group(1)],
+                                float(match.group(3)), run, at, order)
+
+    elif first == 85:  # U
+        match = UNCALLED.match(entry)
+        if match:
+            return parser.Event(parser.UNCALLED, strings[match.group(3)], strings[match.group(2)],
+                                float(match.group(1)), None, at, order)
+
+    elif first == 80:  # P
+        if entry[:14] == b"Player stacks:":
+            stacks = [(strings[pid], strings[name], float(stack)) for name, pid, stack in STACK.findall(entry)]
+            return parser.Event(parser.STACKS, None, None, None, stacks, at, order)
+
+    elif first == 45:  # -
+        if entry[:16] == b"-- starting hand":
+            match = HAND_START.match(entry)
+            if match:
+                return parser.Event(parser.HAND_START, None, None, int(match.group(1)), None, at, order)
+        elif entry[:14] == b"-- ending hand":
+            return parser.Event(parser.HAND_END, None, None, None, None, at, order)
+
+    elif first in b"FTR":
+        match = STREET.match(entry)
+        if match:
+            street = strings[match.group(1) + (match.group(2) or b"")]
+            return parser.Event(parser.STREET, None, None, None, street, at, order, match.group(3).decode().strip())
+        if entry[:11] == b"The player ":
+            for kind, keyword, pattern in PLAYER_AMOUNT_PATTERNS:
+                if keyword.search(entry):
+                    match = pattern.search(entry)
+                    if match:
+                        return parser.Event(kind, strings[match.group(2)], strings[match.group(1)],
+                                            float(match.group(3)), None, at, order)
+                    break
+        elif entry[:28] == b"The admin updated the player":
+            match = ADMIN_UPDATE.search(entry)
+            if match:
+                old_stack = float(match.group(3))
+                new_stack = float(match.group(4))
+                return parser.Event(parser.ADMIN_UPDATE, strings[match.group(2)], strings[match.group(1)],
+                                    new_stack - old_stack, (old_stack, new_stack), at, order)
+
+    if not other:
+        return None
+    return parser.Event(parser.OTHER, None, None, None, bytes(entry).decode().strip().replace('""', '"'), at, order)
+
+
+def iter_events(path, other=False):
+    """
+    Yields the Events of a log file in log order, like streaming.iter_events.
+    Lines nothing uses (OTHER) are left out unless other=True.
+    A file without the usual entry,at,order header is handed to pandas (parser.load_events) instead.
+    """
+    strings = Strings()
+    with LogFile(path) as log:
+        if log.header() == HEADER:
+            for entry, at, order in log.entries():
+                event = tokenize_entry(entry, at, order, other, strings)
+                del entry
+                if event is not None:
+                    yield event
+            return
+
+    for event in parser.load_events(path):
+        if other or event.kind != parser.OTHER:
+            yield event
+
+
+def load_events(path, other=False):
+    """parser.load_events without pandas: the Events of a log file as a list, in log order"""
+    return list(iter_events(path, other))
@@ -0,0 +1,122 @@
+#model.py
+#columnar, hand-indexed view of a log. Built once per upload so the hand-structured stats
+#(presence, VPIP, PFR, street counts) become NumPy group-bys instead of Python loops over the log
+
+import numpy as np
+from poker_analysis import mmaplog, parser
+
+STREETS = ("Preflop", "Flop", "Turn", "River", "Flop (second run)", "Turn (second run)", "River (second run)")
+ACTIONS = ("posts", "checks", "calls", "bets", "raises", "folds")
+
+PREFLOP = 0
+STREET_CODES = {street: code for code, street in enumerate(STREETS)}
+ACTION_CODES = {action: code for code, action in enumerate(ACTIONS)}
+
+
+def parse_timestamps(timestamps):
+    """pokernow timestamps are UTC with a trailing Z, which numpy won't parse"""
+    return np.array([at.rstrip("Z") for at in timestamps], dtype="datetime64[ms]")
+
+
+class Game:
+    """
+    One log as NumPy columns, in chronological order.
+
+    Action columns (one row per player action): hand, street, actor, action, amount, at.
+    hand is an index into hand_numbers (-1 for actions outside a hand), actor is an index into player_ids.
+    Rows hand_offsets[i]:hand_offsets[i + 1] of every action column belong to hand i.
+    hand_street[i] is the highest street code dealt in hand i, PREFLOP if it never saw a flop.
+
+    Seat columns (one row per player per 'Player stacks:' snapshot): seat_hand, seat_actor, seat_stack,
+    indexed the same way by seat_offsets.
+
+    The decoded events are kept (in log order) for the stats that aren't hand-structured.
+    """
+
+    def __init__(self, events):
+        self.events = events
+        self.player_ids = []
+        self.names = {}  # latest display name of each id, the fallback for ids that never joined
+        self._actor_ids = {}
+
+        hand_numbers, hand_street = [], []
+        hand, street = -1, PREFLOP
+        hand_col, street_col, actor_col, action_col, amount_col, at_col = [], [], [], [], [], []
+        seat_hand, seat_actor, seat_stack = [], [], []
+
+        for event in reversed(events):
+            if event.kind == parser.HAND_START:
+                hand_numbers.append(event.amount)
+                hand_street.append(PREFLOP)
+                hand, street = len(hand_numbers) - 1, PREFLOP
+
+            elif event.kind == parser.STREET:
+                street = STREET_CODES[event.detail]
+                if hand >= 0 and street > hand_street[hand]:
+                    hand_street[hand] = street
+
+            elif event.kind == parser.ACTION:
+                hand_col.append(hand)
+                street_col.append(street)
+                actor_col.append(self.actor_index(event.player_id, event.name))
+                action_col.append(ACTION_CODES[event.detail])
+                amount_col.append(event.amount or 0.0)
+                at_col.append(event.at)
+
+            elif event.kind == parser.STACKS:
+                for pid, name, stack in event.detail:
+                    seat_hand.append(hand)
+                    seat_actor.append(self.actor_index(pid, name))
+                    seat_stack.append(stack)
+
+        self.hand_numbers = np.array(hand_numbers, dtype=np.int32)
+        self.hand_street = np.array(hand_street, dtype=np.int8)
+        self.hand = np.array(hand_col, dtype=np.int32)
+        self.street = np.array(street_col, dtype=np.int8)
+        self.actor = np.array(actor_col, dtype=np.int32)
+        self.action = np.array(action_col, dtype=np.int8)
+        self.amount = np.array(amount_col, dtype=np.float64)
+        self.at = parse_timestamps(at_col)
+
+        self.seat_hand = np.array(seat_hand, dtype=np.int32)
+        self.seat_actor = np.array(seat_actor, dtype=np.int32)
+        self.seat_stack = np.array(seat_stack, dtype=np.float64)
+
+        hands = np.arange(len(hand_numbers) + 1)
+        self.hand_offsets = np.searchsorted(self.hand, hands)
+        self.seat_offsets = np.searchsorted(self.seat_hand, hands)
+
+    def actor_index(self, player_id, name=None):
+        """index of player_id in player_ids, assigning a new one the first time an id is seen"""
+        if name is not None:
+            self.names[player_id] = name
+        index = self._actor_ids.get(player_id)
+        if index is None:
+            index = self._actor_ids[player_id] = len(self.player_ids)
+            self.player_ids.append(player_id)
+        return index
+
+    @property
+    def n_players(self):
+        return len(self.player_ids)
+
+    def per_player(self, values, player_dict, keep_zero=False):
+        """
+        turns an array indexed by actor into {player name: value}, summing ids that share a name.
+        Ids missing from player_dict are keyed by their display name, like everywhere else in stats.py
+        """
+        result = {}
+        for actor, value in enumerate(values.tolist()):
+            if value or keep_zero:
+                name = self.name_of(actor, player_dict)
+                result[name] = result.get(name, 0) + value
+        return result
+
+    def name_of(self, actor, player_dict):
+        """the name an actor index is keyed by in the stats"""
+        pid = self.player_ids[actor]
+        return player_dict.get(pid, self.names.get(pid, pid))
+
+
+def load_game(filepath):
+    return Game(mmaplog.load_events(filepath))
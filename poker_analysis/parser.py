@@ -1,17 +1,184 @@
-import re
-import pandas as pd
+from collections import namedtuple
+from poker_analysis import patterns
+
+#a single decoded log line. Every stats function works from a list of these instead of the raw entry strings.
+#kind is one of the event kinds below, amount is the parsed chip amount (or hand number for HAND_START),
+#detail holds whatever else the kind needs (action verb, street name, stack list, cards...),
+#cards the board as a STREET line shows it ("5♦, 7♥, 6♦ [3♥]"), None for every other kind
+Event = namedtuple("Event", ["kind", "player_id", "name", "amount", "detail", "at", "order", "cards"], defaults=(None,))
+
+#event kinds
+JOIN = "join"
+QUIT = "quit"
+STAND = "stand"
+ACTION = "action"
+STREET = "street"
+HAND_START = "hand_start"
+HAND_END = "hand_end"
+STACKS = "stacks"
+ADMIN_UPDATE = "admin_update"
+SHOW = "show"
+COLLECT = "collect"  # amount won from the pot; detail is the run it was won on, 1 or 2 when the board is run twice
+UNCALLED = "uncalled"  # amount of a bet nobody called, returned to the player
+DEAD_BLIND = "dead_blind"  # a missing small blind or ante: chips in the pot that aren't part of the player's bet
+OTHER = "other"
+
+PLAYER_AMOUNT_PATTERNS = {JOIN: patterns.JOIN, QUIT: patterns.QUIT, STAND: patterns.STAND}
+
+ACTION_VERBS = frozenset(("posts", "checks", "calls", "bets", "raises", "folds"))
+
 
 def load_log(filepath):
+    import pandas as pd  # imported on first use: mmaplog reads the logs the app is given without it
     return pd.read_csv(filepath)
 
-def create_player_dict(df):
-    player_dict = {}
-    pattern = r'joined the game'
-    for entry in df['entry']:
-        match = re.search(pattern, entry)
+
+def player_verb(entry):
+    """the word after the closing quote of a line starting with '"name @ id"', or None"""
+    quote = entry.find('" ', 1)
+    if quote == -1:
+        return None
+    space = entry.find(" ", quote + 2)
+    return entry[quote + 2:space] if space != -1 else entry[quote + 2:]
+
+
+def classify(entry):
+    """
+    Picks the event kind of a (stripped) log line from its prefix and a keyword, without running a regex.
+    Lines that start with a quoted player are dispatched on the word after the closing quote.
+    """
+    first = entry[:1]
+
+    if first == '"':
+        verb = player_verb(entry)
+        if verb in ACTION_VERBS:
+            if verb == "posts" and patterns.DEAD_BLIND.match(entry):
+                return DEAD_BLIND
+            return ACTION
+        if verb == "shows":
+            return SHOW
+        if verb == "collected":
+            return COLLECT
+        return OTHER
+
+    if first == "P":
+        return STACKS if entry.startswith("Player stacks:") else OTHER
+    if first == "-":
+        if entry.startswith("-- starting hand"):
+            return HAND_START
+        if entry.startswith("-- ending hand"):
+            return HAND_END
+        return OTHER
+    if first in ("F", "T", "R"):
+        if entry.startswith(("Flop", "Turn", "River")):
+            return STREET
+        if entry.startswith("The player "):
+            if "joined the game" in entry:
+                return JOIN
+            if "quits the game" in entry:
+                return QUIT
+            if "stand up with" in entry:
+                return STAND
+            return OTHER
+        if entry.startswith("The admin updated the player"):
+            return ADMIN_UPDATE
+    if first == "U":
+        return UNCALLED if entry.startswith("Uncalled bet of") else OTHER
+    return OTHER
+
+
+def tokenize_entry(entry, at=None, order=None):
+    """Turns one log line into an Event. Lines we don't use come back as OTHER."""
+    entry = entry.strip()
+
+    #player actions are most of the log. One anchored regex both recognises and splits them,
+    #which is cheaper than classifying first; everything else is dispatched by classify
+    if entry[:1] == '"':
+        match = patterns.ACTION.match(entry)
+        if match and not (match.group(3) == "posts" and patterns.DEAD_BLIND.match(entry)):
+            amount = match.group(4)
+            return Event(ACTION, match.group(2), match.group(1), float(amount) if amount else None, match.group(3), at, order)
+
+    kind = classify(entry)
+
+    if kind == HAND_END:
+        return Event(HAND_END, None, None, None, None, at, order)
+
+    elif kind == STACKS:
+        stacks = [(pid, name, float(stack)) for name, pid, stack in patterns.STACK.findall(entry)]
+        return Event(STACKS, None, None, None, stacks, at, order)
+
+    elif kind == STREET:
+        match = patterns.STREET.match(entry)
         if match:
-            name = entry.split()[2][1:]
-            id = entry.split()[4][:-1]
-            player_dict[id] = name
-    return player_dict
+            street = match.group(1) + (match.group(2) or "")
+            return Event(STREET, None, None, None, street, at, order, match.group(3).strip())
+
+    elif kind == HAND_START:
+        match = patterns.HAND_START.match(entry)
+        if match:
+            return Event(HAND_START, None, None, int(match.group(1)), None, at, order)
+
+    elif kind == SHOW:
+        match = patterns.SHOW.match(entry)
+        if match:
+            return Event(SHOW, match.group(2), match.group(1), None, match.group(3), at, order)
+
+    elif kind == COLLECT:
+        match = patterns.COLLECT.match(entry)
+        if match:
+            run = 2 if patterns.SECOND_RUN in entry else 1
+            return Event(COLLECT, match.group(2), match.group(1), float(match.group(3)), run, at, order)
+
+    elif kind == UNCALLED:
+        match = patterns.UNCALLED.match(entry)
+        if match:
+            return Event(UNCALLED, match.group(3), match.group(2), float(match.group(1)), None, at, order)
+
+    elif kind == DEAD_BLIND:
+        match = patterns.DEAD_BLIND.match(entry)
+        return Event(DEAD_BLIND, match.group(2), match.group(1), float(match.group(3)), None, at, order)
+
+    elif kind in (JOIN, QUIT, STAND):
+        match = PLAYER_AMOUNT_PATTERNS[kind].search(entry)
+        if match:
+            return Event(kind, match.group(2), match.group(1), float(match.group(3)), None, at, order)
 
+    elif kind == ADMIN_UPDATE:
+        match = patterns.ADMIN_UPDATE.search(entry)
+        if match:
+            old_stack = float(match.group(3))
+            new_stack = float(match.group(4))
+            return Event(ADMIN_UPDATE, match.group(2), match.group(1), new_stack - old_stack, (old_stack, new_stack), at, order)
+
+    return Event(OTHER, None, None, None, entry, at, order)
+
+
+def tokenize_log(df):
+    """
+    Reads the log once and returns a list of Events in the same order as the log
+    (pokernow logs are newest first, so reverse the list for chronological order).
+    """
+    return [
+        tokenize_entry(entry, at.strip(), order)
+        for entry, at, order in zip(df['entry'], df['at'], df['order'])
+    ]
+
+
+def load_events(filepath):
+    return tokenize_log(load_log(filepath))
+
+
+def create_player_dict(events, identities=None):
+    """
+    {pokernow id: name} for every player that joined the game.
+    With an identity.PlayerIndex the names are the canonical ones, so the same person under several ids
+    (or several display names) is counted as one player here and across sessions
+    """
+    player_dict = {}
+    for event in events:
+        if event.kind == JOIN:
+            player_dict[event.player_id] = event.name
+    if identities is not None:
+        player_dict = identities.resolve(player_dict)
+    return player_dict
@@ -0,0 +1,33 @@
+#patterns.py
+#every regex used to decode log lines, compiled once at import.
+#parser.classify decides which one (if any) a line needs, so most lines only ever run one of these
+
+import re
+
+#"name @ id" as it appears in every line that mentions a player. Groups: name, id
+PLAYER = r'"([^"]+) @ ([^"]+)"'
+AMOUNT = r'(\d+\.\d+)'
+
+JOIN = re.compile(r'The player ' + PLAYER + r' joined the game with a stack of ' + AMOUNT)
+QUIT = re.compile(PLAYER + r' quits the game with a stack of ' + AMOUNT)
+STAND = re.compile(PLAYER + r' stand up with the stack of ' + AMOUNT)
+ACTION = re.compile(r'^' + PLAYER + r' (posts|checks|calls|bets|raises|folds)\D*' + AMOUNT + r'?')
+STREET = re.compile(r'^(Flop|Turn|River)( \(second run\))?:(.*)')  # groups: street, second run, the board
+HAND_START = re.compile(r'^-- starting hand #(\d+)')
+STACK = re.compile(PLAYER + r' \(' + AMOUNT + r'\)')
+ADMIN_UPDATE = re.compile(r'updated the player ' + PLAYER + r' stack from ' + AMOUNT + r' to ' + AMOUNT)
+SHOW = re.compile(r'^' + PLAYER + r' shows a (.+?)\.?$')
+COLLECT = re.compile(r'^' + PLAYER + r' collected ' + AMOUNT + r' from pot')
+UNCALLED = re.compile(r'^Uncalled bet of ' + AMOUNT + r' returned to ' + PLAYER)
+#blinds that go into the pot without counting towards the player's bet on the street
+DEAD_BLIND = re.compile(r'^' + PLAYER + r' posts an? (?:missing small blind|ante) of ' + AMOUNT)
+SECOND_RUN = "on the second run"
+
+
+def csv_field(pattern):
+    """
+    The bytes version of a pattern above, for a line as it sits in a quoted CSV field: every " doubled.
+    A field with no quotes in it isn't quoted, and the doubled quotes only ever match where the line has them,
+    so the same pattern works on both. Used by mmaplog to match lines in place, without decoding them
+    """
+    return re.compile(pattern.pattern.replace('"', '""').encode())
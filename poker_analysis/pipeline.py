@@ -0,0 +1,203 @@
+#pipeline.py
+#everything that happens to an uploaded log: parse, stats, charts and the analysis matrix
+
+import math
+import numpy as np
+from poker_analysis import matrix, model, parser, render, stats, streaming, streets, timeline
+
+#columns of the stats API, in the order the client draws them
+STAT_COLUMNS = ("hands", "vpip", "pfr", "af", "calls", "raises", "bets", "folds") + streets.FREQUENCIES
+MAX_STACK_POINTS = 1000  # per player, about the width of the chart in pixels
+
+
+def preload():
+    """
+    Imports what analysing the first upload and rendering its PNG charts would otherwise import on the way:
+    pandas for the matrix, matplotlib for plots. Called in a parent process that forks the app's workers,
+    they start with both loaded and share the pages
+    """
+    import pandas  # noqa: F401
+    from poker_analysis import plots  # noqa: F401
+
+
+def compute_stats(game, player_dict):
+    """
+    Runs the stats shown on the results page. Returns {stat name: {player name: value}}, except "streets" and
+    "street_amounts", the per-street action counts and chips (streets.StreetTally.by_street).
+    """
+    calls = stats.get_action_counts(game, 'calls', player_dict)
+    raises = stats.get_action_counts(game, 'raises', player_dict)
+    bets = stats.get_action_counts(game, 'bets', player_dict)
+    folds = stats.get_action_counts(game, 'folds', player_dict)
+    hands = stats.track_player_presence(game, player_dict)
+
+    return {
+        **streets.tally_game(game).results(hands, lambda actor: game.name_of(actor, player_dict)),
+        "hands": hands,
+        "vpip": stats.calc_VPIP(game, player_dict),
+        "pfr": stats.calc_PFR(game, player_dict),
+        "calls": calls,
+        "raises": raises,
+        "bets": bets,
+        "folds": folds,
+        "af": stats.calc_aggression_factor(bets, raises, calls, player_dict),
+        "player_stacks": stats.track_player_stacks(game, player_dict),
+    }
+
+
+def chart_jobs(player_dict, results):
+    """(plots function name, args) for every chart on the results page, in display order"""
+    vpip, pfr, af = results["vpip"], results["pfr"], results["af"]
+    players = list(vpip.keys())
+    #plot_bar_chart labels the bars with player_dict's names, so the frequencies are put in that order
+    names = dict.fromkeys(player_dict.values())
+    cbet, fold_to_cbet, three_bet, wtsd = ({name: results[frequency].get(name, 0) for name in names}
+                                           for frequency in streets.FREQUENCIES)
+
+    return [
+        ("plot_bar_chart", (player_dict, af, "Aggression Factor", "Player", "AF")),
+        ("plot_bar_chart", (player_dict, results["calls"], "Calls", "Player", "Number of Calls")),
+        ("plot_bar_chart", (player_dict, results["raises"], "Raises", "Player", "Number of Raises")),
+        ("plot_bar_chart", (player_dict, results["bets"], "Bets", "Player", "Number of Bets")),
+        ("plot_bar_chart", (player_dict, results["folds"], "Folds", "Player", "Number of Folds")),
+        ("plot_vpip_vs_pfr", (vpip, pfr, players)),
+        ("plot_vpip_vs_af", (vpip, af, players)),
+        ("plot_bar_chart", (player_dict, cbet, "C-Bet", "Player", "C-Bet (%)")),
+        ("plot_bar_chart", (player_dict, fold_to_cbet, "Fold to C-Bet", "Player", "Fold to C-Bet (%)")),
+        ("plot_bar_chart", (player_dict, three_bet, "3-Bet", "Player", "3-Bet (%)")),
+        ("plot_bar_chart", (player_dict, wtsd, "Went to Showdown", "Player", "WTSD (%)")),
+        ("plot_player_stacks", (results["player_stacks"],)),
+    ]
+
+
+def stack_series(series, max_points=MAX_STACK_POINTS):
+    """timeline.StackSeries -> {"t": [epoch ms], "stack": [...]}, downsampled to at most max_points"""
+    series = timeline.downsample(series, max_points)
+    return {"t": series.at.astype(np.int64).tolist(), "stack": series.stack.tolist()}
+
+
+def stats_json(player_dict, results):
+    """
+    The results page's data as plain JSON types: one list per stat with a value per player
+    (in players order), and a thinned stack timeline per player. An AF of infinity (no calls) becomes None.
+    "streets" has the per-street action counts and chips the same way: {street: {action: {"count": [...], "amount": [...]}}}.
+    """
+    players = list(results["vpip"])
+    players += [name for name in dict.fromkeys(player_dict.values()) if name not in results["vpip"]]
+
+    columns = {}
+    for column in STAT_COLUMNS:
+        values = [results[column].get(player, 0) for player in players]
+        columns[column] = [None if isinstance(value, float) and math.isinf(value) else value for value in values]
+
+    street_columns = {
+        street: {
+            action: {
+                "count": [counts.get(player, 0) for player in players],
+                "amount": [results["street_amounts"].get(street, {}).get(action, {}).get(player, 0) for player in players],
+            }
+            for action, counts in actions.items()
+        }
+        for street, actions in results["streets"].items()
+    }
+
+    return {
+        "players": players,
+        "columns": columns,
+        "streets": street_columns,
+        "stacks": {player: stack_series(series) for player, series in results["player_stacks"].items()},
+    }
+
+
+def render_charts(player_dict, results):
+    return render.render_all(chart_jobs(player_dict, results))
+
+
+def analyze(filepath, progress=None, low_memory=False, identities=None, charts=False):
+    """
+    Full analysis of one log file. Returns a dict with the parsed game, the player dict,
+    the stat dicts, the matrix.baseStats counts, the matrix (a DataFrame, see matrix.writeMatrix), the chart PNGs
+    and "rows", the number of log lines that went into the stats.
+    Charts are drawn in the browser from stats_json, so the PNG versions are only rendered
+    here with charts=True; otherwise "charts" is None and render_charts can make them later.
+    progress, if given, is called as progress(stage, fraction done) before each stage.
+    With low_memory=True the log is read row by row into a streaming.StatsAccumulator instead of
+    being loaded whole, which keeps memory flat for very large logs; "game" is then None.
+    identities, an identity.PlayerIndex, maps player ids to canonical names before any stats are keyed.
+    """
+    def report(stage, fraction):
+        if progress is not None:
+            progress(stage, fraction)
+
+    report("parsing", 0.0)
+    if low_memory:
+        with open(filepath, "rb") as f:
+            accumulator = streaming.accumulate(f)
+        game = None
+        if identities is not None:
+            accumulator.player_dict = identities.resolve(accumulator.player_dict)
+        player_dict = accumulator.player_dict
+        rows = accumulator.events
+
+        report("stats", 0.3)
+        results = accumulator.results()
+        base = accumulator.base_stats()
+    else:
+        game = model.load_game(filepath)
+        player_dict = parser.create_player_dict(game.events, identities)
+        rows = len(game.events)
+
+        report("stats", 0.3)
+        results = compute_stats(game, player_dict)
+        base = matrix.baseStats(game, player_dict)
+
+    return finish(game, player_dict, results, base, charts, report, rows)
+
+
+def analyze_live(session, filepath, progress=None, identities=None, charts=False):
+    """
+    analyze for a log that is still growing. Only the rows newer than the last update of session
+    (a live.LiveSession) are parsed, and its running counters are updated instead of recomputed.
+    Raises live.NotAContinuation if filepath isn't a newer copy of the session's log.
+    "rows" is the number of new rows this update parsed.
+    """
+    def report(stage, fraction):
+        if progress is not None:
+            progress(stage, fraction)
+
+    report("parsing", 0.0)
+    with session.lock:
+        with open(filepath, "rb") as f:
+            rows = session.update(f)
+        accumulator = session.accumulator
+        if identities is not None:
+            accumulator.player_dict = identities.resolve(accumulator.player_dict)
+        player_dict = dict(accumulator.player_dict)
+
+        report("stats", 0.3)
+        results = accumulator.results()
+        base = accumulator.base_stats()
+
+    return finish(None, player_dict, results, base, charts, report, rows)
+
+
+def finish(game, player_dict, results, base, charts, report, rows=None):
+    """the charts and matrix stages shared by analyze and analyze_live, and the result dict they return"""
+    if charts:
+        report("charts", 0.4)
+        charts = render_charts(player_dict, results)
+    else:
+        charts = None
+
+    report("matrix", 0.8)
+    matrix_frame = matrix.buildMatrix(matrix.matrixColumns(player_dict, base))
+
+    return {
+        "game": game,
+        "player_dict": player_dict,
+        "stats": results,
+        "base": base,
+        "charts": charts,
+        "matrix": matrix_frame,
+        "rows": rows,
+    }
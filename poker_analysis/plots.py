@@ -1,149 +1,172 @@
+#plots.py
+#the results page charts as PNGs. Each chart type has a figure template (figure, axes, labels, grid)
+#built once per thread; a render only swaps in the data artists and redraws, instead of building and tearing down
+#a whole figure through pyplot. Figures are created directly on an Agg canvas, so there is no pyplot global state
+#to share between Flask threads, and each thread keeps its own templates.
 
-import matplotlib.pyplot as plt
 import io
-import base64
-import datetime
+import threading
+import numpy as np
 import matplotlib.dates as mdates
-from datetime import datetime
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from poker_analysis import timeline
 
-def plot_bar_chart(players, data, title, xlabel, ylabel):
-    player_names = list(players.values())
-    values = list(data.values())
-
-    fig, ax = plt.subplots(figsize=(12, 6))
-    bars = ax.bar(player_names, values, color='green')
-
-    ax.set_xlabel(xlabel, fontsize=14)
-    ax.set_ylabel(ylabel, fontsize=14)
-    ax.set_title(title, fontsize=16)
-    ax.set_xticks(range(len(player_names)))
-    ax.set_xticklabels(player_names, rotation=45, ha='right', fontsize=12, fontweight='bold')
-    ax.grid(axis='y', linestyle='--', alpha=0.7)
-
-    # Save plot to a BytesIO buffer
-    buf = io.BytesIO()
-    plt.tight_layout()
-    plt.savefig(buf, format='png')
-    buf.seek(0)
-
-    # Convert buffer to base64 and embed as HTML
-    encoded = base64.b64encode(buf.read()).decode('utf-8')
-    buf.close()
-    plt.close(fig)
-
-    return f'<img src="data:image/png;base64,{encoded}" />'
+_local = threading.local()
 
 
-def plot_vpip_vs_pfr(vpip, pfr, players):
-    fig, ax = plt.subplots(figsize=(12, 8)) 
+class _Template:
+    """A figure with its axes and fixed decorations, plus the data artists of the last render."""
 
+    def __init__(self, figsize):
+        self.fig = Figure(figsize=figsize)
+        FigureCanvasAgg(self.fig)
+        self.ax = self.fig.add_subplot()
+        self.artists = []
+        self.layout_key = None
 
-    ax.scatter(vpip.values(), pfr.values(), color='green')
+    def clear(self):
+        for artist in self.artists:
+            artist.remove()
+        self.artists = []
 
-    # Add player name labels
-    for player in players:
-        ax.text(vpip[player] + 1.5, pfr[player]+0.5, player,
-                fontsize=14, fontweight='bold', ha='right')
+    def layout(self, key):
+        """re-runs tight_layout only when what it depends on (tick labels, titles) has changed"""
+        ax = self.ax
+        #the widest y tick label decides the left margin
+        ticks = ax.yaxis.get_major_formatter().format_ticks(ax.yaxis.get_majorticklocs())
+        key = (key, max(map(len, ticks), default=0))
+        if key != self.layout_key:
+            self.fig.tight_layout()
+            self.layout_key = key
 
-    ax.set_xlabel("VPIP (%)", fontsize=16)
-    ax.set_ylabel("PFR (%)", fontsize=16)
-    ax.set_title("VPIP vs PFR", fontsize=18)
-    ax.grid(True)
+    def to_png(self):
+        buf = io.BytesIO()
+        self.fig.canvas.print_png(buf)
+        return buf.getvalue()
 
-    # Save plot to a BytesIO buffer
-    buf = io.BytesIO()
-    plt.tight_layout()
-    plt.savefig(buf, format='png')
-    buf.seek(0)
 
-    # Convert buffer to base64 and embed as HTML
-    encoded = base64.b64encode(buf.read()).decode('utf-8')
-    buf.close()
-    plt.close(fig)  # Close the plot to free memory
+def _template(kind, build):
+    templates = _local.__dict__.setdefault("templates", {})
+    if kind not in templates:
+        templates[kind] = build()
+    return templates[kind]
 
-    return f'<img src="data:image/png;base64,{encoded}" />'
 
+def _bar_template():
+    template = _Template((12, 6))
+    template.ax.grid(axis='y', linestyle='--', alpha=0.7)
+    return template
 
-#yes this is like copy pasted, but it ends up being simpler
-def plot_vpip_vs_af(vpip, af, players):
-    fig, ax = plt.subplots(figsize=(12, 8))
 
-    # Create x and y arrays with consistent ordering
-    x_vals = []
-    y_vals = []
-    for player in vpip:
-        if player in af:
-            x_vals.append(vpip[player])
-            y_vals.append(af[player])
+def _scatter_template():
+    template = _Template((12, 8))
+    template.ax.grid(True)
+    template.points = template.ax.scatter([], [], color='green')
+    return template
 
-    ax.scatter(x_vals, y_vals, color='green')
 
-    # Add player name labels
-    for player in vpip:
-        if player in af:
-            ax.text(vpip[player]+2, af[player]+0.05, player,
-                    fontsize=14, fontweight='bold', ha='right')
-
-    ax.set_xlabel("VPIP (%)", fontsize=16)
-    ax.set_ylabel("Aggression Factor", fontsize=16)
-    ax.set_title("VPIP vs Aggression Factor", fontsize=18)
+def _stacks_template():
+    template = _Template((16, 9))
+    ax = template.ax
+    # Format the x-axis to display time in HH:MM format
+    ax.xaxis_date()
+    ax.xaxis.set_major_formatter(mdates.DateFormatter('%H:%M'))
+    ax.set_xlabel("Time", fontsize=16)
+    ax.set_ylabel("Stack Size", fontsize=16)
+    ax.set_title("Player Stacks Over Time", fontsize=18)
     ax.grid(True)
+    template.lines = []
+    return template
 
-    # Save plot to a BytesIO buffer
-    buf = io.BytesIO()
-    plt.tight_layout()
-    plt.savefig(buf, format='png')
-    buf.seek(0)
 
-    # Convert buffer to base64 and embed as HTML
-    encoded = base64.b64encode(buf.read()).decode('utf-8')
-    buf.close()
-    plt.close(fig)
+def plot_bar_chart(players, data, title, xlabel, ylabel):
+    player_names = list(dict.fromkeys(players.values()))
+    values = list(data.values())
 
-    return f'<img src="data:image/png;base64,{encoded}" />'
+    template = _template("bar", _bar_template)
+    ax = template.ax
+    template.clear()
+    bars = ax.bar(range(len(values)), values, color='green')
+    template.artists.append(bars)
 
+    ax.set_xlabel(xlabel, fontsize=14)
+    ax.set_ylabel(ylabel, fontsize=14)
+    ax.set_title(title, fontsize=16)
+    ax.set_xticks(range(len(player_names)))
+    ax.set_xticklabels(player_names, rotation=45, ha='right', fontsize=12, fontweight='bold')
+    ax.relim()
+    ax.autoscale_view()
 
+    template.layout((tuple(player_names), xlabel, ylabel, title))
+    return template.to_png()
 
 
-def plot_player_stacks(player_stacks):
-    """
-    Plots the stack amounts of players over hands.
-    """
-    fig, ax = plt.subplots(figsize=(16, 9))
+def _scatter(kind, points, labels, offset, xlabel, ylabel, title):
+    """points: (x, y) pairs; labels: the text drawn at each point, shifted by offset"""
+    template = _template(kind, _scatter_template)
+    ax = template.ax
+    template.clear()
 
-    for player, stack_data in player_stacks.items():
+    xy = np.array(points, dtype=np.float64).reshape(-1, 2)
+    finite = np.isfinite(xy).all(axis=1)
+    template.points.set_offsets(xy)
 
-        times = []
-        for entry in stack_data:
-            timestamp = entry[0]
-            if isinstance(timestamp, str):
+    # Add player name labels
+    dx, dy = offset
+    for (x, y), label, ok in zip(xy.tolist(), labels, finite):
+        if ok:
+            template.artists.append(ax.text(x + dx, y + dy, label, fontsize=14, fontweight='bold', ha='right'))
 
-                timestamp = datetime.strptime(timestamp, '%Y-%m-%dT%H:%M:%S.%fZ')
-            times.append(timestamp)
+    #collections aren't covered by relim, so the data limits are reset from the points directly
+    ax.ignore_existing_data_limits = True
+    ax.update_datalim(xy[finite])
+    ax.autoscale_view()
 
-        stacks = [entry[1] for entry in stack_data]
-        
-        ax.plot(times, stacks, label=player)
+    ax.set_xlabel(xlabel, fontsize=16)
+    ax.set_ylabel(ylabel, fontsize=16)
+    ax.set_title(title, fontsize=18)
 
-    # Format the x-axis to display time in HH:MM format
-    ax.xaxis.set_major_formatter(mdates.DateFormatter('%H:%M'))
+    template.layout(None)
+    return template.to_png()
 
-    ax.set_xlabel("Time", fontsize=16)
-    ax.set_ylabel("Stack Size", fontsize=16)
-    ax.set_title("Player Stacks Over Time", fontsize=18)
-    ax.legend(loc='upper left')
-    ax.grid(True)
 
-    # Save plot to a BytesIO buffer
-    buf = io.BytesIO()
-    plt.tight_layout()
-    plt.savefig(buf, format='png')
-    buf.seek(0)
+def plot_vpip_vs_pfr(vpip, pfr, players):
+    points = [(vpip[player], pfr[player]) for player in players]
+    return _scatter("vpip_pfr", points, players, (1.5, 0.5), "VPIP (%)", "PFR (%)", "VPIP vs PFR")
 
-    # Convert buffer to base64 and embed as HTML
-    encoded = base64.b64encode(buf.read()).decode('utf-8')
-    buf.close()
-    plt.close(fig)
 
-    return f'<img src="data:image/png;base64,{encoded}" />'
+def plot_vpip_vs_af(vpip, af, players):
+    players = [player for player in vpip if player in af]
+    points = [(vpip[player], af[player]) for player in players]
+    return _scatter("vpip_af", points, players, (2, 0.05), "VPIP (%)", "Aggression Factor", "VPIP vs Aggression Factor")
 
+
+def plot_player_stacks(player_stacks):
+    """
+    Plots the stack amounts of players over hands.
+    player_stacks maps names to timeline.StackSeries; each line is downsampled to the figure's pixel width.
+    """
+    template = _template("stacks", _stacks_template)
+    fig, ax, lines = template.fig, template.ax, template.lines
+    max_points = int(fig.get_figwidth() * fig.dpi)
+
+    #a line per player, reusing the ones from the last render; colours follow the player order as a fresh figure's would
+    for i, (player, series) in enumerate(player_stacks.items()):
+        series = timeline.downsample(series, max_points)
+        if i < len(lines):
+            lines[i].set_data(series.at, series.stack)
+            lines[i].set_label(player)
+        else:
+            lines.extend(ax.plot(series.at, series.stack, label=player, color=f"C{i % 10}"))
+    for line in lines[len(player_stacks):]:
+        line.remove()
+    del lines[len(player_stacks):]
+
+    ax.relim()
+    ax.autoscale_view()
+    template.clear()
+    template.artists.append(ax.legend(loc='upper left'))
+
+    template.layout(None)
+    return template.to_png()
@@ -0,0 +1,79 @@
+#render.py
+#runs the plots.* chart functions on a pool of worker processes, so an upload waits for the slowest chart
+#rather than the sum of all of them
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+_pool = None
+_workers = None  # None until start_pool or configure has run
+
+
+def _init_worker():
+    #import matplotlib once per worker, before any job arrives (plots draws on Agg canvases, no backend to pick)
+    from poker_analysis import plots  # noqa: F401
+
+
+def _ping():
+    return os.getpid()
+
+
+def _render(name, args):
+    from poker_analysis import plots
+    return getattr(plots, name)(*args)
+
+
+def start_pool(workers=None):
+    """
+    Starts the chart pool and waits until every worker has imported matplotlib.
+    workers=0 disables the pool and charts are rendered in the calling process.
+    """
+    global _pool, _workers
+    if workers is None:
+        workers = min(8, os.cpu_count() or 1)
+    shutdown_pool()
+    _workers = workers
+    if workers > 0:
+        _pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker)
+        for future in [_pool.submit(_ping) for _ in range(workers)]:
+            future.result()
+    return _pool
+
+
+def configure(workers=None):
+    """
+    Sets the size of the pool without starting it: render_all starts it on first use. Nothing is forked,
+    so this is safe to call in a parent process that forks the app's workers, unlike start_pool
+    """
+    global _workers
+    shutdown_pool()
+    _workers = workers if workers is not None else min(8, os.cpu_count() or 1)
+
+
+def shutdown_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(cancel_futures=True)
+        _pool = None
+
+
+def render_all(jobs):
+    """
+    Renders a list of (plots function name, args) jobs and returns their PNGs (bytes) in the same order.
+    Uses the pool when one is running, starting it on first use, and falls back to rendering inline.
+    """
+    if _workers is None:
+        configure()
+    if _pool is None and _workers > 0:
+        start_pool(_workers)
+    if _pool is None:
+        return [_render(name, args) for name, args in jobs]
+
+    try:
+        futures = [_pool.submit(_render, name, args) for name, args in jobs]
+        return [future.result() for future in futures]
+    except BrokenProcessPool:
+        #a worker died (e.g. killed for memory). Restart the pool for the next upload and render this one inline
+        start_pool(_workers)
+        return [_render(name, args) for name, args in jobs]
@@ -0,0 +1,180 @@
+#replay.py
+#steps through each hand once, oldest first, and follows its chips: what every player put in on each street, what was
+#returned to them as an uncalled bet and what they collected from the pot, on either run of a run-it-twice hand.
+#What a player won or lost in a hand is then exact (collected + returned - put in), and summed over the hands it is
+#their net profit, whatever they did between hands (rebuys, admin stack changes, standing up and sitting back),
+#since none of that moves chips across the table. The state kept is one hand's; only the totals outlive it.
+#A hand that was all in before the board was out, with the cards of everyone still in it shown, is also kept as an
+#equity.AllInSpot, and ev() works out what those hands were worth on average rather than what the board gave
+
+from collections import defaultdict, namedtuple
+from poker_analysis import equity, parser
+
+#the event kinds a Replay looks at; callers that buffer a hand can keep just these
+KINDS = frozenset((parser.HAND_START, parser.HAND_END, parser.STACKS, parser.ACTION, parser.STREET,
+                   parser.DEAD_BLIND, parser.UNCALLED, parser.COLLECT, parser.SHOW))
+
+#net: {player id: chips won, negative if lost} for everyone who put chips in or collected;
+#pot: the chips that were in play once uncalled bets were returned;
+#all_in: ids that put their whole stack in; runs: 2 if the board was run twice;
+#spot: the hand's equity.AllInSpot if the board still to come decided it, else None
+HandResult = namedtuple("HandResult", ["number", "net", "pot", "all_in", "runs", "spot"])
+
+
+class HandState:
+    """the chips of the hand being replayed"""
+
+    __slots__ = ("number", "stacks", "street_bets", "committed", "collected", "runs", "folded", "shown", "board",
+                 "action_board")
+
+    def __init__(self, number):
+        self.number = number
+        self.stacks = {}  # pid: stack at the start of the hand, from its 'Player stacks:' line
+        self.street_bets = {}  # pid: chips in front of the player on the current street
+        self.committed = defaultdict(float)  # pid: chips put in this hand
+        self.collected = defaultdict(float)  # pid: chips taken from the pot
+        self.runs = 1
+        self.folded = set()
+        self.shown = {}  # pid: card codes of the cards they showed
+        self.board = []  # card codes of the first run's board so far
+        self.action_board = 0  # cards on the board at the last action
+
+    def action(self, pid, verb, amount):
+        """
+        Posts add to what a player has in front of them; calls, bets and raises are logged as the street
+        total they bring it to ('raises to 40'), so only the difference goes in
+        """
+        self.action_board = len(self.board)
+        if verb == "folds":
+            self.folded.add(pid)
+        if not amount:
+            return
+        before = self.street_bets.get(pid, 0.0)
+        after = before + amount if verb == "posts" else max(amount, before)
+        self.street_bets[pid] = after
+        self.committed[pid] += after - before
+
+    def result(self):
+        players = self.committed.keys() | self.collected.keys()
+        net = {pid: round(self.collected.get(pid, 0.0) - self.committed.get(pid, 0.0), 2) for pid in players}
+        all_in = {pid for pid, chips in self.committed.items()
+                  if pid in self.stacks and chips >= self.stacks[pid] - 0.005}
+        return HandResult(self.number, net, round(sum(self.committed.values()), 2), all_in, self.runs,
+                          self.spot(all_in))
+
+    def spot(self, all_in):
+        """
+        The hand as an equity.AllInSpot if the betting ended with someone all in and cards still to come,
+        and every player left in showed two cards; otherwise None
+        """
+        contesting = [pid for pid, chips in self.committed.items() if chips > 0 and pid not in self.folded]
+        if (len(contesting) < 2 or not all_in.intersection(contesting) or self.action_board >= len(self.board)
+                or any(len(self.shown.get(pid, ())) != 2 for pid in contesting)):
+            return None
+        return equity.AllInSpot(self.number, {pid: tuple(self.shown[pid]) for pid in contesting},
+                                self.board[:self.action_board],
+                                {pid: chips for pid, chips in self.committed.items() if chips > 0})
+
+
+class Replay:
+    """
+    Fed a log's events oldest first, hand by hand, with add(); only hands whose '-- ending hand' line has been
+    seen count, so a log cut off mid-hand gives the same totals however it is read.
+    Keeps the per-player totals, and a HandResult per hand if keep_hands is set
+    """
+
+    def __init__(self, keep_hands=False):
+        self.net = defaultdict(float)  # pid: chips won over every finished hand
+        self.hands = 0
+        self.unbalanced = 0  # hands whose collected chips don't add up to the pot, i.e. lines missing from the log
+        self.results = [] if keep_hands else None
+        self._spots = []  # (AllInSpot, net) of the spots ev() hasn't worked out yet
+        self._luck = defaultdict(float)  # pid: chips won in the spots worked out so far, minus their EV
+        self._hand = None
+
+    def add(self, event):
+        kind = event.kind
+        hand = self._hand
+        if kind == parser.HAND_START:
+            self._hand = HandState(event.amount)
+        elif hand is None:
+            return
+        elif kind == parser.ACTION:
+            hand.action(event.player_id, event.detail, event.amount)
+        elif kind == parser.STREET:
+            hand.street_bets = {}
+            if "second run" in event.detail:
+                hand.runs = 2
+            elif event.cards is not None:
+                hand.board = equity.parse_cards(event.cards)
+        elif kind == parser.SHOW:
+            hand.shown[event.player_id] = equity.parse_cards(event.detail)
+        elif kind == parser.STACKS:
+            hand.stacks = {pid: stack for pid, name, stack in event.detail}
+        elif kind == parser.DEAD_BLIND:
+            #dead money: into the pot without counting towards the player's bet
+            hand.committed[event.player_id] += event.amount
+        elif kind == parser.UNCALLED:
+            hand.committed[event.player_id] -= event.amount
+            hand.street_bets[event.player_id] = hand.street_bets.get(event.player_id, 0.0) - event.amount
+        elif kind == parser.COLLECT:
+            hand.collected[event.player_id] += event.amount
+            hand.runs = max(hand.runs, event.detail)
+        elif kind == parser.HAND_END:
+            self._finish(hand.result())
+            self._hand = None
+
+    def add_all(self, events):
+        for event in events:
+            self.add(event)
+        return self
+
+    def _finish(self, result):
+        self.hands += 1
+        for pid, chips in result.net.items():
+            self.net[pid] += chips
+        if abs(sum(result.net.values())) > 0.005:
+            self.unbalanced += 1
+        if self.results is not None:
+            self.results.append(result)
+        if result.spot is not None:
+            self._spots.append((result.spot, result.net))
+
+    def ev(self):
+        """
+        {pid: EV profit}: net profit with what each all-in spot actually paid swapped for its EV.
+        The spots added since the last call are evaluated together, in one equity.ev_nets
+        """
+        if self._spots:
+            for (spot, net), ev in zip(self._spots, equity.ev_nets([spot for spot, net in self._spots])):
+                for pid, chips in ev.items():
+                    self._luck[pid] += net.get(pid, 0.0) - chips
+            self._spots = []
+        return {pid: chips - self._luck.get(pid, 0.0) for pid, chips in self.net.items()}
+
+    def profits(self, player_dict, names=None):
+        """
+        {player name: net profit} for every name in player_dict (0 for those who never played a hand),
+        ids that share a name summed. Ids that never joined are looked up in names and only count towards a name
+        that is in player_dict
+        """
+        return _by_name(self.net, player_dict, names)
+
+    def ev_profits(self, player_dict, names=None):
+        """{player name: EV profit}, like profits()"""
+        return _by_name(self.ev(), player_dict, names)
+
+
+def _by_name(chips_by_id, player_dict, names):
+    result = {name: 0.0 for name in player_dict.values()}
+    names = names or {}
+    for pid, chips in chips_by_id.items():
+        name = player_dict.get(pid, names.get(pid, pid))
+        if name in result:
+            result[name] += chips
+    return {name: round(chips, 2) for name, chips in result.items()}
+
+
+def replay_game(game, keep_hands=False):
+    """a Replay of every hand of a model.Game"""
+    return Replay(keep_hands).add_all(event for event in reversed(game.events) if event.kind in KINDS)
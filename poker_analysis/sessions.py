@@ -0,0 +1,275 @@
+#sessions.py
+#lifetime stats across every uploaded log. Each analysed session adds one row of counts per player,
+#and a running total per player is updated in the same transaction, so lifetime queries read
+#one row per player no matter how many sessions have been merged in.
+#A session is one game: exports of the same game (a live re-upload, a later download that overlaps an earlier one)
+#share the order value of the game's first row, and only the newest export of a game is counted
+
+import contextlib
+import datetime
+import math
+import sqlite3
+from poker_analysis import live, matrix, model, parser, stats
+
+#(matrix column, table column) for every matrix column that adds up across sessions.
+#VPIP, PFR and AF are ratios, so they are worked out from the totals when queried, VPIP from vpip_hands
+#(hands with a preflop call or raise), which is stored alongside the matrix columns
+COLUMNS = (
+    ("Total Calls", "calls"),
+    ("Total Folds", "folds"),
+    ("Total Raises", "raises"),
+    ("Total Bets", "bets"),
+    ("Total Hands", "hands"),
+    ("Preflop Calls", "preflop_calls"),
+    ("Preflop Raises", "preflop_raises"),
+    ("Preflop Folds", "preflop_folds"),
+    ("Number of Shows", "shows"),
+    ("Number of Stands", "stands"),
+    ("Net Profit", "net_profit"),
+    ("EV Profit", "ev_profit"),
+)
+FIELDS = tuple(field for column, field in COLUMNS) + ("vpip_hands",)
+CHIPS = ("net_profit", "ev_profit")  # the REAL fields, rounded to the cent when totalled
+FIELD_TYPES = ", ".join(f"{field} {'REAL' if field in CHIPS else 'INTEGER'} NOT NULL DEFAULT 0" for field in FIELDS)
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY,
+    digest TEXT NOT NULL UNIQUE,
+    filename TEXT,
+    added TEXT NOT NULL,
+    game TEXT,
+    last_order INTEGER
+);
+CREATE TABLE IF NOT EXISTS session_stats (
+    session_id INTEGER NOT NULL REFERENCES sessions(id),
+    player TEXT NOT NULL,
+    {FIELD_TYPES},
+    PRIMARY KEY (session_id, player)
+);
+CREATE TABLE IF NOT EXISTS lifetime (
+    player TEXT PRIMARY KEY,
+    sessions INTEGER NOT NULL DEFAULT 0,
+    {FIELD_TYPES}
+);
+"""
+
+
+def session_rows(player_dict, base):
+    """{player name: {field: value}} for one session, from matrix.baseStats output"""
+    columns = dict(matrix.matrixColumns(player_dict, base))
+    players = {player for column, field in COLUMNS for player in columns[column]}
+    return {
+        player: {**{field: columns[column].get(player, 0) for column, field in COLUMNS},
+                 "vpip_hands": base["vpipHands"].get(player, 0)}
+        for player in players
+    }
+
+
+def ratios(totals):
+    """
+    adds vpip, pfr and af to {player: {field: total}}, the same way the results page works them out.
+    A ratio that isn't a finite number (the AF of a player who never called) is None, so the rows are valid JSON
+    """
+    hands = {player: row["hands"] for player, row in totals.items()}
+    vpip_hands = {player: row["vpip_hands"] for player, row in totals.items()}
+    preflop_raises = {player: row["preflop_raises"] for player, row in totals.items()}
+    calls = {player: row["calls"] for player, row in totals.items()}
+    raises = {player: row["raises"] for player, row in totals.items()}
+    bets = {player: row["bets"] for player, row in totals.items()}
+
+    vpip = stats.vpip_from_counts(hands, vpip_hands)
+    pfr = stats.pfr_from_counts(hands, preflop_raises)
+    af = stats.calc_aggression_factor(bets, raises, calls, {})
+    for player, row in totals.items():
+        row.update({name: value if math.isfinite(value) else None
+                    for name, value in (("vpip", vpip[player]), ("pfr", pfr[player]), ("af", af[player]))})
+    return totals
+
+
+def combine_rows(session_rows_list):
+    """
+    {player: {sessions, field totals..., vpip, pfr, af}} over several sessions' session_rows,
+    the shape SessionStore.lifetime returns, without going through the database
+    """
+    totals = {}
+    for rows in session_rows_list:
+        for player, row in rows.items():
+            player_totals = totals.setdefault(player, {"sessions": 0, **dict.fromkeys(FIELDS, 0)})
+            player_totals["sessions"] += 1
+            for field in FIELDS:
+                player_totals[field] += row[field]
+    for row in totals.values():
+        for field in CHIPS:
+            row[field] = round(row[field], 2)
+    return ratios(totals)
+
+
+class SessionStore:
+    """
+    SQLite file holding per-session, per-player counts plus lifetime totals.
+    Sessions are keyed by the log's content hash, so merging the same log twice is a no-op, and by the game
+    they are an export of, so merging an export of a game already in only replaces it if it is newer.
+    Every call opens its own connection, so the store can be shared between job threads.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with self._connect() as db:
+            db.executescript(SCHEMA)
+            self._migrate(db)
+
+    @contextlib.contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=30)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def _migrate(self, db):
+        """
+        Adds vpip_hands and ev_profit to a store created before they existed. Old sessions only have their preflop
+        calls and raises, so their sum stands in for vpip_hands (it counts a hand with both twice), and their
+        net profit for ev_profit. Sessions from before games were recorded have none, except live ones,
+        which were keyed live-<game>
+        """
+        columns = {row[1] for row in db.execute("PRAGMA table_info(sessions)")}
+        if "game" not in columns:
+            db.execute("ALTER TABLE sessions ADD COLUMN game TEXT")
+            db.execute("ALTER TABLE sessions ADD COLUMN last_order INTEGER")
+            db.execute("UPDATE sessions SET game = substr(digest, 6) WHERE digest LIKE 'live-%'")
+        db.execute("CREATE UNIQUE INDEX IF NOT EXISTS sessions_game ON sessions(game) WHERE game IS NOT NULL")
+        for table in ("session_stats", "lifetime"):
+            columns = {row[1] for row in db.execute(f"PRAGMA table_info({table})")}
+            if "vpip_hands" not in columns:
+                db.execute(f"ALTER TABLE {table} ADD COLUMN vpip_hands INTEGER NOT NULL DEFAULT 0")
+                db.execute(f"UPDATE {table} SET vpip_hands = preflop_calls + preflop_raises")
+            if "ev_profit" not in columns:
+                db.execute(f"ALTER TABLE {table} ADD COLUMN ev_profit REAL NOT NULL DEFAULT 0")
+                db.execute(f"UPDATE {table} SET ev_profit = net_profit")
+
+    def has(self, digest):
+        with self._connect() as db:
+            return db.execute("SELECT 1 FROM sessions WHERE digest = ?", (digest,)).fetchone() is not None
+
+    def add(self, digest, filename, player_dict, base, game=None, last_order=None):
+        """
+        Merges one analysed session in. Returns False if it was already there.
+        game (live.session_key) and last_order (live.newest_order) say which game the log is an export of and how far
+        it goes: a session of the same game is taken out of the totals and replaced if this one goes further,
+        otherwise nothing is added. That is how a live game's latest snapshot keeps its lifetime rows current.
+        """
+        rows = session_rows(player_dict, base)
+        added = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        placeholders = ", ".join("?" for _ in FIELDS)
+        totals = ", ".join(f"{field} = {field} + excluded.{field}" for field in FIELDS)
+
+        with self._connect() as db:
+            if game is not None:
+                row = db.execute("SELECT digest, last_order FROM sessions WHERE game = ?", (game,)).fetchone()
+                if row is not None:
+                    known, known_order = row
+                    if known_order is not None and (last_order is None or last_order <= known_order):
+                        return False
+                    self._remove(db, known)
+            cursor = db.execute("INSERT OR IGNORE INTO sessions (digest, filename, added, game, last_order) "
+                                "VALUES (?, ?, ?, ?, ?)", (digest, filename, added, game, last_order))
+            if cursor.rowcount == 0:
+                return False
+            session_id = cursor.lastrowid
+
+            values = [(player, *(row[field] for field in FIELDS)) for player, row in rows.items()]
+            db.executemany(f"INSERT INTO session_stats (session_id, player, {', '.join(FIELDS)}) "
+                           f"VALUES ({session_id}, ?, {placeholders})", values)
+            db.executemany(f"INSERT INTO lifetime (player, sessions, {', '.join(FIELDS)}) VALUES (?, 1, {placeholders}) "
+                           f"ON CONFLICT(player) DO UPDATE SET sessions = sessions + 1, {totals}", values)
+        return True
+
+    def _remove(self, db, digest):
+        """takes a session's rows out of the lifetime totals and deletes it"""
+        row = db.execute("SELECT id FROM sessions WHERE digest = ?", (digest,)).fetchone()
+        if row is None:
+            return
+        session_id = row[0]
+        values = db.execute(f"SELECT {', '.join(FIELDS)}, player FROM session_stats WHERE session_id = ?",
+                            (session_id,)).fetchall()
+        totals = ", ".join(f"{field} = {field} - ?" for field in FIELDS)
+        db.executemany(f"UPDATE lifetime SET sessions = sessions - 1, {totals} WHERE player = ?", values)
+        db.execute("DELETE FROM lifetime WHERE sessions <= 0")
+        db.execute("DELETE FROM session_stats WHERE session_id = ?", (session_id,))
+        db.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+
+    def add_log(self, filepath, digest, filename=None, identities=None):
+        """Analyses a log file (stats only, no charts) and merges it in."""
+        if self.has(digest):
+            return False
+        game = model.load_game(filepath)
+        player_dict = parser.create_player_dict(game.events, identities)
+        return self.add(digest, filename or filepath, player_dict, matrix.baseStats(game, player_dict),
+                        game=live.session_key(filepath), last_order=live.newest_order(filepath))
+
+    def sessions(self):
+        """[(digest, filename, added)], oldest first"""
+        with self._connect() as db:
+            return db.execute("SELECT digest, filename, added FROM sessions ORDER BY id").fetchall()
+
+    def lifetime(self, players=None):
+        """{player: {sessions, counts..., vpip, pfr, af}} summed over every session, optionally for some players only"""
+        query = f"SELECT player, sessions, {', '.join(FIELDS)} FROM lifetime"
+        params = ()
+        if players is not None:
+            players = list(players)
+            query += f" WHERE player IN ({', '.join('?' for _ in players)})"
+            params = players
+
+        with self._connect() as db:
+            totals = {
+                player: {"sessions": sessions, **dict(zip(FIELDS, values))}
+                for player, sessions, *values in db.execute(query, params)
+            }
+        for row in totals.values():
+            for field in CHIPS:
+                row[field] = round(row[field], 2)
+        return ratios(totals)
+
+    def merge_player(self, name, into):
+        """
+        Folds every session row of player `name` into `into` and rebuilds both lifetime rows.
+        Use after identity.PlayerIndex.merge or rename (into need not exist yet) so the history
+        already merged in follows the new identity.
+        """
+        sums = ", ".join(f"SUM({field})" for field in FIELDS)
+        totals = ", ".join(f"{field} = {field} + excluded.{field}" for field in FIELDS)
+
+        with self._connect() as db:
+            db.execute(f"INSERT INTO session_stats (session_id, player, {', '.join(FIELDS)}) "
+                       f"SELECT session_id, ?, {', '.join(FIELDS)} FROM session_stats WHERE player = ? "
+                       f"ON CONFLICT(session_id, player) DO UPDATE SET {totals}", (into, name))
+            db.execute("DELETE FROM session_stats WHERE player = ?", (name,))
+            db.execute("DELETE FROM lifetime WHERE player IN (?, ?)", (name, into))
+            db.execute(f"INSERT INTO lifetime (player, sessions, {', '.join(FIELDS)}) "
+                       f"SELECT player, COUNT(*), {sums} FROM session_stats WHERE player = ? GROUP BY player", (into,))
+
+    def session_matrix(self):
+        """
+        every session's rows in one matrix indexed by (session digest, player), with the columns constructMatrix
+        produces, read straight from the database rather than re-analysing or re-reading per-log CSVs
+        """
+        import pandas as pd
+        with self._connect() as db:
+            rows = db.execute(f"SELECT digest, player, {', '.join(FIELDS)} FROM session_stats "
+                              f"JOIN sessions ON sessions.id = session_id ORDER BY sessions.id").fetchall()
+        totals = ratios({(digest, player): dict(zip(FIELDS, values)) for digest, player, *values in rows})
+        result = matrix_from_rows(totals)
+        result.index = pd.MultiIndex.from_tuples(list(totals), names=["session", "player"])
+        return result
+
+
+def matrix_from_rows(totals):
+    """{key: {field: value}} with vpip/pfr/af (ratios output) -> a matrix in constructMatrix column order"""
+    columns = [(column, {key: row[field] for key, row in totals.items()}) for column, field in COLUMNS]
+    columns[8:8] = [(name, {key: row[field] for key, row in totals.items()})
+                    for name, field in (("VPIP", "vpip"), ("PFR", "pfr"), ("Agression Factor", "af"))]
+    return matrix.buildMatrix(columns)
@@ -0,0 +1,225 @@
+#streaming.py
+#analyses a log as it is read, without holding the whole log (or a Game) in memory.
+#Used for very large uploads: memory stays flat apart from the stack timeline, which grows with the number of hands
+
+import csv
+import io
+from collections import Counter, defaultdict
+from poker_analysis import model, parser, replay, stats, streets, timeline
+
+
+def iter_rows(stream):
+    """
+    Yields (entry, at, order) for each row of a pokernow CSV read from a file object.
+    Works on binary streams (e.g. an upload's request stream) as well as text files;
+    the csv module reads it in buffered chunks, so only one row is decoded at a time.
+    """
+    if isinstance(stream.read(0), bytes):
+        stream = io.TextIOWrapper(stream, encoding="utf-8", newline="")
+
+    reader = csv.reader(stream)
+    header = next(reader, None)
+    if header is None:
+        return
+    entry_col, at_col, order_col = (header.index(column) for column in ("entry", "at", "order"))
+
+    for row in reader:
+        if row:
+            yield row[entry_col], row[at_col].strip(), int(row[order_col])
+
+
+def iter_events(stream):
+    for entry, at, order in iter_rows(stream):
+        yield parser.tokenize_entry(entry, at, order)
+
+
+class StatsAccumulator:
+    """
+    Incremental version of the stats in stats.py, fed one Event at a time in log order.
+
+    Anything that needs streets or chips is worked out per hand: the lines of a hand are buffered until
+    its '-- starting hand' line, which is where the hand ends when reading newest first.
+    Everything is kept by player id and only mapped to names in results()/base_stats(),
+    once all the 'joined the game' lines have been seen.
+    """
+
+    def __init__(self):
+        self.player_dict = {}
+        self.names = {}  # latest display name of each id (the first one read), the fallback when an id never joined
+
+        self.action_counts = Counter()  # (action, pid)
+        self.street_hands = Counter()  # (street, action, pid): hands with that action on that street
+        self.street_tally = streets.StreetTally()  # keyed by pid
+        self.vpip_hands = Counter()  # pid: hands with a preflop call or raise
+        self.hand_counts = Counter()  # pid: 'Player stacks:' snapshots the player is in
+        self.shows = Counter()
+        self.stands = Counter()
+        self.replay = replay.Replay()  # keyed by pid
+
+        self.stack_timeline = []  # (pid, timestamp, stack) in log order
+        self._hand_buffer = []  # the replay.KINDS lines of the hand being read, newest first
+        self._seen_order = {}  # ids that acted or sat in, ordered by their latest line in the log
+        self.events = 0  # lines read through add_all that aren't OTHER, the ones the stats look at
+
+    def add(self, event):
+        kind = event.kind
+        if event.player_id is not None:
+            self.names.setdefault(event.player_id, event.name)
+
+        if kind == parser.ACTION:
+            self._seen(event.player_id)
+            self.action_counts[event.detail, event.player_id] += 1
+            self._hand_buffer.append(event)
+
+        elif kind == parser.HAND_START:
+            self._finish_hand(event)
+
+        elif kind == parser.STACKS:
+            self._hand_buffer.append(event)
+            for pid, name, stack in event.detail:
+                self.names.setdefault(pid, name)
+                self.hand_counts[pid] += 1
+                self.stack_timeline.append((pid, event.at, stack))
+            for pid, name, stack in reversed(event.detail):
+                self._seen(pid)
+
+        elif kind == parser.JOIN:
+            self.player_dict[event.player_id] = event.name
+
+        elif kind in (parser.QUIT, parser.STAND):
+            if kind == parser.STAND:
+                self.stands[event.player_id] += 1
+            elif event.amount == 0:
+                self.stack_timeline.append((event.player_id, event.at, 0.00))
+
+        elif kind == parser.SHOW:
+            self.shows[event.player_id] += 1
+            self._hand_buffer.append(event)
+
+        elif kind in replay.KINDS:
+            self._hand_buffer.append(event)
+
+    def _seen(self, pid):
+        self._seen_order.pop(pid, None)
+        self._seen_order[pid] = None
+
+    def _first_seen(self):
+        """ids in the order they first appear in the game (the reverse of their latest line in the log)"""
+        return reversed(self._seen_order)
+
+    def _stack_points(self):
+        """(pid, timestamp, stack) in log order"""
+        return self.stack_timeline
+
+    def add_all(self, events):
+        for event in events:
+            self.add(event)
+            if event.kind != parser.OTHER:
+                self.events += 1
+        return self
+
+    def _finish_hand(self, start):
+        hand = self._hand_buffer[::-1]
+        street = model.PREFLOP
+        acted = set()
+        actions = []
+        for event in hand:
+            if event.kind == parser.STREET:
+                street = model.STREET_CODES[event.detail]
+                actions.append(event)
+            elif event.kind == parser.ACTION:
+                acted.add((street, event.detail, event.player_id))
+                actions.append(event)
+        self.street_hands.update(acted)
+        self.vpip_hands.update({pid for street, action, pid in acted
+                                if street == model.PREFLOP and action in ("calls", "raises")})
+        self.street_tally.add_hand(*streets.hand_actions(actions))
+        self.replay.add(start)
+        self.replay.add_all(hand)
+        self._hand_buffer = []
+
+    #----------------------------------------------#
+    #results, in the same shapes the stats.py functions return
+
+    def _name(self, pid):
+        return self.player_dict.get(pid, self.names.get(pid, pid))
+
+    def _count_by_name(self, counts):
+        """
+        like stats.track_player_presence: zero counts left out, players in the order they first appear in the game
+        """
+        result = {}
+        for pid in self._first_seen():
+            if counts.get(pid):
+                name = self._name(pid)
+                result[name] = result.get(name, 0) + counts[pid]
+        return result
+
+    def action_counts_for(self, action):
+        result = {pid: self.action_counts[action, pid] for pid in self.player_dict}
+        return {self.player_dict[pid]: count for pid, count in result.items()}
+
+    def street_actions(self, action, street=model.PREFLOP):
+        return self._count_by_name({pid: count for (s, a, pid), count in self.street_hands.items()
+                                    if s == street and a == action})
+
+    def _known_counts(self, counts):
+        result = {name: 0 for name in self.player_dict.values()}
+        for pid, count in counts.items():
+            name = self._name(pid)
+            if name in result:
+                result[name] += count
+        return result
+
+    def _street_tally(self):
+        return self.street_tally
+
+    def player_stacks(self):
+        player_stacks = defaultdict(list)
+        for pid, at, stack in self._stack_points():
+            player_stacks[self._name(pid)].append((at, stack))
+        return timeline.series_from_points(player_stacks)
+
+    def base_stats(self):
+        """same keys and values as matrix.baseStats"""
+        return {
+            "totalCalls": self.action_counts_for("calls"),
+            "totalFolds": self.action_counts_for("folds"),
+            "totalRaises": self.action_counts_for("raises"),
+            "totalBets": self.action_counts_for("bets"),
+            "preflopRaises": self.street_actions("raises"),
+            "preflopCalls": self.street_actions("calls"),
+            "preflopFolds": self.street_actions("folds"),
+            "hands": self._count_by_name(self.hand_counts),
+            "numberOfShows": self._known_counts(self.shows),
+            "numberOfStands": self._known_counts(self.stands),
+            "vpipHands": self._count_by_name(self.vpip_hands),
+            "netProfit": self.replay.profits(self.player_dict, self.names),
+            "evProfit": self.replay.ev_profits(self.player_dict, self.names),
+        }
+
+    def results(self):
+        """same keys and values as pipeline.compute_stats"""
+        calls = self.action_counts_for("calls")
+        raises = self.action_counts_for("raises")
+        bets = self.action_counts_for("bets")
+        hands = self._count_by_name(self.hand_counts)
+        preflop_raises = self.street_actions("raises")
+
+        return {
+            **self._street_tally().results(hands, self._name),
+            "hands": hands,
+            "vpip": stats.vpip_from_counts(hands, self._count_by_name(self.vpip_hands)),
+            "pfr": stats.pfr_from_counts(hands, preflop_raises),
+            "calls": calls,
+            "raises": raises,
+            "bets": bets,
+            "folds": self.action_counts_for("folds"),
+            "af": stats.calc_aggression_factor(bets, raises, calls, self.player_dict),
+            "player_stacks": self.player_stacks(),
+        }
+
+
+def accumulate(stream):
+    """Reads a whole log from a file object into a StatsAccumulator."""
+    return StatsAccumulator().add_all(iter_events(stream))
@@ -0,0 +1,188 @@
+#streets.py
+#per-street breakdown of every action, and the stats that depend on the order of actions within a hand:
+#c-bet, fold to c-bet, 3-bet and went to showdown. A StreetTally is fed one hand at a time and works all of them
+#out in a single pass over that hand's actions; model.Game's hand index, the streaming accumulator and the live
+#accumulator all feed the same tally, so every path gives the same numbers.
+
+import math
+from collections import Counter, defaultdict
+import numpy as np
+from poker_analysis import parser
+from poker_analysis.model import ACTION_CODES, ACTIONS, PREFLOP, STREET_CODES, STREETS
+
+FLOP = STREET_CODES["Flop"]
+BETS, RAISES, FOLDS = ACTION_CODES["bets"], ACTION_CODES["raises"], ACTION_CODES["folds"]
+
+#the frequencies, as the stat names pipeline.compute_stats returns them under
+CBET = "cbet"
+FOLD_TO_CBET = "fold_to_cbet"
+THREE_BET = "three_bet"
+WTSD = "wtsd"
+FREQUENCIES = (CBET, FOLD_TO_CBET, THREE_BET, WTSD)
+
+
+class StreetTally:
+    """
+    Action counts and chip amounts by (street, action, player), and how often each player had the chance to
+    c-bet, fold to a c-bet, 3-bet or go to showdown and how often they did. Players are whatever keys the
+    caller uses (actor indices, player ids); results() maps them to names.
+
+    - c-bet: the last preflop raiser makes the first bet on the flop. They have the chance if nobody bet before them.
+    - fold to c-bet: a player's first flop action after a c-bet, while nobody has raised it, is a fold.
+    - 3-bet: a player re-raises the single preflop raise. Everyone else acting after that raise has the chance.
+    - went to showdown: of the hands a player saw the flop in (didn't fold preflop, and the flop came),
+      the ones they never folded and at least one other player didn't either.
+    """
+
+    def __init__(self):
+        self.counts = Counter()  # (street, action, player)
+        self.amounts = defaultdict(float)  # (street, action, player): chips as logged (a raise's "to" amount)
+        self.chances = Counter()  # (frequency, player)
+        self.made = Counter()  # (frequency, player)
+
+    def add_hand(self, actions, last_street=PREFLOP, count=True):
+        """
+        One hand: actions as (street code, action code, player, amount) in the order they happened,
+        last_street the highest street code dealt (model.STREETS; a second run counts as past the flop).
+        count=False leaves counts and amounts alone, for a caller that adds them up in bulk.
+        """
+        counts, amounts, chances, made = self.counts, self.amounts, self.chances, self.made
+        folded = {}  # player: whether they folded, for every player in the hand
+        folded_preflop = set()
+        aggressor, preflop_raises, three_bet_chances = None, 0, set()
+        flop_bet, aggressor_acted, cbet_open, cbet_responses = False, False, False, set()
+
+        for street, action, player, amount in actions:
+            if count:
+                key = (street, action, player)
+                counts[key] += 1
+                if amount:
+                    amounts[key] += amount
+            folded.setdefault(player, False)
+
+            if street == PREFLOP:
+                if preflop_raises == 1 and player != aggressor and player not in three_bet_chances:
+                    three_bet_chances.add(player)
+                    chances[THREE_BET, player] += 1
+                    made[THREE_BET, player] += action == RAISES
+                if action == RAISES:
+                    preflop_raises += 1
+                    aggressor = player
+                elif action == FOLDS:
+                    folded_preflop.add(player)
+
+            elif street == FLOP:
+                if player == aggressor and not aggressor_acted:
+                    aggressor_acted = True
+                    if not flop_bet:
+                        chances[CBET, player] += 1
+                        made[CBET, player] += action == BETS
+                        cbet_open = action == BETS
+                elif cbet_open and player not in cbet_responses:
+                    cbet_responses.add(player)
+                    chances[FOLD_TO_CBET, player] += 1
+                    made[FOLD_TO_CBET, player] += action == FOLDS
+                if action == BETS:
+                    flop_bet = True
+                elif action == RAISES:
+                    flop_bet, cbet_open = True, False
+
+            if action == FOLDS:
+                folded[player] = True
+
+        if last_street >= FLOP:
+            showdown = sum(not f for f in folded.values()) >= 2
+            for player, f in folded.items():
+                if player not in folded_preflop:
+                    chances[WTSD, player] += 1
+                    made[WTSD, player] += showdown and not f
+
+    def copy(self):
+        tally = StreetTally()
+        tally.counts, tally.amounts = self.counts.copy(), self.amounts.copy()
+        tally.chances, tally.made = self.chances.copy(), self.made.copy()
+        return tally
+
+    def by_street(self, name, amounts=False):
+        """{street name: {action: {player name: count (or chips)}}}, only the streets and actions that occur"""
+        values = self.amounts if amounts else self.counts
+        result = {}
+        for (street, action, player), value in values.items():
+            if value:
+                players = result.setdefault(STREETS[street], {}).setdefault(ACTIONS[action], {})
+                player_name = name(player)
+                players[player_name] = players.get(player_name, 0) + value
+        if amounts:
+            for actions in result.values():
+                for players in actions.values():
+                    for player_name, value in players.items():
+                        players[player_name] = round(value, 2)
+        return {street: result[street] for street in STREETS if street in result}
+
+    def frequencies(self, players, name):
+        """
+        {frequency: {player name: percentage}} for every name in players, floored like VPIP and PFR;
+        0 for a player who never had the chance
+        """
+        chances, made = defaultdict(Counter), defaultdict(Counter)
+        for (frequency, player), count in self.chances.items():
+            chances[frequency][name(player)] += count
+        for (frequency, player), count in self.made.items():
+            made[frequency][name(player)] += count
+
+        return {
+            frequency: {
+                player: math.floor(made[frequency][player] / chances[frequency][player] * 100)
+                if chances[frequency][player] else 0
+                for player in players
+            }
+            for frequency in FREQUENCIES
+        }
+
+    def results(self, players, name):
+        """the frequencies plus "streets" and "street_amounts" (see by_street), merged into one dict of stats"""
+        results = self.frequencies(players, name)
+        results["streets"] = self.by_street(name)
+        results["street_amounts"] = self.by_street(name, amounts=True)
+        return results
+
+
+def tally_game(game):
+    """a StreetTally of every hand of a model.Game, keyed by actor index. Counts and amounts are NumPy group-bys"""
+    tally = StreetTally()
+    start = game.hand_offsets[0]
+    street, action, actor, amount = (column[start:] for column in (game.street, game.action, game.actor, game.amount))
+
+    shape = (len(STREETS), len(ACTIONS), max(game.n_players, 1))
+    keys = np.ravel_multi_index((street, action, actor), shape)
+    counts = np.bincount(keys, minlength=np.prod(shape))
+    amounts = np.bincount(keys, weights=amount, minlength=np.prod(shape))
+    nonzero = np.flatnonzero(counts)
+    for key, n, chips in zip(zip(*(index.tolist() for index in np.unravel_index(nonzero, shape))),
+                             counts[nonzero].tolist(), amounts[nonzero].tolist()):
+        tally.counts[key] = n
+        if chips:
+            tally.amounts[key] = chips
+
+    street, action, actor, amount = (column.tolist() for column in (street, action, actor, amount))
+    offsets = (game.hand_offsets - start).tolist()
+    for i, last_street in enumerate(game.hand_street.tolist()):
+        rows = slice(offsets[i], offsets[i + 1])
+        tally.add_hand(zip(street[rows], action[rows], actor[rows], amount[rows]), last_street, count=False)
+    return tally
+
+
+def hand_actions(events):
+    """
+    The arguments of StreetTally.add_hand for a hand's ACTION and STREET events, oldest first:
+    (street code, action code, player id, amount) per action, and the highest street code dealt
+    """
+    street = last_street = PREFLOP
+    actions = []
+    for event in events:
+        if event.kind == parser.STREET:
+            street = STREET_CODES[event.detail]
+            last_street = max(last_street, street)
+        else:
+            actions.append((street, ACTION_CODES[event.detail], event.player_id, event.amount))
+    return actions, last_street
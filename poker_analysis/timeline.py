@@ -0,0 +1,81 @@
+#timeline.py
+#stack-over-time series as NumPy arrays, and downsampling them to what a chart can actually show.
+#A long session has a point per player per hand; drawing more points than the chart has pixels
+#only costs time, so series are thinned with largest-triangle-three-buckets, which keeps the shape of the line
+#(peaks, busts, rebuys) while dropping the points in between
+
+from collections import namedtuple
+import numpy as np
+from poker_analysis import model
+
+#at: datetime64[ms] array, stack: float64 array, both oldest first
+StackSeries = namedtuple("StackSeries", ["at", "stack"])
+
+
+def series_from_points(points_by_player):
+    """
+    {player: [(timestamp string, stack)] in log order (newest first)} -> {player: StackSeries} oldest first.
+    All the timestamps are parsed in one go rather than point by point.
+    """
+    players = list(points_by_player)
+    lengths = [len(points_by_player[player]) for player in players]
+    times = model.parse_timestamps([at for player in players for at, stack in points_by_player[player]])
+    stacks = np.array([stack for player in players for at, stack in points_by_player[player]], dtype=np.float64)
+
+    result = {}
+    start = 0
+    for player, length in zip(players, lengths):
+        end = start + length
+        result[player] = StackSeries(times[start:end][::-1], stacks[start:end][::-1])
+        start = end
+    return result
+
+
+def lttb(x, y, threshold):
+    """
+    Indices of the threshold points of (x, y) that largest-triangle-three-buckets keeps.
+    The first and last points are always kept; each bucket in between contributes the point that makes
+    the biggest triangle with the point kept before it and the average of the next bucket.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = x.astype(np.float64)
+    y = y.astype(np.float64)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)  # buckets between the first and last point
+
+    #the next-bucket averages don't depend on earlier choices, so they are all worked out up front
+    bounds = np.append(edges, n)
+    counts = np.diff(bounds)
+    avg_x = (np.add.reduceat(x, bounds[:-1]) / counts).tolist()
+    avg_y = (np.add.reduceat(y, bounds[:-1]) / counts).tolist()
+
+    #buckets are usually a handful of points, where plain Python beats a NumPy call per bucket
+    xs, ys, edges = x.tolist(), y.tolist(), edges.tolist()
+    kept = [0]
+    px, py = xs[0], ys[0]
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        nx, ny = avg_x[i + 1], avg_y[i + 1]
+        if end - start > 32:
+            area = np.abs((px - nx) * (y[start:end] - py) - (px - x[start:end]) * (ny - py))
+            best = start + int(np.argmax(area))
+        else:
+            best, best_area = start, -1.0
+            for j in range(start, end):
+                area = abs((px - nx) * (ys[j] - py) - (px - xs[j]) * (ny - py))
+                if area > best_area:
+                    best, best_area = j, area
+        kept.append(best)
+        px, py = xs[best], ys[best]
+    kept.append(n - 1)
+    return np.array(kept, dtype=np.int64)
+
+
+def downsample(series, max_points):
+    """a StackSeries with at most max_points points, chosen by lttb"""
+    if len(series.at) <= max_points:
+        return series
+    kept = lttb(series.at.astype(np.int64), series.stack, max_points)
+    return StackSeries(series.at[kept], series.stack[kept])
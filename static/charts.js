@@ -0,0 +1,150 @@
+// charts.js
+// Draws the results page charts in the browser from the stats API (pipeline.stats_json), as SVG.
+// renderStatsCharts(root) fills every [data-stats-url] element under root.
+
+(function () {
+    const SVG = "http://www.w3.org/2000/svg";
+    const WIDTH = 1000, HEIGHT = 500;
+    const MARGIN = {top: 40, right: 30, bottom: 90, left: 70};
+    const GREEN = "#2e7d32";
+    const PALETTE = ["#1f77b4", "#ff7f0e", "#2ca02c", "#d62728", "#9467bd", "#8c564b",
+                     "#e377c2", "#7f7f7f", "#bcbd22", "#17becf"];
+
+    function el(name, attrs, parent, text) {
+        const node = document.createElementNS(SVG, name);
+        for (const key in attrs) node.setAttribute(key, attrs[key]);
+        if (text !== undefined) node.textContent = text;
+        if (parent) parent.appendChild(node);
+        return node;
+    }
+
+    // roughly five round tick values covering [lo, hi]
+    function ticks(lo, hi) {
+        if (hi === lo) hi = lo + 1;
+        const raw = (hi - lo) / 5;
+        const magnitude = Math.pow(10, Math.floor(Math.log10(raw)));
+        const step = [1, 2, 5, 10].map(m => m * magnitude).find(s => s >= raw);
+        const values = [];
+        for (let v = Math.floor(lo / step) * step; v <= hi + step / 2; v += step) values.push(+v.toFixed(10));
+        return values;
+    }
+
+    function scale(domain, range) {
+        const [d0, d1] = domain, [r0, r1] = range;
+        return v => r0 + (v - d0) / ((d1 - d0) || 1) * (r1 - r0);
+    }
+
+    function frame(title, xlabel, ylabel) {
+        const svg = el("svg", {viewBox: `0 0 ${WIDTH} ${HEIGHT}`, width: "100%", role: "img"});
+        el("text", {x: WIDTH / 2, y: 24, "text-anchor": "middle", "font-size": 20}, svg, title);
+        el("text", {x: WIDTH / 2, y: HEIGHT - 8, "text-anchor": "middle", "font-size": 15}, svg, xlabel);
+        el("text", {x: 18, y: HEIGHT / 2, "text-anchor": "middle", "font-size": 15,
+                    transform: `rotate(-90 18 ${HEIGHT / 2})`}, svg, ylabel);
+        return svg;
+    }
+
+    function yAxis(svg, values, y) {
+        for (const v of values) {
+            el("line", {x1: MARGIN.left, x2: WIDTH - MARGIN.right, y1: y(v), y2: y(v),
+                        stroke: "#ddd", "stroke-dasharray": "4 3"}, svg);
+            el("text", {x: MARGIN.left - 8, y: y(v) + 4, "text-anchor": "end", "font-size": 12}, svg, v);
+        }
+    }
+
+    function barChart(players, values, title, ylabel) {
+        const svg = frame(title, "Player", ylabel);
+        const numbers = values.map(v => v === null ? 0 : v);
+        const yTicks = ticks(0, Math.max(...numbers, 0));
+        const y = scale([0, yTicks[yTicks.length - 1]], [HEIGHT - MARGIN.bottom, MARGIN.top]);
+        yAxis(svg, yTicks, y);
+
+        const band = (WIDTH - MARGIN.left - MARGIN.right) / Math.max(players.length, 1);
+        players.forEach((player, i) => {
+            const x = MARGIN.left + i * band;
+            const bar = el("rect", {x: x + band * 0.15, width: band * 0.7, y: y(numbers[i]),
+                                    height: y(0) - y(numbers[i]), fill: GREEN}, svg);
+            el("title", {}, bar, `${player}: ${values[i] === null ? "∞" : values[i]}`);
+            el("text", {x: x + band / 2, y: HEIGHT - MARGIN.bottom + 16, "font-size": 13, "font-weight": "bold",
+                        "text-anchor": "end", transform: `rotate(-45 ${x + band / 2} ${HEIGHT - MARGIN.bottom + 16})`},
+               svg, player);
+        });
+        return svg;
+    }
+
+    function scatter(players, xs, ys, title, xlabel, ylabel) {
+        const svg = frame(title, xlabel, ylabel);
+        const points = players.map((p, i) => [p, xs[i], ys[i]]).filter(([, x, y]) => x !== null && y !== null);
+        const xTicks = ticks(0, Math.max(...points.map(p => p[1]), 1));
+        const yTicks = ticks(0, Math.max(...points.map(p => p[2]), 1));
+        const x = scale([0, xTicks[xTicks.length - 1]], [MARGIN.left, WIDTH - MARGIN.right]);
+        const y = scale([0, yTicks[yTicks.length - 1]], [HEIGHT - MARGIN.bottom, MARGIN.top]);
+        yAxis(svg, yTicks, y);
+        for (const v of xTicks) {
+            el("text", {x: x(v), y: HEIGHT - MARGIN.bottom + 18, "text-anchor": "middle", "font-size": 12}, svg, v);
+        }
+        for (const [player, px, py] of points) {
+            el("circle", {cx: x(px), cy: y(py), r: 6, fill: GREEN}, svg);
+            el("text", {x: x(px) + 9, y: y(py) - 7, "font-size": 14, "font-weight": "bold"}, svg, player);
+        }
+        return svg;
+    }
+
+    function stackChart(stacks) {
+        const svg = frame("Player Stacks Over Time", "Time", "Stack Size");
+        const series = Object.entries(stacks).filter(([, s]) => s.t.length);
+        const times = series.flatMap(([, s]) => s.t);
+        const t0 = Math.min(...times), t1 = Math.max(...times);
+        const yTicks = ticks(0, Math.max(...series.flatMap(([, s]) => s.stack), 1));
+        const x = scale([t0, t1], [MARGIN.left, WIDTH - MARGIN.right - 140]);
+        const y = scale([0, yTicks[yTicks.length - 1]], [HEIGHT - MARGIN.bottom, MARGIN.top]);
+        yAxis(svg, yTicks, y);
+
+        for (let i = 0; i <= 5; i++) {
+            const t = t0 + (t1 - t0) * i / 5;
+            const label = new Date(t).toISOString().slice(11, 16);
+            el("text", {x: x(t), y: HEIGHT - MARGIN.bottom + 18, "text-anchor": "middle", "font-size": 12}, svg, label);
+        }
+        series.forEach(([player, s], i) => {
+            const color = PALETTE[i % PALETTE.length];
+            const d = s.t.map((t, j) => `${j ? "L" : "M"}${x(t).toFixed(1)},${y(s.stack[j]).toFixed(1)}`).join("");
+            el("title", {}, el("path", {d: d, fill: "none", stroke: color, "stroke-width": 2}, svg), player);
+            el("rect", {x: WIDTH - MARGIN.right - 120, y: MARGIN.top + i * 20, width: 12, height: 12, fill: color}, svg);
+            el("text", {x: WIDTH - MARGIN.right - 102, y: MARGIN.top + i * 20 + 11, "font-size": 13}, svg, player);
+        });
+        return svg;
+    }
+
+    function draw(container, data) {
+        const p = data.players, c = data.columns;
+        const charts = [
+            barChart(p, c.af, "Aggression Factor", "AF"),
+            barChart(p, c.calls, "Calls", "Number of Calls"),
+            barChart(p, c.raises, "Raises", "Number of Raises"),
+            barChart(p, c.bets, "Bets", "Number of Bets"),
+            barChart(p, c.folds, "Folds", "Number of Folds"),
+            scatter(p, c.vpip, c.pfr, "VPIP vs PFR", "VPIP (%)", "PFR (%)"),
+            scatter(p, c.vpip, c.af, "VPIP vs Aggression Factor", "VPIP (%)", "Aggression Factor"),
+            barChart(p, c.cbet, "C-Bet", "C-Bet (%)"),
+            barChart(p, c.fold_to_cbet, "Fold to C-Bet", "Fold to C-Bet (%)"),
+            barChart(p, c.three_bet, "3-Bet", "3-Bet (%)"),
+            barChart(p, c.wtsd, "Went to Showdown", "WTSD (%)"),
+            stackChart(data.stacks),
+        ];
+        container.textContent = "";
+        for (const chart of charts) {
+            const card = document.createElement("div");
+            card.className = "chart-card";
+            card.appendChild(chart);
+            container.appendChild(card);
+        }
+    }
+
+    window.renderStatsCharts = function (root) {
+        for (const container of (root || document).querySelectorAll("[data-stats-url]")) {
+            fetch(container.dataset.statsUrl)
+                .then(response => response.json())
+                .then(data => draw(container, data))
+                .catch(() => { container.textContent = "Could not load the charts."; });
+        }
+    };
+})();
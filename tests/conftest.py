@@ -0,0 +1,85 @@
+#conftest.py
+#fixtures shared by the tests: the sample log in PokerLogs, logs cut from it, and the app running in a scratch directory
+
+import importlib
+import io
+import os
+import re
+import time
+import pytest
+from poker_analysis import jobs
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLE_LOG = os.path.join(ROOT, "PokerLogs", "24_9_19-log.csv")
+
+
+@pytest.fixture(scope="session")
+def sample_rows():
+    """(header, rows) of the sample log as raw CSV lines, rows newest first as in the file"""
+    with open(SAMPLE_LOG, "rb") as f:
+        lines = f.read().splitlines()
+    return lines[0], lines[1:]
+
+
+def another_game(rows, n):
+    """
+    The sample log's rows as the n-th other game's: their order values moved up past those of the sample and of
+    the games before n, so no two games share one
+    """
+    shift = n * 10 ** 11
+    return [row[:row.rfind(b",") + 1] + str(int(row[row.rfind(b",") + 1:]) + shift).encode() for row in rows]
+
+
+@pytest.fixture
+def write_log(tmp_path, sample_rows):
+    """write_log(name, rows) saves rows under the sample log's header in tmp_path and returns the path"""
+    header = sample_rows[0]
+
+    def write(name, rows):
+        path = tmp_path / name
+        path.write_bytes(b"\n".join([header, *rows]) + b"\n")
+        return str(path)
+    return write
+
+
+@pytest.fixture(scope="session")
+def app_module(tmp_path_factory):
+    """app imported with its working directory in a scratch folder, so uploads, caches and databases start empty"""
+    cwd = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp("app"))
+    try:
+        module = importlib.import_module("app")
+        yield module
+        module.job_runner.shutdown()
+        module.render.shutdown_pool()
+    finally:
+        os.chdir(cwd)
+
+
+def wait_for(app_module, job_id):
+    """the job once it is done or failed"""
+    while app_module.job_runner.store.get(job_id)["status"] not in (jobs.DONE, jobs.FAILED):
+        time.sleep(0.05)
+    return app_module.job_runner.store.get(job_id)
+
+
+@pytest.fixture
+def upload(app_module):
+    """
+    upload(data, name, live=False) posts a log to the upload form and waits for its job. Returns the job,
+    or None if the upload was answered straight from the cache. With wait=False it returns the job's id at once
+    """
+    client = app_module.app.test_client()
+
+    def post(data, name="log.csv", live=False, wait=True):
+        form = {"file": (io.BytesIO(data), name)}
+        if live:
+            form["live"] = "1"
+        response = client.post("/", data=form, content_type="multipart/form-data")
+        assert response.status_code == 200
+        match = re.search(rb"/jobs/([0-9a-f]{32})", response.data)
+        if match is None:
+            return None
+        job_id = match.group(1).decode()
+        return wait_for(app_module, job_id) if wait else job_id
+    return post
@@ -0,0 +1,69 @@
+#test_app.py
+#regressions in the upload path: two uploads with the same file name, and the lifetime totals of one game uploaded
+#again and again, whole, in parts and live
+
+import json
+import pytest
+from poker_analysis import sessions
+from tests.conftest import another_game, wait_for
+
+
+def test_uploads_with_the_same_name_keep_their_own_logs(app_module, upload, sample_rows):
+    header, rows = sample_rows
+    original = b"\n".join([header, *rows]) + b"\n"
+    #another game under the same file name: its own order values, and Zed (name and id) where Cal was
+    renamed = b"\n".join([header, *another_game(rows, 1)]).replace(b"Cal @ E18ViE79KI", b"Zed @ Zq4xT0pLm2") + b"\n"
+
+    #both queued before either is analysed
+    job_ids = [upload(data, "log.csv", wait=False) for data in (original, renamed)]
+    first, second = (wait_for(app_module, job_id) for job_id in job_ids)
+
+    assert first["status"] == second["status"] == "done"
+    assert first["filepath"] != second["filepath"]
+    assert first["matrix_file"] != second["matrix_file"]
+    players = [set(app_module.results_cache.get(job["digest"])["player_dict"].values()) for job in (first, second)]
+    assert "Cal" in players[0] and "Zed" not in players[0]
+    assert "Zed" in players[1] and "Cal" not in players[1]
+    with open(first["filepath"], "rb") as f:
+        assert f.read() == original
+    with open(second["filepath"], "rb") as f:
+        assert f.read() == renamed
+
+
+def test_one_game_counts_once_in_lifetime(app_module, upload, sample_rows, write_log, tmp_path):
+    header, rows = sample_rows
+    rows = another_game(rows, 2)  # not a game the other tests upload
+
+    def export(n):
+        """the log as downloaded when only its oldest n rows had been played"""
+        return b"\n".join([header, *rows[len(rows) - n:]]) + b"\n"
+
+    fresh = sessions.SessionStore(str(tmp_path / "sessions.db"))
+    fresh.add_log(write_log("full.csv", rows), "full")
+    expected = {player: row["hands"] for player, row in fresh.lifetime().items()}
+
+    def hands():
+        lifetime = app_module.app.test_client().get("/lifetime").get_json()
+        return {player: lifetime.get(player, {}).get("hands", 0) for player in expected}
+
+    before = hands()
+    for n in (len(rows) // 2, len(rows), len(rows) // 3, len(rows)):
+        upload(export(n))
+    assert {player: count - before[player] for player, count in hands().items()} == expected
+    for n in (len(rows) // 4, len(rows) // 2, len(rows)):
+        upload(export(n), live=True)
+    assert {player: count - before[player] for player, count in hands().items()} == expected
+
+
+def test_lifetime_is_strict_json(app_module, upload, sample_rows):
+    header, rows = sample_rows
+    #another game, with a player who never calls
+    rows = [row.replace(b"Jad @ C-X_HjGFDq", b"Nocall @ N0caLL00xx") for row in another_game(rows, 3)
+            if b'Jad @ C-X_HjGFDq"" calls' not in row]
+    upload(b"\n".join([header, *rows]) + b"\n")
+
+    def refuse(constant):
+        raise ValueError(constant)
+    response = app_module.app.test_client().get("/lifetime")
+    lifetime = json.loads(response.data, parse_constant=refuse)
+    assert lifetime["Nocall"]["calls"] == 0 and lifetime["Nocall"]["af"] is None
@@ -0,0 +1,78 @@
+#test_batch.py
+#multi-file uploads: overlapping exports, given in any order or with their rows shuffled, merge back into the one
+#newest-first log, and the batch's status is valid JSON whatever the players' ratios are
+
+import io
+import json
+import random
+import re
+import time
+import pytest
+from poker_analysis import combine, mmaplog
+from tests.conftest import another_game
+
+
+def orders(path):
+    with mmaplog.LogFile(path) as log:
+        return log.spans()[0].tolist()
+
+
+@pytest.mark.parametrize("newest_first", [True, False])
+def test_overlapping_exports_merge_in_any_order(tmp_path, sample_rows, write_log, newest_first):
+    header, rows = sample_rows
+    #two exports of the game, the later one with every row, the earlier one its oldest two thirds
+    paths = [write_log("full.csv", rows), write_log("early.csv", rows[len(rows) // 3:])]
+    if not newest_first:
+        paths.reverse()
+
+    (merged,), skipped = combine.combine(paths, str(tmp_path / "merged"))
+    assert skipped == []
+    assert merged.rows == len(rows)
+    assert merged.duplicates == len(rows) - len(rows) // 3
+    with open(merged.path, "rb") as f:
+        assert f.read().splitlines() == [header, *rows]
+
+
+def test_shuffled_rows_merge_newest_first(tmp_path, sample_rows, write_log):
+    header, rows = sample_rows
+    rng = random.Random(3)
+    newer, older = rows[:len(rows) // 2 + 10], rows[len(rows) // 2 - 10:]
+    shuffled = [rng.sample(newer, len(newer)), rng.sample(older, len(older))]
+    paths = [write_log("a.csv", shuffled[0]), write_log("b.csv", shuffled[1])]
+
+    (merged,), skipped = combine.combine(paths, str(tmp_path / "merged"))
+    assert merged.rows == len(rows)
+    assert orders(merged.path) == sorted(orders(merged.path), reverse=True)
+    with open(merged.path, "rb") as f:
+        assert f.read().splitlines() == [header, *rows]
+
+
+def test_separate_games_are_not_merged(tmp_path, sample_rows, write_log):
+    header, rows = sample_rows
+    paths = [write_log("late.csv", rows[:100]), write_log("early.csv", rows[200:])]
+    combined, skipped = combine.combine(paths, str(tmp_path / "merged"))
+    assert [log.path for log in combined] == paths
+
+
+def test_batch_status_is_strict_json(app_module, sample_rows):
+    header, rows = sample_rows
+    #two games, one with a player who never calls
+    nocall = [row.replace(b"Jad @ C-X_HjGFDq", b"Nobatchcall @ N0b4tchC4l")
+              for row in another_game(rows, 4) if b'Jad @ C-X_HjGFDq"" calls' not in row]
+    logs = [b"\n".join([header, *game]) + b"\n" for game in (nocall, another_game(rows, 5))]
+
+    client = app_module.app.test_client()
+    response = client.post("/", data={"file": [(io.BytesIO(log), f"log{i}.csv") for i, log in enumerate(logs)]},
+                           content_type="multipart/form-data")
+    batch_id = re.search(rb"/batches/([0-9a-f]{32})", response.data).group(1).decode()
+
+    def refuse(constant):
+        raise ValueError(constant)
+    for _ in range(600):
+        status = json.loads(client.get(f"/batches/{batch_id}").data, parse_constant=refuse)
+        if status["status"] == "done":
+            break
+        time.sleep(0.05)
+    assert [game["status"] for game in status["games"]] == ["done", "done"]
+    assert status["players"]["Nobatchcall"]["calls"] == 0
+    assert status["players"]["Nobatchcall"]["af"] is None
@@ -0,0 +1,54 @@
+#test_cache.py
+#the result cache and the asset store stay under max_bytes, and only scan their directory when a running total
+#says they might not be, or every SCAN_EVERY puts
+
+import os
+import pytest
+from poker_analysis import assets, cache
+
+
+@pytest.fixture
+def scans(monkeypatch):
+    """how many times a directory has been listed"""
+    counted = []
+    scandir = os.scandir
+
+    def counting(path):
+        counted.append(path)
+        return scandir(path)
+    monkeypatch.setattr(os, "scandir", counting)
+    return counted
+
+
+def directory_size(path):
+    return sum(entry.stat().st_size for entry in os.scandir(path))
+
+
+def test_result_cache_scans_only_when_over(tmp_path, scans):
+    store = cache.ResultCache(str(tmp_path), max_bytes=50_000, version="v")
+    for i in range(10):
+        store.put(f"key{i}", b"x" * 1000)
+    assert len(scans) == 1  # the first put, which has no total yet
+    for i in range(10, 200):
+        store.put(f"key{i}", b"x" * 1000)
+    assert directory_size(str(tmp_path)) <= 50_000
+    assert 4 <= len(scans) < 60
+    assert store.get("key199") == b"x" * 1000
+    assert store.get("key0") is None
+
+
+def test_result_cache_scans_every_so_often(tmp_path, scans):
+    store = cache.ResultCache(str(tmp_path), max_bytes=10 ** 9, version="v")
+    for i in range(cache.SCAN_EVERY * 2):
+        store.put(f"key{i}", i)
+    assert len(scans) == 3
+
+
+def test_asset_store_scans_only_when_over(tmp_path, scans):
+    store = assets.AssetStore(str(tmp_path), max_bytes=50_000)
+    for i in range(200):
+        store.put(f"file{i}.bin", os.urandom(1000))
+    assert directory_size(str(tmp_path)) <= 50_000
+    assert len(scans) < 60
+    assert store.find("file199.bin") is not None
+    assert store.find("file0.bin") is None
@@ -0,0 +1,117 @@
+#test_equity.py
+#the table-driven evaluator against a brute force one (every 5 of the 7 cards ranked by the poker rules directly),
+#and the EV of an all-in spot against the average over every runout ranked that way
+
+import itertools
+import random
+import numpy as np
+import pytest
+from poker_analysis import equity
+
+
+def brute_force(cards):
+    """(category, tie-break ranks) of the best 5 of 7 card codes"""
+    return max(_five(hand) for hand in itertools.combinations(cards, 5))
+
+
+def _five(hand):
+    ranks = sorted((card >> 2 for card in hand), reverse=True)
+    flush = len({card & 3 for card in hand}) == 1
+    straight_top = None
+    if len(set(ranks)) == 5:
+        if ranks[0] - ranks[4] == 4:
+            straight_top = ranks[0]
+        elif ranks == [12, 3, 2, 1, 0]:
+            straight_top = 3
+    groups = sorted(((ranks.count(rank), rank) for rank in set(ranks)), reverse=True)
+    counts = [count for count, rank in groups]
+    by_count = [rank for count, rank in groups]
+    if straight_top is not None and flush:
+        return equity.STRAIGHT_FLUSH, (straight_top,)
+    if counts[0] == 4:
+        return equity.QUADS, tuple(by_count)
+    if counts[:2] == [3, 2]:
+        return equity.FULL_HOUSE, tuple(by_count)
+    if flush:
+        return equity.FLUSH, tuple(ranks)
+    if straight_top is not None:
+        return equity.STRAIGHT, (straight_top,)
+    if counts[0] == 3:
+        return equity.TRIPS, tuple(by_count)
+    if counts[:2] == [2, 2]:
+        return equity.TWO_PAIR, tuple(by_count)
+    if counts[0] == 2:
+        return equity.PAIR, tuple(by_count)
+    return equity.HIGH_CARD, tuple(ranks)
+
+
+def decode(value):
+    """a hand value back into (category, tie-break ranks), the zero padding dropped"""
+    value = int(value)
+    ranks = tuple(value >> 4 * (4 - i) & 15 for i in range(5))
+    return value >> 20, ranks
+
+
+def expected(cards):
+    category, ranks = brute_force(cards)
+    return category, tuple(ranks) + (0,) * (5 - len(ranks))
+
+
+@pytest.fixture(scope="module", autouse=True)
+def tables(tmp_path_factory):
+    equity.load_tables(str(tmp_path_factory.mktemp("tables")))
+
+
+def test_random_hands_match_brute_force():
+    rng = random.Random(1913)
+    hands = [rng.sample(range(52), 7) for _ in range(3000)]
+    values = equity.evaluate(np.array(hands))
+    for hand, value in zip(hands, values):
+        assert decode(value) == expected(hand), equity.describe(value)
+
+
+@pytest.mark.parametrize("text, category", [
+    ("A♠ 2♥ 3♦ 4♣ 5♠ 9♥ K♦", equity.STRAIGHT),  # the wheel tops at 5
+    ("A♥ 2♥ 3♥ 4♥ 5♥ K♥ 9♠", equity.STRAIGHT_FLUSH),
+    ("9♠ 10♠ J♠ Q♠ K♠ A♠ 2♣", equity.STRAIGHT_FLUSH),
+    ("2♠ 4♠ 6♠ 8♠ 10♠ J♠ Q♠", equity.FLUSH),  # seven of a suit, the best five count
+    ("K♠ K♥ K♦ Q♠ Q♥ Q♦ 2♣", equity.FULL_HOUSE),  # two sets
+    ("7♠ 7♥ 7♦ 7♣ A♠ A♥ A♦", equity.QUADS),
+    ("5♠ 5♥ 9♦ 9♣ J♠ J♥ 2♦", equity.TWO_PAIR),  # three pairs, the kicker from the third
+])
+def test_edge_hands(text, category):
+    cards = equity.parse_cards(text)
+    value = equity.evaluate([cards])[0]
+    assert decode(value) == expected(cards)
+    assert decode(value)[0] == category
+
+
+def test_higher_value_wins():
+    rng = random.Random(7)
+    hands = [rng.sample(range(52), 7) for _ in range(500)]
+    values = equity.evaluate(np.array(hands)).tolist()
+    for (a, value_a), (b, value_b) in zip(zip(hands, values), zip(hands[1:], values[1:])):
+        assert (value_a > value_b) == (expected(a) > expected(b))
+        assert (value_a == value_b) == (expected(a) == expected(b))
+
+
+def test_flop_all_in_ev_matches_every_runout():
+    hole = {"a": tuple(equity.parse_cards("A♠ K♦")), "b": tuple(equity.parse_cards("Q♣ Q♥"))}
+    board = equity.parse_cards("2♠ 7♠ K♥")
+    committed = {"a": 60.0, "b": 60.0, "folded": 5.0}
+    pot = sum(committed.values())
+
+    dead = set(board) | {card for cards in hole.values() for card in cards}
+    won = {"a": 0.0, "b": 0.0}
+    runouts = list(itertools.combinations([card for card in range(52) if card not in dead], 2))
+    for runout in runouts:
+        ranked = {pid: brute_force(list(cards) + board + list(runout)) for pid, cards in hole.items()}
+        best = max(ranked.values())
+        winners = [pid for pid, rank in ranked.items() if rank == best]
+        for pid in winners:
+            won[pid] += pot / len(winners)
+
+    (ev,) = equity.ev_nets([equity.AllInSpot(1, hole, board, committed)])
+    for pid in hole:
+        assert ev[pid] == pytest.approx(won[pid] / len(runouts) - committed[pid], abs=0.01)
+    assert ev["folded"] == -5.0
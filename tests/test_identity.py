@@ -0,0 +1,41 @@
+#test_identity.py
+#merges and renames are seen by every PlayerIndex on the database (each process has its own), and generation(),
+#asked on every cache lookup, only goes to the database when it has been written
+
+from poker_analysis import identity
+
+
+def test_merge_and_rename_reach_other_indexes(tmp_path):
+    path = str(tmp_path / "players.db")
+    first, second = identity.PlayerIndex(path), identity.PlayerIndex(path)
+    assert first.resolve({"id1": "Cal", "id2": "Calvin"}) == {"id1": "Cal", "id2": "Calvin"}
+    assert second.generation() == 0
+
+    second.merge("Calvin", "Cal")
+    assert first.generation() == 1
+    assert first.resolve({"id2": "Calvin"}) == {"id2": "Cal"}
+
+    first.rename("Cal", "Calum")
+    assert second.generation() == 2
+    assert second.resolve({"id1": "Cal", "id2": "Calvin"}) == {"id1": "Calum", "id2": "Calum"}
+
+
+def test_generation_reads_the_database_only_after_a_write(tmp_path, monkeypatch):
+    index = identity.PlayerIndex(str(tmp_path / "players.db"))
+    other = identity.PlayerIndex(str(tmp_path / "players.db"))
+    other.resolve({"id1": "Cal", "id2": "Calvin"})
+    connect = index._connect
+    connections = []
+
+    def counted():
+        connections.append(1)
+        return connect()
+    monkeypatch.setattr(index, "_connect", counted)
+
+    for _ in range(100):
+        assert index.generation() == 0
+    assert len(connections) == 1
+
+    other.merge("Calvin", "Cal")
+    assert [index.generation() for _ in range(100)] == [1] * 100
+    assert len(connections) == 2
@@ -0,0 +1,46 @@
+#test_jobs.py
+#jobs shared between processes: resume() takes over the jobs of a process that is gone and leaves alone the ones
+#a live process is still on. Two JobRunners on one folder stand in for two workers, as a job's lock is per open file
+
+import threading
+from poker_analysis import jobs
+
+
+def test_resume_leaves_jobs_another_runner_is_on(tmp_path):
+    started, finish = threading.Event(), threading.Event()
+    runs = []
+
+    def work(job, progress):
+        runs.append(job["id"])
+        started.set()
+        finish.wait(5)
+        return {"result": len(runs)}
+
+    first = jobs.JobRunner(jobs.JobStore(str(tmp_path)), work, concurrency=1)
+    second = jobs.JobRunner(jobs.JobStore(str(tmp_path)), work, concurrency=1)
+    running = first.submit(name="running")
+    queued = first.submit(name="queued")
+    assert started.wait(5)
+
+    assert second.resume() == 0
+    finish.set()
+    first.shutdown()
+    second.shutdown()
+    assert runs == [running["id"], queued["id"]]
+    assert [first.store.get(job["id"])["status"] for job in (running, queued)] == [jobs.DONE, jobs.DONE]
+    assert not list(tmp_path.glob("*.lock"))
+
+
+def test_resume_takes_over_the_jobs_of_a_process_that_is_gone(tmp_path):
+    store = jobs.JobStore(str(tmp_path))
+    #left running and queued by a process that died: their records, nobody holding their locks
+    running = store.create(name="running", status=jobs.RUNNING)
+    queued = store.create(name="queued")
+    done = store.create(name="done", status=jobs.DONE)
+
+    runs = []
+    runner = jobs.JobRunner(jobs.JobStore(str(tmp_path)), lambda job, progress: runs.append(job["name"]))
+    assert runner.resume() == 2
+    runner.shutdown()
+    assert sorted(runs) == ["queued", "running"]
+    assert [store.get(job["id"])["status"] for job in (running, queued, done)] == [jobs.DONE] * 3
@@ -0,0 +1,51 @@
+#test_ledger.py
+#the old JSON upload log is imported once, however many workers start at the same time and try to
+
+import json
+import threading
+from poker_analysis import ledger
+
+
+def write_json_log(path, n):
+    entries = [{"filename": f"log{i}.csv", "timestamp": f"2024-09-{1 + i % 28:02d} 12:00:00"} for i in range(n)]
+    path.write_text(json.dumps(entries))
+
+
+def test_workers_starting_together_import_once(tmp_path):
+    source = tmp_path / "upload_log.json"
+    write_json_log(source, 50)
+    db = str(tmp_path / "uploads.db")
+    ledger.UploadLedger(db)
+
+    start, imported, errors = threading.Barrier(8), [], []
+
+    def worker():
+        store = ledger.UploadLedger(db)
+        start.wait()
+        try:
+            imported.append(store.import_json(str(source)))
+        except Exception as e:
+            errors.append(e)
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert sorted(imported) == [0] * 7 + [50]
+    assert ledger.UploadLedger(db).count() == 50
+    assert not source.exists() and (tmp_path / "upload_log.json.imported").exists()
+
+
+def test_missing_or_imported_file_imports_nothing(tmp_path):
+    store = ledger.UploadLedger(str(tmp_path / "uploads.db"))
+    source = tmp_path / "upload_log.json"
+    assert store.import_json(str(source)) == 0
+
+    write_json_log(source, 3)
+    assert store.import_json(str(source)) == 3
+    #the same file put back, say from a backup
+    write_json_log(source, 3)
+    assert store.import_json(str(source)) == 0
+    assert store.count() == 3
@@ -0,0 +1,48 @@
+#test_live.py
+#a live session fed a game's exports as it grows ends up with the stats of the whole log read at once, and it only
+#takes rows newer than the last one it saw: an older export, or one with rows missing after that, is refused and
+#leaves the session as it was
+
+import pytest
+from poker_analysis import live, matrix, model, parser
+from tests.conftest import SAMPLE_LOG
+
+
+def test_growing_exports_match_the_whole_log(sample_rows, write_log):
+    header, rows = sample_rows
+    session = live.LiveSession()
+    for n in (len(rows) // 7, len(rows) // 3, len(rows) // 3 + 1, len(rows) // 2, len(rows)):
+        with open(write_log("export.csv", rows[len(rows) - n:]), "rb") as f:
+            session.update(f)
+    assert session.rows == len(rows)
+
+    game = model.load_game(SAMPLE_LOG)
+    player_dict = parser.create_player_dict(game.events)
+    assert session.accumulator.player_dict == player_dict
+    assert session.accumulator.base_stats() == matrix.baseStats(game, player_dict)
+
+
+def test_live_session_refuses_an_older_export(sample_rows, write_log):
+    header, rows = sample_rows
+    session = live.LiveSession()
+    with open(write_log("half.csv", rows[len(rows) // 2:]), "rb") as f:
+        session.update(f)
+    with open(write_log("full.csv", rows), "rb") as f:
+        assert session.update(f) == len(rows) // 2
+    before = (session.last_order, session.rows, session.accumulator.base_stats())
+
+    with open(write_log("half.csv", rows[len(rows) // 2:]), "rb") as f:
+        with pytest.raises(live.NotAContinuation):
+            session.update(f)
+    assert (session.last_order, session.rows, session.accumulator.base_stats()) == before
+
+
+def test_live_session_refuses_missing_rows(sample_rows, write_log):
+    header, rows = sample_rows
+    session = live.LiveSession()
+    with open(write_log("early.csv", rows[len(rows) // 2:]), "rb") as f:
+        session.update(f)
+    #the newest rows without the ones just after what the session saw
+    with open(write_log("gap.csv", rows[:len(rows) // 2 - 50]), "rb") as f:
+        with pytest.raises(live.NotAContinuation):
+            session.update(f)
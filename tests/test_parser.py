@@ -0,0 +1,70 @@
+#test_parser.py
+#the tokenizer: one Event per log line with the fields the stats read, and stats run from the events agreeing with
+#counts taken straight from the raw lines
+
+import re
+import pytest
+from poker_analysis import model, parser, stats
+from tests.conftest import SAMPLE_LOG
+
+
+@pytest.mark.parametrize("entry, expected", [
+    ('"DLA @ tH-zqsM1Dh" calls 75.19', (parser.ACTION, "tH-zqsM1Dh", "DLA", 75.19, "calls")),
+    ('"Cal @ E18ViE79KI" raises to 75.19 and go all in', (parser.ACTION, "E18ViE79KI", "Cal", 75.19, "raises")),
+    ('"DLA @ tH-zqsM1Dh" checks', (parser.ACTION, "tH-zqsM1Dh", "DLA", None, "checks")),
+    ('"DLA @ tH-zqsM1Dh" posts a big blind of 1.00', (parser.ACTION, "tH-zqsM1Dh", "DLA", 1.0, "posts")),
+    ('"Jentz @ hiDcyv1umf" posts a missing small blind of 0.50',
+     (parser.DEAD_BLIND, "hiDcyv1umf", "Jentz", 0.5, None)),
+    ('The player "Jad @ C-X_HjGFDq" joined the game with a stack of 100.00.',
+     (parser.JOIN, "C-X_HjGFDq", "Jad", 100.0, None)),
+    ('The player "Jad @ C-X_HjGFDq" stand up with the stack of 115.50.',
+     (parser.STAND, "C-X_HjGFDq", "Jad", 115.5, None)),
+    ('The player "Cal @ E18ViE79KI" quits the game with a stack of 0.00.',
+     (parser.QUIT, "E18ViE79KI", "Cal", 0.0, None)),
+    ('The admin updated the player "Cal @ E18ViE79KI" stack from 60.64 to 110.64.',
+     (parser.ADMIN_UPDATE, "E18ViE79KI", "Cal", 50.0, (60.64, 110.64))),
+    ('Uncalled bet of 2.00 returned to "DLA @ tH-zqsM1Dh"', (parser.UNCALLED, "tH-zqsM1Dh", "DLA", 2.0, None)),
+    ('"DLA @ tH-zqsM1Dh" shows a 8♦, 4♦.', (parser.SHOW, "tH-zqsM1Dh", "DLA", None, "8♦, 4♦")),
+    ('-- ending hand #218 --', (parser.HAND_END, None, None, None, None)),
+    ('River (second run): 5♦, 7♥, 6♦, 3♥ [6♠]', (parser.STREET, None, None, None, "River (second run)")),
+    ('Player stacks: #2 "Cal @ E18ViE79KI" (86.19) | #9 "DLA @ tH-zqsM1Dh" (246.48)',
+     (parser.STACKS, None, None, None, [("E18ViE79KI", "Cal", 86.19), ("tH-zqsM1Dh", "DLA", 246.48)])),
+    ('The player "Cal @ E18ViE79KI" passed the room ownership to "Jentz @ hiDcyv1umf".',
+     (parser.OTHER, None, None, None,
+      'The player "Cal @ E18ViE79KI" passed the room ownership to "Jentz @ hiDcyv1umf".')),
+])
+def test_tokenize_entry(entry, expected):
+    assert tuple(parser.tokenize_entry(entry)[:5]) == expected
+
+
+def test_hand_start_and_collect():
+    start = parser.tokenize_entry("-- starting hand #218 (id: 39xz1crdasdc)  (No Limit Texas Hold'em) "
+                                  '(dealer: "Cal @ E18ViE79KI") --')
+    assert (start.kind, start.amount) == (parser.HAND_START, 218)
+    collect = parser.tokenize_entry('"DLA @ tH-zqsM1Dh" collected 86.19 from pot with Straight, 8 High on the second '
+                                    'run  (combination: 8♦, 7♥, 6♦, 5♦, 4♦)')
+    assert tuple(collect[:5]) == (parser.COLLECT, "tH-zqsM1Dh", "DLA", 86.19, 2)
+
+
+def test_one_event_per_line_in_log_order():
+    log = parser.load_log(SAMPLE_LOG)
+    events = parser.tokenize_log(log)
+    assert len(events) == len(log)
+    assert [event.order for event in events] == list(log["order"])
+
+
+@pytest.mark.parametrize("action", ["calls", "folds", "raises", "bets"])
+def test_action_counts_match_the_raw_lines(action):
+    log = parser.load_log(SAMPLE_LOG)
+    events = parser.tokenize_log(log)
+    player_dict = parser.create_player_dict(events)
+    line = re.compile(rf'^"(.+?) @ (\S+?)" {action}\b')
+
+    expected = {}
+    for entry in log["entry"]:
+        match = line.match(entry)
+        if match:
+            name = player_dict.get(match.group(2), match.group(1))
+            expected[name] = expected.get(name, 0) + 1
+    counts = stats.get_action_counts(model.Game(events), action, player_dict)
+    assert {name: count for name, count in counts.items() if count} == expected
@@ -0,0 +1,60 @@
+#test_replay.py
+#replay's per-hand results against the log's own 'Player stacks:' snapshots: a player's stack at the start of a
+#hand is their stack at the start of the previous one plus what replay says they won in it, unless they joined,
+#quit, stood up or had their stack changed by the admin in between
+
+from poker_analysis import matrix, mmaplog, model, parser, replay, stats
+from tests.conftest import SAMPLE_LOG
+
+BETWEEN_HANDS = (parser.JOIN, parser.QUIT, parser.STAND, parser.ADMIN_UPDATE)
+
+
+def snapshots_and_results(events):
+    """[(stacks {pid: chips}, pids touched since the previous snapshot)] and the HandResults, one per hand"""
+    replayed = replay.Replay(keep_hands=True)
+    snapshots, touched = [], set()
+    for event in events:
+        replayed.add(event)
+        if event.kind == parser.STACKS:
+            snapshots.append(({pid: stack for pid, name, stack in event.detail}, touched))
+            touched = set()
+        elif event.kind in BETWEEN_HANDS:
+            touched.add(event.player_id)
+    return snapshots, replayed
+
+
+def test_nets_reconcile_with_stack_snapshots():
+    snapshots, replayed = snapshots_and_results(reversed(mmaplog.load_events(SAMPLE_LOG)))
+    assert replayed.hands == len(snapshots) > 100
+    assert replayed.unbalanced == 0
+
+    checked = 0
+    for result, (before, _), (after, touched) in zip(replayed.results, snapshots, snapshots[1:]):
+        for pid in before.keys() & after.keys() - touched:
+            assert abs(before[pid] + result.net.get(pid, 0.0) - after[pid]) < 0.005, (result.number, pid)
+            checked += 1
+    assert checked > 1000
+
+
+def test_every_hand_balances():
+    replayed = replay.replay_game(model.load_game(SAMPLE_LOG), keep_hands=True)
+    for result in replayed.results:
+        assert abs(sum(result.net.values())) < 0.005, result.number
+
+
+def test_base_stats_replays_once(monkeypatch):
+    game = model.load_game(SAMPLE_LOG)
+    player_dict = parser.create_player_dict(game.events)
+    expected = (stats.calculate_net_profit(game, player_dict), stats.calculate_ev_profit(game, player_dict))
+
+    calls = []
+    replay_game = replay.replay_game
+
+    def counted(game, keep_hands=False):
+        calls.append(game)
+        return replay_game(game, keep_hands)
+    monkeypatch.setattr(replay, "replay_game", counted)
+    base = matrix.baseStats(game, player_dict)
+    assert len(calls) == 1
+    assert (base["netProfit"], base["evProfit"]) == expected
+    assert abs(sum(base["netProfit"].values())) < 0.05
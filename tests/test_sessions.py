@@ -0,0 +1,73 @@
+#test_sessions.py
+#lifetime totals count a game once: re-exports of the same game replace its session when they go further and are
+#ignored when they don't, whatever order they arrive in. And the totals are plain JSON
+
+import hashlib
+import json
+from poker_analysis import sessions
+
+
+def digest(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def add(store, path):
+    return store.add_log(path, digest(path), "log.csv")
+
+
+def hands(store):
+    return {player: row["hands"] for player, row in store.lifetime().items()}
+
+
+def test_exports_of_one_game_count_once(tmp_path, sample_rows, write_log):
+    header, rows = sample_rows
+    store = sessions.SessionStore(str(tmp_path / "sessions.db"))
+    assert add(store, write_log("full.csv", rows))
+    expected = hands(store)
+
+    for name, part in (("half.csv", rows[len(rows) // 2:]), ("third.csv", rows[2 * len(rows) // 3:])):
+        assert not add(store, write_log(name, part))
+        assert hands(store) == expected
+    assert len(store.sessions()) == 1
+
+
+def test_a_longer_export_replaces_the_shorter_one(tmp_path, sample_rows, write_log):
+    header, rows = sample_rows
+    store = sessions.SessionStore(str(tmp_path / "sessions.db"))
+    assert add(store, write_log("half.csv", rows[len(rows) // 2:]))
+    full = write_log("full.csv", rows)
+    assert add(store, full)
+    assert [session[0] for session in store.sessions()] == [digest(full)]
+
+    #the same as if only the full export had ever been added
+    fresh = sessions.SessionStore(str(tmp_path / "fresh.db"))
+    assert add(fresh, full)
+    assert store.lifetime() == fresh.lifetime()
+
+
+def test_different_games_add_up(tmp_path, sample_rows, write_log):
+    header, rows = sample_rows
+    store = sessions.SessionStore(str(tmp_path / "sessions.db"))
+    assert add(store, write_log("late.csv", rows[:len(rows) // 2]))
+    assert add(store, write_log("early.csv", rows[len(rows) // 2:]))
+    assert len(store.sessions()) == 2
+
+
+def test_ratios_without_calls_are_none():
+    totals = {"raiser": {**dict.fromkeys(sessions.FIELDS, 0), "hands": 10, "raises": 4, "bets": 2},
+              "caller": {**dict.fromkeys(sessions.FIELDS, 0), "hands": 10, "calls": 3, "bets": 3}}
+    rows = sessions.ratios(totals)
+    assert rows["raiser"]["af"] is None
+    assert rows["caller"]["af"] == 1.0
+    json.dumps(rows, allow_nan=False)
+
+
+def test_lifetime_is_strict_json(tmp_path, write_log, sample_rows):
+    header, rows = sample_rows
+    store = sessions.SessionStore(str(tmp_path / "sessions.db"))
+    #Jad with every call taken out
+    add(store, write_log("log.csv", [row for row in rows if b'Jad @ C-X_HjGFDq"" calls' not in row]))
+    lifetime = store.lifetime()
+    assert lifetime["Jad"]["calls"] == 0 and lifetime["Jad"]["af"] is None
+    json.dumps(lifetime, allow_nan=False)
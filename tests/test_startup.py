@@ -0,0 +1,42 @@
+#test_startup.py
+#what importing the app does before any request: with PRELOAD the parent process maps the evaluator's tables and
+#starts no job thread, and the workers it forks take over the jobs a previous process left unfinished.
+#Run in a child interpreter, as the app can only be imported once per process
+
+import json
+import os
+import subprocess
+import sys
+from tests.conftest import ROOT
+
+CHILD = r"""
+import json, os, sys, threading, time
+sys.path.insert(0, sys.argv[1])
+from poker_analysis import equity, jobs
+
+store = jobs.JobStore("jobs")
+left = store.create(filename="log.csv", filepath="missing.csv", digest="0" * 64, status=jobs.RUNNING)
+import app
+report = {"parent_threads": [thread.name for thread in threading.enumerate()],
+          "tables": equity._tables is not None, "parent_status": store.get(left["id"])["status"]}
+pid = os.fork()
+if pid == 0:
+    for _ in range(100):
+        if store.get(left["id"])["status"] in (jobs.DONE, jobs.FAILED):
+            break
+        time.sleep(0.05)
+    os._exit(0)
+os.waitpid(pid, 0)
+report["worker_status"] = store.get(left["id"])["status"]
+print(json.dumps(report))
+"""
+
+
+def test_preload_resumes_jobs_in_the_workers_only(tmp_path):
+    output = subprocess.run([sys.executable, "-c", CHILD, ROOT], cwd=tmp_path, env=dict(os.environ, PRELOAD="1"),
+                            capture_output=True, text=True, check=True).stdout
+    report = json.loads(output.splitlines()[-1])
+    assert report["parent_threads"] == ["MainThread"]
+    assert report["tables"]
+    assert report["parent_status"] == "running"
+    assert report["worker_status"] == "failed"  # taken over, and its log is gone